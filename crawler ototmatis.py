@@ -1,90 +1,132 @@
-import requests
-from bs4 import BeautifulSoup
 import webbrowser
 import customtkinter as ctk
 import json
 import threading
 import time
 import os
+import queue
+import sqlite3
 import tkinter as tk
-from tkinter import messagebox, simpledialog
+from tkinter import filedialog, messagebox, simpledialog
+
+from search_core import (
+    DEFAULT_ENGINES_FILE, DEFAULT_MAX_CONCURRENT_SEARCHES, DEFAULT_PER_HOST_DELAY,
+    DEFAULT_HTTP_SETTINGS, DEFAULT_CACHE_SETTINGS, DEFAULT_PARSE_WORKERS, DEFAULT_RATE_LIMIT_SETTINGS, DEFAULT_HISTORY_SETTINGS,
+    DEFAULT_FETCH_BACKEND, DEFAULT_ASYNC_SETTINGS, DEFAULT_HTTP_CACHE_SETTINGS, DEFAULT_RESPONSE_SETTINGS, DEFAULT_HEDGE_SETTINGS,
+    DEFAULT_ENRICHMENT_SETTINGS, DEFAULT_PREFETCH_SETTINGS,
+    ENGINE_CATEGORIES, CancellationToken, CircuitBreaker, EngineMetrics, EngineStore, HostRateLimiter, HttpCache, PageEnricher, PagePrefetcher, ParserPool, RankFusion, RequestHedger, ResultCache, SearchHistory,
+    categorize_engines, configure_http_session, configure_response_reading, create_fetch_backend, engine_page_url, iter_search_results,
+    supports_pages
+)
 
 ctk.set_appearance_mode("System") # Default system mode
 ctk.set_default_color_theme("blue") # Default color theme
 
-# --- Specific Parser Functions for Each Search Engine ---
-# Important: Search engine HTML structures often change.
-# These parsers might need adjustments in the future if site changes occur.
-
-def parse_google_results(soup):
-    results = []
-    for g_result in soup.find_all('div', class_='g'):
-        link_tag = g_result.find('a', href=True)
-        if link_tag and link_tag['href'].startswith('http'):
-            href = link_tag['href']
-            # Filter Google's internal URLs (redirects, cache, search related)
-            if "google.com/url?" not in href and \
-               "webcache.googleusercontent.com" not in href and \
-               "/search?q=" not in href and \
-               "accounts.google.com" not in href:
-                results.append(href)
-    return results
-
-def parse_bing_results(soup):
-    results = []
-    for b_result in soup.find_all('li', class_='b_algo'):
-        link_tag = b_result.find('h2')
-        if link_tag:
-            a_tag = link_tag.find('a', href=True)
-            if a_tag and a_tag['href'].startswith('http'):
-                results.append(a_tag['href'])
-    return results
-
-def parse_duckduckgo_results(soup):
-    results = []
-    for result_div in soup.find_all('div', class_='web-result'):
-        link_tag = result_div.find('a', class_='result__url', href=True)
-        if link_tag and link_tag['href'].startswith('http'):
-            results.append(link_tag['href'])
-    return results
-
-def search_engine(query, engine_name, engine_url_template, delay=1):
-    headers = {
-        "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/114.0.0.0 Safari/537.36"
-    }
-    
-    url = engine_url_template.format(query=query)
-
-    try:
-        response = requests.get(url, headers=headers, verify=True, timeout=15) # Increased timeout
-        response.raise_for_status()
-
-        soup = BeautifulSoup(response.content, "html.parser")
-        
-        parsed_results = []
-        if engine_name.lower() == "google":
-            parsed_results = parse_google_results(soup)
-        elif engine_name.lower() == "bing":
-            parsed_results = parse_bing_results(soup)
-        elif engine_name.lower() == "duckduckgo":
-            parsed_results = parse_duckduckgo_results(soup)
-        else:
-            # Fallback parser: Grab all valid links. 
-            # This might not be as accurate as specific parsers.
-            for a_tag in soup.find_all('a', href=True):
-                href = a_tag['href']
-                # Only add if it's a full web URL
-                if href.startswith('http://') or href.startswith('https://'):
-                    parsed_results.append(href)
-            
-        return {"engine": engine_name, "status": "Success", "message": "Search successful.", "results": parsed_results[:20]} # Limit to 20 results
-
-    except requests.exceptions.Timeout:
-        return {"engine": engine_name, "status": "Error", "message": f"Request to {engine_name.capitalize()} timed out.", "results": []}
-    except requests.exceptions.RequestException as e:
-        return {"engine": engine_name, "status": "Error", "message": f"An error occurred while searching on {engine_name.capitalize()}: {e}", "results": []}
-    except Exception as e:
-        return {"engine": engine_name, "status": "Error", "message": f"An unexpected error occurred: {e}", "results": []}
+# --- Result Streaming Settings ---
+RESULTS_DRAIN_INTERVAL_MS = 100 # How often the GUI picks up results from the search thread
+RESULTS_DRAIN_BATCH_SIZE = 20 # Max engine results rendered per GUI tick
+
+# --- Result Rendering Settings ---
+RESULTS_PAGE_SIZE = 400 # Result lines materialized in the textbox at once; the rest is paged
+RESULTS_VIEW_BY_ENGINE = "By Engine"
+RESULTS_VIEW_MERGED = "Merged" # One list ranked by weighted reciprocal rank fusion
+
+# --- Result Enrichment Settings ---
+ENRICHMENT_DRAIN_INTERVAL_MS = 250 # How often fetched page titles and descriptions are shown
+
+# --- Search History Settings ---
+HISTORY_MATCH_LIMIT = 200 # Max past results listed in the history window
+
+# --- Browser Tab Settings ---
+TAB_OPEN_INTERVAL = 0.5 # Seconds between two tabs opened by "Open in Browser Automatically"
+TAB_OPEN_MAX_PER_SEARCH = 20 # Further results of a search are listed but not opened
+TAB_OPEN_QUEUE_SIZE = 100 # URLs waiting to be opened; more are dropped
+
+# --- Engine File Settings ---
+ENGINES_POLL_MS = 2000 # How often search_engines.json is checked for outside edits
+
+# --- Engine Metrics Settings ---
+METRICS_REFRESH_MS = 1000 # How often the metrics window is redrawn while open
+METRICS_SORT_SLOWEST = "Slowest"
+METRICS_SORT_FAILING = "Most Failing"
+
+class BrowserTabOpener:
+    """Opens result URLs in browser tabs on a background thread, so the GUI never waits for the browser.
+
+    URLs are opened one every `interval` seconds, at most `max_per_search` per search;
+    URLs opened before in this session are skipped and a full queue drops new ones.
+    start_search() and cancel() discard everything still waiting.
+    """
+
+    def __init__(self, interval=TAB_OPEN_INTERVAL, max_per_search=TAB_OPEN_MAX_PER_SEARCH, max_queued=TAB_OPEN_QUEUE_SIZE):
+        self.interval = interval
+        self.max_per_search = max_per_search
+        self._queue = queue.Queue(maxsize=max_queued)
+        self._lock = threading.Lock()
+        self._generation = 0 # Bumped by start_search() and cancel(); older queued URLs are skipped
+        self._search_count = 0 # URLs accepted for the current search
+        self._opened = set() # Opened or waiting to be opened
+        self._waiting = {} # URL -> generation it was queued in
+        self._closed = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="browser-tabs", daemon=True)
+        self._thread.start()
+
+    @property
+    def limit_reached(self):
+        """True once the current search has used up its tabs."""
+        with self._lock:
+            return self._search_count >= self.max_per_search
+
+    def start_search(self):
+        """Starts counting tabs for a new search and drops the URLs of the previous one."""
+        with self._lock:
+            self._drop_waiting()
+            self._search_count = 0
+
+    def cancel(self):
+        """Drops every URL that has not been opened yet."""
+        with self._lock:
+            self._drop_waiting()
+
+    def _drop_waiting(self):
+        # Caller must hold self._lock; dropped URLs may be opened again by a later search
+        self._generation += 1
+        self._opened.difference_update(self._waiting)
+        self._waiting.clear()
+
+    def open(self, url):
+        """Queues `url` to be opened; returns False if it is skipped (already opened, limit reached or queue full)."""
+        with self._lock:
+            if url in self._opened or self._search_count >= self.max_per_search:
+                return False
+            try:
+                self._queue.put_nowait((self._generation, url))
+            except queue.Full:
+                return False
+            self._opened.add(url)
+            self._waiting[url] = self._generation
+            self._search_count += 1
+            return True
+
+    def close(self):
+        """Stops opening tabs."""
+        self._closed.set()
+        self.cancel()
+
+    def _run(self):
+        while not self._closed.is_set():
+            generation, url = self._queue.get()
+            with self._lock:
+                stale = generation != self._generation
+                if not stale:
+                    del self._waiting[url]
+            if stale:
+                continue
+            try:
+                webbrowser.open_new_tab(url)
+            except Exception as e:
+                print(f"Could not open {url} in the browser ({e}).")
+            self._closed.wait(self.interval) # Also ends the pause early when the app closes
 
 class SearchApp(ctk.CTk):
     def __init__(self):
@@ -93,194 +135,104 @@ class SearchApp(ctk.CTk):
         self.title("Universal Search Application")
         self.geometry("1000x650") 
 
-        self.engines_file = "search_engines.json"
+        self.engines_file = DEFAULT_ENGINES_FILE
+        self.engine_store = EngineStore(self.engines_file) # Batches saves and picks up outside edits of the file
         self.available_engines = self.load_engines()
 
         # Initialize categories with empty lists
-        self.engine_categories = {
-            "General": [], 
-            "Images": [],
-            "Videos": [],
-            "News": [],
-            "Academic": [],
-            "Social": [],
-            "Shopping": [],
-            "Q&A": []
-        }
+        self.engine_categories = {category_name: [] for category_name in ENGINE_CATEGORIES}
         self.listboxes_by_category = {} # Will hold scrollable frames for each category
+        self.category_labels = {category_name: {} for category_name in ENGINE_CATEGORIES} # Category -> engine -> label shown in its tab
         self._current_selected_engine = None
+        self._manage_window = None
         self._search_in_progress = False
+        self._results_queue = queue.Queue() # Search thread -> GUI main loop
+        self._search_total = 0
+        self._search_done_count = 0
+        self._search_cache_hits = 0
+        self._search_query = ""
+        self._history_id = None # Search history id of the current search, for its further result pages
+        self._open_in_browser = False
+        self._tab_limit_noted = False # Whether the results already say that no more tabs are opened
+        self._cancel_token = None # Cancellation token of the running search
+        self._result_lines = [] # Every rendered line as (text, tag), plus the URL for result lines; only one page lives in the textbox
+        self._page_urls = set() # URLs of the result lines in the textbox
+        self._url_engines = {} # Result URL -> engine that listed it first
+        self._engine_result_counts = {} # Engine -> results it returned so far, over all loaded pages
+        self._next_pages = {} # Engine -> its next result page, for engines that may have more results
+        self._prefetch_token = CancellationToken() # Cancelled when a new search makes prefetched pages useless
+        self._prefetched_targets = frozenset() # (engine, next page) pairs shown when pages were last prefetched
+        self._metadata_queue = queue.Queue() # Enrichment threads -> GUI main loop, as (url, metadata)
+        self._page_metadata = {} # Result URL -> title and description known for it, read while rendering
+        self._history_request = 0 # Latest history window lookup; older ones are not shown
+        self._results_page = 0
+        self._result_index = RankFusion() # Unique URLs of the current search across engines, with fused ranks
+        self._merged_lines = None # Lines of the merged view; rebuilt lazily after new results arrive
 
         self.config_file = "app_config.json"
+        self.max_concurrent_searches = DEFAULT_MAX_CONCURRENT_SEARCHES
+        self.per_host_delay = DEFAULT_PER_HOST_DELAY
+        self.http_settings = dict(DEFAULT_HTTP_SETTINGS)
+        self.response_settings = dict(DEFAULT_RESPONSE_SETTINGS)
+        self.cache_settings = dict(DEFAULT_CACHE_SETTINGS)
+        self.http_cache_settings = dict(DEFAULT_HTTP_CACHE_SETTINGS)
+        self.parse_workers = DEFAULT_PARSE_WORKERS
+        self.rate_limit_settings = dict(DEFAULT_RATE_LIMIT_SETTINGS)
+        self.history_settings = dict(DEFAULT_HISTORY_SETTINGS)
+        self.fetch_backend_name = DEFAULT_FETCH_BACKEND
+        self.async_settings = dict(DEFAULT_ASYNC_SETTINGS)
+        self.hedge_settings = dict(DEFAULT_HEDGE_SETTINGS)
+        self.enrichment_settings = dict(DEFAULT_ENRICHMENT_SETTINGS)
+        self.prefetch_settings = dict(DEFAULT_PREFETCH_SETTINGS)
         self.load_config()
+        configure_http_session(**self.http_settings)
+        configure_response_reading(**self.response_settings)
+        self.result_cache = self.create_result_cache()
+        self.http_cache = self.create_http_cache()
+        self.search_history = self.create_search_history()
+        self.parser_pool = ParserPool(self.parse_workers) if self.parse_workers > 0 else None
+        self.fetch_backend = self.create_fetch_backend()
+        # Kept across searches so hosts stay throttled and failing engines stay skipped
+        self.rate_limiter = HostRateLimiter(self.per_host_delay, self.rate_limit_settings['max_rate'],
+                                            self.rate_limit_settings['min_rate'], max_wait=self.rate_limit_settings['max_wait'])
+        self.circuit_breaker = CircuitBreaker(self.rate_limit_settings['failure_threshold'], self.rate_limit_settings['cooldown_seconds'])
+        self.engine_metrics = EngineMetrics() # Latency and failures of every engine request this session
+        self.request_hedger = self.create_request_hedger()
+        self.tab_opener = BrowserTabOpener()
+        self.page_enricher = self.create_page_enricher()
+        self.page_prefetcher = None
+        if self.prefetch_settings.get('enabled'):
+            self.page_prefetcher = PagePrefetcher(self.prefetch_settings['max_pages'], self.prefetch_settings['max_in_flight'])
 
         self.create_widgets()
         # Call update_all_category_listboxes after widgets are created
         self.update_all_category_listboxes()
+        self.protocol("WM_DELETE_WINDOW", self.on_close)
+        self.after(ENGINES_POLL_MS, self.poll_engines_file)
+        if self.page_enricher is not None:
+            self.after(ENRICHMENT_DRAIN_INTERVAL_MS, self._drain_metadata_queue)
         
     def load_engines(self):
         """Loads the list of search engines from a JSON file or uses defaults."""
-        try:
-            with open(self.engines_file, 'r') as f:
-                engines = json.load(f)
-                # Basic format validation
-                if not all(isinstance(k, str) and isinstance(v, str) and '{query}' in v for k, v in engines.items()):
-                    raise ValueError("Invalid search engine file format.")
-                return engines
-        except (FileNotFoundError, json.JSONDecodeError, ValueError):
-            # If file not found, corrupted, or invalid format, use defaults
-            print("search_engines.json not found or corrupted. Creating from defaults.")
-            default_engines = {
-                # --- General Search Engines ---
-                "google": "https://www.google.com/search?q={query}",
-                "bing": "https://www.bing.com/search?q={query}",
-                "yahoo": "https://search.yahoo.com/search?p={query}",
-                "duckduckgo": "https://duckduckgo.com/?q={query}",
-                "ecosia": "https://www.ecosia.org/search?q={query}",
-                "startpage": "https://www.startpage.com/sp/search?q={query}",
-                "yandex": "https://yandex.com/search/?text={query}",
-                "baidu": "https://www.baidu.com/s?wd={query}",
-                "naver": "https://search.naver.com/search.naver?query={query}",
-                "ask": "https://www.ask.com/web?q={query}",
-                "aol": "https://search.aol.com/aol/search?q={query}",
-                "dogpile": "https://www.dogpile.com/search?q={query}",
-                "excite": "https://www.excite.com/search/web?q={query}",
-                "info": "https://www.info.com/search?q={query}",
-                "lycos": "https://search.lycos.com/?q={query}",
-                "metacrawler": "https://www.metacrawler.com/metacrawler/search?q={query}",
-                "msn": "https://www.msn.com/en-us/search?q={query}",
-                "petal": "https://petalsearch.com/search?q={query}",
-                "qwant": "https://www.qwant.com/?q={query}",
-                "rambler": "https://nova.rambler.ru/search?query={query}",
-                "searchcom": "https://www.search.com/search?q={query}",
-                "sogou": "https://www.sogou.com/web?query={query}",
-                "swisscows": "https://swisscows.com/en/web?query={query}",
-                "teoma": "https://search.teoma.com/search?q={query}",
-                "walla": "https://walla.co.il/?q={query}",
-                "webcrawler": "https://www.webcrawler.com/serp?q={query}",
-                "wolframalpha": "https://www.wolframalpha.com/input/?i={query}",
-                "zapmeta": "https://www.zapmeta.com/web?q={query}",
-                "192com": "https://www.192.com/search/people?q={query}",
-                "abacho": "https://www.abacho.com/search.php?q={query}",
-                "accoona": "https://www.accoona.com/search.php?q={query}",
-                "acoon": "https://www.acoon.com/search.php?q={query}",
-                "adalta": "https://www.adalta.com/search?q={query}",
-                "adfind": "https://www.adfind.com/search?q={query}",
-                "aeiwi": "https://www.aeiwi.com/search?q={query}",
-                "alltheweb": "https://www.alltheweb.com/search?q={query}",
-                "ansearch": "https://www.ansearch.com/search?q={query}",
-                "arianna": "https://www.arianna.it/search?q={query}",
-                "arios": "https://www.arios.com/search?q={query}",
-                "auone": "https://auone.jp/search?q={query}",
-                "avivo": "https://www.avivo.com/search?q={query}",
-                "azekon": "https://www.azekon.com/search?q={query}",
-                "baidubrother": "https://www.baidubrother.com/search?q={query}",
-                "beekio": "https://beek.io/?s={query}",
-                "befun": "https://www.befun.com/search?q={query}",
-                "biglobe": "https://search.biglobe.ne.jp/q/{query}",
-                "blitzsuche": "https://www.blitzsuche.de/start.php?q={query}",
-                "bluewin": "https://www.bluewin.ch/fr/search.html?q={query}",
-                "boardreader": "https://boardreader.com/s/{query}",
-                "boxxet": "https://www.boxxet.com/search?q={query}",
-                "brainboost": "https://www.brainboost.com/search?q={query}",
-                "bravo": "https://www.bravo.de/suche?s={query}",
-                "business": "https://www.business.com/directory/search/?q={query}",
-                "cauti": "https://www.cauti.com/search?q={query}",
-                "centrata": "https://www.centrata.com/search?q={query}",
-                "chacha": "https://www.chacha.com/search?q={query}",
-                "chlubber": "https://www.chlubber.com/search?q={query}",
-                "clipular": "https://clipular.com/search?q={query}",
-                "cluuz": "https://www.cluuz.com/search?q={query}",
-                "cnn": "https://edition.cnn.com/search?q={query}", # This could also go into news, but since `cnn` is specific, it can be general
-                "coccinelles": "https://www.coccinelles.fr/recherche.php?q={query}",
-                "colibrism": "https://colibri.sm/search?q={query}",
-                "cosmos": "https://www.cosmos.com.my/search?q={query}",
-                "crawler": "https://www.crawler.com/search?q={query}",
-                
-                # --- Image Search Engines ---
-                "google_images": "https://www.google.com/search?q={query}&tbm=isch",
-                "bing_images": "https://www.bing.com/images/search?q={query}",
-                "flickr": "https://www.flickr.com/search/?text={query}",
-                "pinterest": "https://www.pinterest.com/search/pins/?q={query}",
-                "getty_images": "https://www.gettyimages.com/search/{query}",
-                "unsplash": "https://unsplash.com/s/photos/{query}",
-                "pexels": "https://www.pexels.com/search/{query}/",
-                "pixabay": "https://pixabay.com/images/search/{query}/",
-                "shutterstock": "https://www.shutterstock.com/search/{query}",
-                "deviantart": "https://www.deviantart.com/search?q={query}",
-                "google_arts_culture": "https://artsandculture.google.com/search/{query}",
-
-                # --- Video Search Engines ---
-                "youtube": "https://www.youtube.com/results?search_query={query}", # This URL is a bit unusual, might need checking
-                "vimeo": "https://vimeo.com/search?q={query}",
-                "dailymotion": "https://www.dailymotion.com/search/{query}",
-                "metacafe": "https://www.metacafe.com/videos/?query={query}",
-                "twitch_channels": "https://www.twitch.tv/search?query={query}&type=channels",
-                "twitch_videos": "https://www.twitch.tv/search?query={query}&type=videos",
-                "internet_archive_videos": "https://archive.org/details/movies?query={query}",
-
-                # --- News Search Engines ---
-                "google_news": "https://news.google.com/search?q={query}",
-                "bing_news": "https://www.bing.com/news/search?q={query}",
-                "reuters": "https://www.reuters.com/search/news?q={query}",
-                "bbc_news": "https://www.bbc.com/search?q={query}",
-                "cnn_news": "https://edition.cnn.com/search?q={query}",
-                "al_jazeera": "https://www.aljazeera.com/search/{query}",
-                "the_guardian": "https://www.theguardian.com/search?q={query}",
-                "new_york_times": "https://www.nytimes.com/search?query={query}",
-                "associated_press": "https://apnews.com/search?q={query}",
-                "kompas_id": "https://www.kompas.com/search?q={query}",
-                "detik_id": "https://www.detik.com/search?query={query}",
-
-                # --- Academic/Scientific Search Engines ---
-                "google_scholar": "https://scholar.google.com/scholar?q={query}",
-                "semantic_scholar": "https://www.semanticscholar.org/search?q={query}",
-                "pubmed": "https://pubmed.ncbi.nlm.nih.gov/?term={query}",
-                "researchgate": "https://www.researchgate.net/search?q={query}",
-                "academia_edu": "https://www.academia.edu/search?q={query}",
-                "jstor": "https://www.jstor.org/action/doBasicSearch?Query={query}",
-                "sciencedirect": "https://www.sciencedirect.com/search?qs={query}",
-                "ieee_xplore": "https://ieeexplore.ieee.org/search/searchresult.jsp?queryText={query}",
-                "arxiv": "https://arxiv.org/search/?query={query}&searchtype=all&source=header",
-                "philpapers": "https://philpapers.org/s/{query}",
-                "ssrn": "https://papers.ssrn.com/sol3/results.cfm?q={query}",
-
-                # --- Social Media Platforms (for searching within platforms) ---
-                "twitter": "https://twitter.com/search?q={query}",
-                "instagram": "https://www.instagram.com/explore/tags/{query}/",
-                "tiktok": "https://www.tiktok.com/tag/{query}",
-                "facebook": "https://www.facebook.com/search/top/?q={query}",
-                "reddit": "https://www.reddit.com/search/?q={query}",
-                "linkedin": "https://www.linkedin.com/search/results/all/?keywords={query}",
-                "tumblr": "https://www.tumblr.com/search/{query}",
-                "pinterest_social": "https://www.pinterest.com/search/pins/?q={query}", # Duplicate with images, but relevant here too
-
-                # --- Shopping/E-commerce Sites ---
-                "amazon": "https://www.amazon.com/s?k={query}",
-                "tokopedia": "https://www.tokopedia.com/search?st=product&q={query}",
-                "shopee": "https://shopee.co.id/search?keyword={query}",
-                "ebay": "https://www.ebay.com/sch/i.html?_nkw={query}",
-                "etsy": "https://www.etsy.com/search?q={query}",
-                "alibaba": "https://www.alibaba.com/trade/search?SearchText={query}",
-
-                # --- Q&A Sites ---
-                "quora": "https://www.quora.com/search?q={query}",
-                "stackoverflow": "https://stackoverflow.com/search?q={query}",
-                "wikihow": "https://www.wikihow.com/wikiHow/search?q={query}",
-                "superuser_se": "https://superuser.com/search?q={query}",
-                "ask_ubuntu_se": "https://askubuntu.com/search?q={query}",
-                "server_fault_se": "https://serverfault.com/search?q={query}",
-                "math_stack_exchange": "https://math.stackexchange.com/search?q={query}",
-                "physics_stack_exchange": "https://physics.stackexchange.com/search?q={query}",
-                "chemistry_stack_exchange": "https://chemistry.stackexchange.com/search?q={query}",
-            }
-            self.save_engines(default_engines)
-            return default_engines
-        
+        return self.engine_store.load()
+
     def save_engines(self, engines):
-        """Saves the list of search engines to a JSON file."""
-        with open(self.engines_file, 'w') as f:
-            json.dump(engines, f, indent=4)
+        """Saves the list of search engines to a JSON file (shortly after, together with further changes)."""
+        self.engine_store.save(engines)
+
+    def poll_engines_file(self):
+        """Applies outside edits of the engine file to the engine lists, then checks again later."""
+        changes = None if self._search_in_progress else self.engine_store.poll() # Searches read available_engines
+        if changes is not None:
+            changed, removed = changes
+            for name in removed:
+                self.available_engines.pop(name, None)
+            self.available_engines.update(changed)
+            self.update_main_combobox()
+            self.update_all_category_listboxes()
+            if self._manage_window is not None and self._manage_window.winfo_exists():
+                self.update_engines_listbox()
+        self.after(ENGINES_POLL_MS, self.poll_engines_file)
 
     def load_config(self):
         """Loads application configuration from a file and applies the theme."""
@@ -290,15 +242,150 @@ class SearchApp(ctk.CTk):
                     config = json.load(f)
                     if 'theme' in config:
                         ctk.set_appearance_mode(config['theme'])
-            except json.JSONDecodeError:
+                    self.max_concurrent_searches = int(config.get('max_concurrent_searches', self.max_concurrent_searches))
+                    self.per_host_delay = float(config.get('per_host_delay', self.per_host_delay))
+                    self.parse_workers = int(config.get('parse_workers', self.parse_workers))
+                    if isinstance(config.get('http'), dict):
+                        self.http_settings.update({k: v for k, v in config['http'].items() if k in DEFAULT_HTTP_SETTINGS})
+                    if isinstance(config.get('response'), dict):
+                        self.response_settings.update({k: v for k, v in config['response'].items() if k in DEFAULT_RESPONSE_SETTINGS})
+                    if isinstance(config.get('rate_limit'), dict):
+                        self.rate_limit_settings.update({k: v for k, v in config['rate_limit'].items() if k in DEFAULT_RATE_LIMIT_SETTINGS})
+                    if isinstance(config.get('cache'), dict):
+                        self.cache_settings.update({k: v for k, v in config['cache'].items() if k in DEFAULT_CACHE_SETTINGS})
+                    self.fetch_backend_name = config.get('fetch_backend', self.fetch_backend_name)
+                    if isinstance(config.get('async'), dict):
+                        self.async_settings.update({k: v for k, v in config['async'].items() if k in DEFAULT_ASYNC_SETTINGS})
+                    if isinstance(config.get('http_cache'), dict):
+                        self.http_cache_settings.update({k: v for k, v in config['http_cache'].items() if k in DEFAULT_HTTP_CACHE_SETTINGS})
+                    if isinstance(config.get('history'), dict):
+                        self.history_settings.update({k: v for k, v in config['history'].items() if k in DEFAULT_HISTORY_SETTINGS})
+                    if isinstance(config.get('enrichment'), dict):
+                        self.enrichment_settings.update({k: v for k, v in config['enrichment'].items() if k in DEFAULT_ENRICHMENT_SETTINGS})
+                    if isinstance(config.get('prefetch'), dict):
+                        self.prefetch_settings.update({k: v for k, v in config['prefetch'].items() if k in DEFAULT_PREFETCH_SETTINGS})
+                    if isinstance(config.get('hedging'), dict):
+                        self.hedge_settings.update({k: v for k, v in config['hedging'].items() if k in DEFAULT_HEDGE_SETTINGS})
+            except (json.JSONDecodeError, TypeError, ValueError):
                 pass
         
     def save_config(self):
         """Saves application configuration to a file."""
-        config = {'theme': ctk.get_appearance_mode()}
+        config = {
+            'theme': ctk.get_appearance_mode(),
+            'max_concurrent_searches': self.max_concurrent_searches,
+            'per_host_delay': self.per_host_delay,
+            'parse_workers': self.parse_workers,
+            'http': self.http_settings,
+            'response': self.response_settings,
+            'rate_limit': self.rate_limit_settings,
+            'cache': self.cache_settings,
+            'http_cache': self.http_cache_settings,
+            'history': self.history_settings,
+            'fetch_backend': self.fetch_backend_name,
+            'async': self.async_settings,
+            'hedging': self.hedge_settings,
+            'enrichment': self.enrichment_settings,
+            'prefetch': self.prefetch_settings
+        }
         with open(self.config_file, 'w') as f:
             json.dump(config, f, indent=4)
 
+    def create_result_cache(self):
+        """Creates the result cache from the cache settings, or returns None if caching is disabled."""
+        if not self.cache_settings.get('enabled'):
+            return None
+        try:
+            return ResultCache(self.cache_settings['ttl_seconds'], self.cache_settings['max_entries'], self.cache_settings.get('db_file'))
+        except sqlite3.Error as e:
+            print(f"Could not open result cache database ({e}). Using an in-memory cache.")
+            return ResultCache(self.cache_settings['ttl_seconds'], self.cache_settings['max_entries'])
+
+    def create_http_cache(self):
+        """Creates the cache of raw result pages, or returns None if it is disabled."""
+        if not self.http_cache_settings.get('enabled'):
+            return None
+        try:
+            return HttpCache(self.http_cache_settings.get('db_file') or ":memory:", self.http_cache_settings['max_bytes'])
+        except sqlite3.Error as e:
+            print(f"Could not open HTTP cache database ({e}). Using an in-memory cache.")
+            return HttpCache(":memory:", self.http_cache_settings['max_bytes'])
+
+    def create_fetch_backend(self):
+        """Starts the configured fetch backend; returns None for the thread pool backend."""
+        try:
+            return create_fetch_backend(self.fetch_backend_name, self.async_settings)
+        except (RuntimeError, ValueError) as e:
+            print(f"Could not start the '{self.fetch_backend_name}' fetch backend ({e}). Using threads.")
+            return None
+
+    def create_request_hedger(self):
+        """Creates the request hedger from the hedging settings, or returns None if hedging is disabled."""
+        if not self.hedge_settings.get('enabled'):
+            return None
+        return RequestHedger(**{k: v for k, v in self.hedge_settings.items() if k != 'enabled'})
+
+    def create_page_enricher(self):
+        """Starts fetching page titles and descriptions for shown results, or returns None if it is disabled."""
+        settings = self.enrichment_settings
+        if not settings.get('enabled'):
+            return None
+        try:
+            cache = ResultCache(settings['ttl_seconds'], settings['max_entries'], settings.get('db_file'))
+        except sqlite3.Error as e:
+            print(f"Could not open page metadata database ({e}). Using an in-memory cache.")
+            cache = ResultCache(settings['ttl_seconds'], settings['max_entries'])
+        return PageEnricher(self._on_page_metadata, cache, settings['workers'], settings['max_bytes'], settings['timeout'])
+
+    def _on_page_metadata(self, url, metadata):
+        # Runs on an enrichment thread: the results view picks the metadata up from the queue
+        self._metadata_queue.put((url, metadata))
+        if self.search_history is not None:
+            self.search_history.record_metadata(url, metadata["title"], metadata["description"])
+
+    def create_search_history(self):
+        """Opens the search history store from the history settings, or returns None if it is disabled."""
+        if not self.history_settings.get('enabled') or not self.history_settings.get('db_file'):
+            return None
+        try:
+            return SearchHistory(self.history_settings['db_file'], self.history_settings['max_searches'], self.history_settings['max_age_days'],
+                                 self.history_settings['flush_interval'], self.history_settings['batch_size'])
+        except sqlite3.Error as e:
+            print(f"Could not open search history database ({e}). Search history is disabled.")
+            return None
+
+    def on_close(self):
+        """Writes the pending search history and engine changes before the main window closes."""
+        if self._cancel_token is not None:
+            self._cancel_token.cancel()
+        self.tab_opener.close()
+        self._prefetch_token.cancel()
+        if self.page_prefetcher is not None:
+            self.page_prefetcher.close()
+        if self.page_enricher is not None:
+            self.page_enricher.close()
+        if self.search_history is not None:
+            self.search_history.close()
+        if self.fetch_backend is not None:
+            self.fetch_backend.close()
+        if self.request_hedger is not None:
+            self.request_hedger.close()
+        if self.parser_pool is not None:
+            self.parser_pool.shutdown()
+        self.engine_store.flush()
+        self.destroy()
+
+    def clear_result_cache(self):
+        """Clears all cached search results and result pages."""
+        if self.result_cache is not None:
+            self.result_cache.clear()
+        if self.http_cache is not None:
+            self.http_cache.clear()
+        if self.page_enricher is not None:
+            self.page_enricher.cache.clear()
+            self._page_metadata = {}
+        self.status_label.configure(text="Result cache cleared.")
+
     def toggle_theme(self):
         """Toggles the theme between light and dark using CustomTkinter."""
         current_mode = ctk.get_appearance_mode()
@@ -336,11 +423,32 @@ class SearchApp(ctk.CTk):
         self.open_browser_checkbox = ctk.CTkCheckBox(input_frame, text="Open in Browser Automatically (Each Result)", variable=self.open_browser_var)
         self.open_browser_checkbox.grid(row=2, column=0, columnspan=2, sticky="w", pady=5)
 
+        self.bypass_cache_var = ctk.BooleanVar(value=False)
+        self.bypass_cache_checkbox = ctk.CTkCheckBox(input_frame, text="Bypass Cache", variable=self.bypass_cache_var)
+        self.bypass_cache_checkbox.grid(row=2, column=2, sticky="w", padx=5, pady=5)
+
+        ctk.CTkLabel(input_frame, text="Stop After N Unique Results:").grid(row=3, column=0, sticky="w", pady=5)
+        self.max_results_entry = ctk.CTkEntry(input_frame, width=80, placeholder_text="all")
+        self.max_results_entry.grid(row=3, column=1, sticky="w", padx=5, pady=5)
+
         self.search_button = ctk.CTkButton(input_frame, text="Search", command=self.start_search_thread)
-        self.search_button.grid(row=3, column=0, columnspan=3, pady=10)
+        self.search_button.grid(row=4, column=0, columnspan=2, pady=10)
+
+        self.stop_button = ctk.CTkButton(input_frame, text="Stop", command=self.stop_search, state="disabled")
+        self.stop_button.grid(row=4, column=2, padx=5, pady=10)
 
         self.theme_toggle_button = ctk.CTkButton(input_frame, text="Toggle Theme (Light/Dark)", command=self.toggle_theme)
-        self.theme_toggle_button.grid(row=4, column=0, columnspan=3, pady=5)
+        self.theme_toggle_button.grid(row=5, column=0, columnspan=3, pady=5)
+
+        self.clear_cache_button = ctk.CTkButton(input_frame, text="Clear Cache", command=self.clear_result_cache)
+        self.clear_cache_button.grid(row=6, column=0, columnspan=2, pady=5)
+
+        self.history_button = ctk.CTkButton(input_frame, text="Search History", command=self.open_history_window,
+                                            state="normal" if self.search_history is not None else "disabled")
+        self.history_button.grid(row=6, column=2, padx=5, pady=5)
+
+        self.metrics_button = ctk.CTkButton(input_frame, text="Engine Metrics", command=self.open_metrics_window)
+        self.metrics_button.grid(row=7, column=0, columnspan=3, pady=5)
 
         self.progress_frame = ctk.CTkFrame(left_column_frame, fg_color="transparent")
         self.progress_frame.pack(fill="x", pady=5, padx=5)
@@ -356,10 +464,26 @@ class SearchApp(ctk.CTk):
         results_frame.pack(fill="both", expand=True, padx=5, pady=10)
         
         ctk.CTkLabel(results_frame, text="Search Results", font=ctk.CTkFont(weight="bold")).pack(pady=5)
+        self.results_view_button = ctk.CTkSegmentedButton(results_frame, values=[RESULTS_VIEW_BY_ENGINE, RESULTS_VIEW_MERGED],
+                                                          command=lambda view: self.show_results_page(0))
+        self.results_view_button.set(RESULTS_VIEW_BY_ENGINE)
+        self.results_view_button.pack(pady=(0, 5))
         self.results_text = ctk.CTkTextbox(results_frame, wrap="word", width=55, height=20)
         self.results_text.pack(fill="both", expand=True)
         self.results_text.configure(state="disabled")
 
+        results_nav_frame = ctk.CTkFrame(results_frame, fg_color="transparent")
+        results_nav_frame.pack(fill="x", pady=(5, 0))
+        self.prev_page_button = ctk.CTkButton(results_nav_frame, text="< Previous", width=90, command=lambda: self.show_results_page(self._results_page - 1))
+        self.prev_page_button.pack(side="left", padx=5)
+        self.next_page_button = ctk.CTkButton(results_nav_frame, text="Next >", width=90, command=lambda: self.show_results_page(self._results_page + 1))
+        self.next_page_button.pack(side="right", padx=5)
+        self.load_more_button = ctk.CTkButton(results_nav_frame, text="Load More", width=90, state="disabled", command=self.load_more_results)
+        self.load_more_button.pack(side="right", padx=5)
+        self.results_page_label = ctk.CTkLabel(results_nav_frame, text="")
+        self.results_page_label.pack(side="top")
+        self.update_results_page_controls()
+
         # Right Column: Direct Search Engine List (with Tabs)
         right_column_frame = ctk.CTkFrame(main_frame)
         right_column_frame.pack(side="right", fill="both", padx=(10, 0))
@@ -384,7 +508,7 @@ class SearchApp(ctk.CTk):
         url_template = self.available_engines.get(engine_key)
         if url_template:
             if query:
-                full_url = url_template.format(query=query)
+                full_url = engine_page_url(url_template, query)
                 messagebox.showinfo("Opening Browser", f"Opening {engine_key.replace('_', ' ').title()} with search for '{query}'...")
             else:
                 # Try to extract base URL. This might need adjustment for very non-standard URLs.
@@ -413,55 +537,11 @@ class SearchApp(ctk.CTk):
             messagebox.showerror("Error", f"URL for {engine_key.replace('_', ' ').title()} not found.")
 
     def get_categorized_engines(self):
-        """Helper function to categorize engines based on common keywords."""
-        categorized = {k: [] for k in self.engine_categories.keys()}
-        
-        for engine_key in sorted(self.available_engines.keys()):
-            added_to_category = False
-            lower_key = engine_key.lower()
-
-            # Prioritize specific categories
-            # Images
-            if any(k in lower_key for k in ["image", "images", "photo", "unsplash", "pexels", "pixabay", "shutterstock", "deviantart", "getty_images", "google_arts_culture"]):
-                categorized["Images"].append(engine_key)
-                added_to_category = True
-            # Videos
-            if any(k in lower_key for k in ["video", "youtube", "vimeo", "dailymotion", "twitch", "metacafe", "internet_archive_videos"]):
-                categorized["Videos"].append(engine_key)
-                added_to_category = True
-            # News
-            if any(k in lower_key for k in ["news", "reuters", "bbc", "cnn", "al_jazeera", "guardian", "times", "press", "kompas", "detik"]):
-                categorized["News"].append(engine_key)
-                added_to_category = True
-            # Academic
-            if any(k in lower_key for k in ["scholar", "pubmed", "semantic", "wolframalpha", "researchgate", "academia", "jstor", "sciencedirect", "ieee", "arxiv", "philpapers", "ssrn"]):
-                categorized["Academic"].append(engine_key)
-                added_to_category = True
-            # Social
-            if any(k in lower_key for k in ["twitter", "instagram", "tiktok", "facebook", "reddit", "linkedin", "tumblr", "pinterest_social"]):
-                categorized["Social"].append(engine_key)
-                added_to_category = True
-            # Shopping
-            if any(k in lower_key for k in ["amazon", "shop", "tokopedia", "shopee", "ebay", "etsy", "alibaba"]):
-                categorized["Shopping"].append(engine_key)
-                added_to_category = True
-            # Q&A
-            if any(k in lower_key for k in ["quora", "stack", "answers", "ask", "wikihow", "superuser", "ubuntu", "server_fault", "math_stack_exchange", "physics_stack_exchange", "chemistry_stack_exchange"]):
-                categorized["Q&A"].append(engine_key)
-                added_to_category = True
-            
-            # If not added to a specific category, put it in "General"
-            if not added_to_category:
-                categorized["General"].append(engine_key)
-                
-        # Remove duplicates within each category and sort
-        for cat in categorized:
-            categorized[cat] = sorted(list(set(categorized[cat])))
-            
-        return categorized
+        """Helper function to categorize engines (explicit categories, else keywords in their names)."""
+        return categorize_engines(self.available_engines.keys())
 
     def update_all_category_listboxes(self):
-        """Updates all Listboxes in each tab."""
+        """Updates all Listboxes in each tab, only adding and removing the engines that changed."""
         dynamic_categories = self.get_categorized_engines()
 
         for category_name in self.engine_categories.keys():
@@ -469,23 +549,31 @@ class SearchApp(ctk.CTk):
             if not scrollable_frame:
                 continue
 
-            # Clear all existing widgets within the scrollable_frame
-            for child in scrollable_frame.winfo_children():
-                child.destroy()
-            
+            labels = self.category_labels[category_name]
             engines_in_this_tab = dynamic_categories.get(category_name, [])
-            
-            for engine_key in engines_in_this_tab:
-                display_name = engine_key.replace('_', ' ').title() 
-                label = ctk.CTkLabel(scrollable_frame, text=display_name, anchor="w")
-                label.pack(fill="x", pady=2, padx=5)
-                # Binding double-click event
-                label.bind("<Double-Button-1>", lambda e, name=engine_key: self.open_selected_engine_in_browser_ctk(name))
+            wanted = set(engines_in_this_tab)
+            for engine_key in [key for key in labels if key not in wanted]:
+                labels.pop(engine_key).destroy()
+
+            # Walk the sorted list backwards so each new label can be packed before its successor
+            next_label = None
+            for engine_key in reversed(engines_in_this_tab):
+                label = labels.get(engine_key)
+                if label is None:
+                    display_name = engine_key.replace('_', ' ').title() 
+                    label = labels[engine_key] = ctk.CTkLabel(scrollable_frame, text=display_name, anchor="w")
+                    if next_label is None:
+                        label.pack(fill="x", pady=2, padx=5)
+                    else:
+                        label.pack(fill="x", pady=2, padx=5, before=next_label)
+                    # Binding double-click event
+                    label.bind("<Double-Button-1>", lambda e, name=engine_key: self.open_selected_engine_in_browser_ctk(name))
+                next_label = label
 
     def start_search_thread(self, event=None):
         """Starts the search in a separate thread to keep the GUI responsive."""
         if self._search_in_progress:
-            messagebox.showinfo("Warning", "A search is already in progress. Please wait until it completes.")
+            messagebox.showinfo("Warning", "A search is already in progress. Please wait until it completes or press Stop.")
             return
 
         query = self.query_entry.get().strip()
@@ -497,78 +585,366 @@ class SearchApp(ctk.CTk):
         if not selected_engine:
             messagebox.showwarning("Warning", "Please select a search engine.")
             return
+
+        max_results_text = self.max_results_entry.get().strip()
+        max_unique_results = None
+        if max_results_text:
+            if not max_results_text.isdigit() or int(max_results_text) == 0:
+                messagebox.showwarning("Warning", "The number of results to stop after must be a positive whole number.")
+                return
+            max_unique_results = int(max_results_text)
             
         self._search_in_progress = True
+        self._prefetch_token.cancel() # Pages prefetched for the previous query are of no use now
+        self._prefetch_token = CancellationToken()
+        if self.page_prefetcher is not None:
+            self.page_prefetcher.clear()
+        self._next_pages = {}
+        self._prefetched_targets = frozenset()
         self.set_gui_state_on_search(True)
-        self.results_text.configure(state="normal")
-        self.results_text.delete("1.0", "end")
-        self.results_text.configure(state="disabled")
+        self.clear_results()
         self.status_label.configure(text="Starting search...")
         self.progress_bar.start()
 
-        search_thread = threading.Thread(target=self.perform_search_logic, args=(query, selected_engine, self.open_browser_var.get()))
+        self._results_queue = queue.Queue()
+        self._search_done_count = 0
+        self._search_cache_hits = 0
+        self._search_total = len(self.available_engines) if selected_engine == "All Engines" else 1
+        self._search_query = query
+        self._open_in_browser = self.open_browser_var.get()
+        self._tab_limit_noted = False
+        self.tab_opener.start_search()
+        self._cancel_token = CancellationToken()
+        self.after(RESULTS_DRAIN_INTERVAL_MS, self._drain_results_queue)
+
+        search_thread = threading.Thread(target=self.perform_search_logic, args=(query, selected_engine, self._open_in_browser, not self.bypass_cache_var.get(),
+                                                                                 self._cancel_token, max_unique_results))
         search_thread.daemon = True # Allow thread to die if main app closes
         search_thread.start()
 
-    def perform_search_logic(self, query, selected_engine, open_in_browser):
-        """Main logic for performing search on one or all search engines."""
+    def perform_search_logic(self, query, selected_engine, open_in_browser, use_cache=True, cancel_token=None, max_unique_results=None):
+        """Main logic for performing search on one or all search engines.
+
+        Runs on the search thread: every engine result is pushed to self._results_queue
+        as soon as it arrives, followed by a None sentinel once all engines are done or
+        the search is stopped.
+        """
         engines_to_search = []
         if selected_engine == "All Engines":
             engines_to_search = sorted(self.available_engines.keys())
         else:
             engines_to_search = [selected_engine]
 
-        total_engines = len(engines_to_search)
-        results_buffer = []
+        history_id = self.search_history.record_search(query) if self.search_history is not None else None
+        self._history_id = history_id
+        try:
+            # Engines are queried concurrently; the rate limiter keeps the per-host spacing
+            for result_data in iter_search_results(query, engines_to_search, self.available_engines,
+                                                   self.max_concurrent_searches, self.per_host_delay,
+                                                   cache=self.result_cache, use_cache=use_cache, parser_pool=self.parser_pool,
+                                                   rate_limiter=self.rate_limiter, circuit_breaker=self.circuit_breaker,
+                                                   cancel_token=cancel_token, max_unique_results=max_unique_results,
+                                                   backend=self.fetch_backend, http_cache=self.http_cache, metrics=self.engine_metrics,
+                                                   hedger=self.request_hedger):
+                if history_id is not None:
+                    # Recorded before it is shown, so page metadata fetched for it finds the rows
+                    self.search_history.record_result(history_id, result_data)
+                self._results_queue.put(result_data)
+        finally:
+            self._results_queue.put(None) # Search finished
+
+    def load_more_results(self):
+        """Loads the next result page of every engine that may have more results, below the current ones."""
+        if self._search_in_progress or not self._next_pages:
+            return
+        next_pages = dict(self._next_pages)
+        self._search_in_progress = True
+        self.set_gui_state_on_search(True)
+        self.status_label.configure(text=f"Loading more results for '{self._search_query}'...")
 
-        for i, engine_name in enumerate(engines_to_search):
-            # Update status on GUI (must be on main thread)
-            self.after(0, lambda e=engine_name, i=i, t=total_engines: 
-                        self.status_label.configure(text=f"Searching for '{query}' on {e.replace('_', ' ').title()} ({i+1}/{t})..."))
-            
-            engine_url_template = self.available_engines.get(engine_name)
-            if not engine_url_template:
-                results_buffer.append({"engine": engine_name, "status": "Error", "message": f"URL for '{engine_name}' not found.", "results": []})
-                continue
+        self._results_queue = queue.Queue()
+        self._search_done_count = 0
+        self._search_cache_hits = 0
+        self._search_total = len(next_pages)
+        self._cancel_token = CancellationToken()
+        self.after(RESULTS_DRAIN_INTERVAL_MS, self._drain_results_queue)
 
-            result_data = search_engine(query, engine_name, engine_url_template)
-            results_buffer.append(result_data)
-            
-            # Add a small delay between searches to avoid IP blocking
-            if i < total_engines - 1:
-                time.sleep(0.5)
+        load_thread = threading.Thread(target=self.perform_load_more, args=(self._search_query, next_pages, self._cancel_token, self._history_id))
+        load_thread.daemon = True
+        load_thread.start()
+
+    def perform_load_more(self, query, next_pages, cancel_token, history_id=None):
+        """Runs on a worker thread: queues the next pages, taking prefetched ones first.
+
+        Like the first page, every page is recorded under the search's `history_id`.
+        """
+        def show(result_data):
+            if history_id is not None:
+                self.search_history.record_result(history_id, result_data)
+            self._results_queue.put(result_data)
+
+        try:
+            pages_to_fetch = {}
+            for engine_name, page in next_pages.items():
+                result_data = self.page_prefetcher.take(engine_name, query, page) if self.page_prefetcher is not None else None
+                if result_data is None or result_data["status"] == "Cancelled":
+                    pages_to_fetch.setdefault(page, []).append(engine_name)
+                else:
+                    show(result_data) # Already loaded in the background: no network round trip
+            for page, engine_names in sorted(pages_to_fetch.items()):
+                for result_data in self._iter_page_results(query, engine_names, page, cancel_token):
+                    show(result_data)
+        finally:
+            self._results_queue.put(None)
+
+    def _iter_page_results(self, query, engine_names, page, cancel_token, max_workers=None):
+        return iter_search_results(query, engine_names, self.available_engines, max_workers or self.max_concurrent_searches, self.per_host_delay,
+                                   cache=self.result_cache, parser_pool=self.parser_pool, rate_limiter=self.rate_limiter,
+                                   circuit_breaker=self.circuit_breaker, cancel_token=cancel_token, backend=self.fetch_backend,
+                                   http_cache=self.http_cache, metrics=self.engine_metrics, hedger=self.request_hedger, page=page)
+
+    def prefetch_next_pages(self):
+        """Starts loading the next page of the engines whose results are shown, so Load More has them ready."""
+        if self.page_prefetcher is None or self._search_in_progress or not self._next_pages:
+            return
+        shown_engines = {self._url_engines[url] for url in self._page_urls if url in self._url_engines}
+        targets = frozenset((engine_name, self._next_pages[engine_name]) for engine_name in shown_engines & self._next_pages.keys())
+        if targets == self._prefetched_targets:
+            return # Same engines on screen as last time (e.g. a re-render): nothing new to load
+        self._prefetched_targets = targets
+        query, token = self._search_query, self._prefetch_token
+        for engine_name, page in sorted(targets):
+            fetch = lambda engine_name=engine_name, page=page: next(self._iter_page_results(query, [engine_name], page, token, 1), None)
+            self.page_prefetcher.prefetch(engine_name, query, page, fetch)
+
+    def _drain_results_queue(self):
+        """Renders queued engine results in batches on the Tk main loop."""
+        batch = []
+        finished = False
+        try:
+            while len(batch) < RESULTS_DRAIN_BATCH_SIZE:
+                result_data = self._results_queue.get_nowait()
+                if result_data is None:
+                    finished = True
+                    break
+                batch.append(result_data)
+        except queue.Empty:
+            pass
+
+        if batch:
+            self._search_done_count += len(batch)
+            self._search_cache_hits += sum(1 for r in batch if r.get("cached"))
+            self.append_results(batch, self._open_in_browser)
+            last_engine = batch[-1]["engine"].replace('_', ' ').title()
+            self.status_label.configure(text=f"Searching for '{self._search_query}': {last_engine} finished ({self._search_done_count}/{self._search_total}, {self._search_cache_hits} from cache)...")
+
+        if finished:
+            self.reset_gui_state()
+            self.prefetch_next_pages()
+            if self._cancel_token is not None and self._cancel_token.cancelled:
+                self.status_label.configure(text=f"Search stopped ({self._search_done_count}/{self._search_total} engines finished).")
+            elif self._search_cache_hits:
+                self.status_label.configure(text=f"Search Complete. {self._search_cache_hits} of {self._search_done_count} engine(s) served from cache.")
+        else:
+            self.after(RESULTS_DRAIN_INTERVAL_MS, self._drain_results_queue)
 
-        # After all searches are complete, update GUI (on main thread)
-        self.after(0, lambda: self.display_all_results(results_buffer, open_in_browser))
-        self.after(0, self.reset_gui_state)
+    def stop_search(self):
+        """Cancels the running search: in-flight requests are aborted and queued engines skipped."""
+        if self._search_in_progress and self._cancel_token is not None:
+            self._cancel_token.cancel()
+            self.tab_opener.cancel()
+            self.stop_button.configure(state="disabled")
+            self.status_label.configure(text="Stopping search...")
 
     def display_all_results(self, all_results_data, open_in_browser):
-        """Displays collected search results in the CTkTextbox."""
+        """Displays collected search results in the CTkTextbox, replacing any previous content."""
+        self.clear_results()
+        self.append_results(all_results_data, open_in_browser)
+
+    def _track_next_page(self, result_data, page):
+        # An engine may have another page if this one had results and its URL template takes a page number
+        engine_name = result_data["engine"]
+        url_template = self.available_engines.get(engine_name, "")
+        if result_data["status"] == "Success" and result_data["results"] and supports_pages(url_template):
+            self._next_pages[engine_name] = page + 1
+        elif result_data["status"] in ("Success", "Error"): # Cancelled or skipped pages can be tried again
+            self._next_pages.pop(engine_name, None)
+
+    def clear_results(self):
+        """Removes all results from the results view."""
+        self._result_lines = []
+        self._results_page = 0
+        self._url_engines = {}
+        self._engine_result_counts = {}
+        if self.page_enricher is not None:
+            self.page_enricher.cancel() # Pages of the previous search are no longer shown
+        self._page_metadata = {}
+        self._result_index = RankFusion()
+        self._merged_lines = None
         self.results_text.configure(state="normal")
         self.results_text.delete("1.0", "end")
+        self.results_text.configure(state="disabled")
+        self._page_urls = set()
+        self.update_results_page_controls()
+
+    def append_results(self, all_results_data, open_in_browser):
+        """Appends search results for one or more engines to the results view.
+
+        Lines are added to self._result_lines; only those falling on the page currently
+        shown are inserted into the textbox, so rendering cost does not grow with the
+        total number of results. In the merged view the current page is re-rendered
+        from the updated ranking instead.
+        """
+        first_new_line = len(self._result_lines)
+        lines = self._result_lines
 
         for result_data in all_results_data:
-            self.results_text.insert("end", f"=== Results from {result_data['engine'].replace('_', ' ').title()} ===\n", "header_tag")
+            cached_note = " (cached)" if result_data.get("cached") else ""
+            page = result_data.get("page", 1)
+            page_note = f" (page {page})" if page > 1 else ""
+            lines.append((f"=== Results from {result_data['engine'].replace('_', ' ').title()}{page_note}{cached_note} ===\n", "header_tag"))
+            self._track_next_page(result_data, page)
             if result_data["status"] == "Success":
                 if result_data["results"]:
+                    for res_url in result_data["results"]:
+                        self._url_engines.setdefault(res_url, result_data["engine"])
+                    # Further pages continue the engine's numbering (pages differ in length between engines)
+                    first_rank = self._engine_result_counts.get(result_data["engine"], 0) + 1
+                    self._engine_result_counts[result_data["engine"]] = first_rank - 1 + len(result_data["results"])
+                    # Pages already listed for an earlier engine are only counted, not repeated
+                    new_urls = set(self._result_index.add(result_data["engine"], result_data["results"], first_rank))
+                    duplicate_count = 0
                     for i, res_url in enumerate(result_data["results"]):
-                        self.results_text.insert("end", f"{i+1}. {res_url}\n")
+                        if res_url not in new_urls:
+                            duplicate_count += 1
+                            continue
+                        new_urls.discard(res_url)
+                        lines.append((f"{first_rank + i}. {res_url}\n", None, res_url))
                         if open_in_browser:
-                            try:
-                                webbrowser.open_new_tab(res_url)
-                                # Small delay to avoid opening too many tabs at once
-                                time.sleep(0.1) 
-                            except Exception as e:
-                                self.results_text.insert("end", f"  Failed to open URL: {res_url} ({e})\n")
+                            # Queued for the background opener, which paces the tabs
+                            if not self.tab_opener.open(res_url) and self.tab_opener.limit_reached and not self._tab_limit_noted:
+                                lines.append((f"  (Opened the first {self.tab_opener.max_per_search} results in the browser; further results are not opened)\n", None))
+                                self._tab_limit_noted = True
+                    if duplicate_count:
+                        lines.append((f"  ({duplicate_count} more result(s) already listed for other engines)\n", None))
                 else:
-                    self.results_text.insert("end", f"No results found from {result_data['engine'].replace('_', ' ').title()} for this query.\n")
+                    lines.append((f"No results found from {result_data['engine'].replace('_', ' ').title()} for this query.\n", None))
+            elif result_data["status"] == "Skipped":
+                lines.append((f"Skipped: {result_data['message']}\n", "error_tag"))
             else:
-                self.results_text.insert("end", f"An error occurred: {result_data['message']}\n", "error_tag")
+                lines.append((f"An error occurred: {result_data['message']}\n", "error_tag"))
             
-            self.results_text.insert("end", "\n" + "="*50 + "\n\n")
-        
+            lines.append(("\n" + "="*50 + "\n\n", None))
+
+        self._merged_lines = None
+        if self.results_view_button.get() == RESULTS_VIEW_MERGED:
+            self.show_results_page(self._results_page, scroll_to_top=False)
+            return
+
+        # Only materialize the new lines that land on the visible page
+        page_start = self._results_page * RESULTS_PAGE_SIZE
+        page_end = page_start + RESULTS_PAGE_SIZE
+        visible_start = max(first_new_line, page_start)
+        visible_end = min(len(lines), page_end)
+        if visible_start < visible_end:
+            self._insert_result_lines(lines[visible_start:visible_end])
+        self.update_results_page_controls()
+
+    def show_results_page(self, page, scroll_to_top=True):
+        """Renders page `page` of the active results view into the textbox."""
+        page = max(0, min(page, self._results_page_count() - 1))
+        self._results_page = page
+        self.results_text.configure(state="normal")
+        self.results_text.delete("1.0", "end")
+        self.results_text.configure(state="disabled")
+        self._page_urls = set()
+        start = page * RESULTS_PAGE_SIZE
+        self._insert_result_lines(self._active_result_lines()[start:start + RESULTS_PAGE_SIZE])
+        if scroll_to_top:
+            self.results_text.see("1.0")
+        self.update_results_page_controls()
+        self.prefetch_next_pages() # Engines shown on this page are the ones being read
+
+    def _active_result_lines(self):
+        if self.results_view_button.get() != RESULTS_VIEW_MERGED:
+            return self._result_lines
+        if self._merged_lines is None:
+            self._merged_lines = self._build_merged_lines()
+        return self._merged_lines
+
+    def _build_merged_lines(self):
+        """Builds the merged view: every unique URL once, best fused rank first."""
+        ranking = self._result_index.ranked()
+        engine_count = len({engine for entry in ranking for engine, _ in entry["sources"]})
+        lines = [(f"=== Merged Results: {len(ranking)} unique from {engine_count} engine(s) ===\n", "header_tag")]
+        for i, entry in enumerate(ranking):
+            sources = ", ".join(f"{engine.replace('_', ' ').title()} #{rank}" for engine, rank in entry["sources"])
+            lines.append((f"{i+1}. {entry['url']}  ({sources})\n", None, entry['url']))
+        return lines
+
+    def update_results_page_controls(self):
+        """Updates the page label and enables/disables the page buttons."""
+        page_count = self._results_page_count()
+        self.results_page_label.configure(text=f"Page {self._results_page + 1}/{page_count}")
+        self.prev_page_button.configure(state="normal" if self._results_page > 0 else "disabled")
+        self.next_page_button.configure(state="normal" if self._results_page < page_count - 1 else "disabled")
+
+    def _results_page_count(self):
+        return max(1, -(-len(self._active_result_lines()) // RESULTS_PAGE_SIZE))
+
+    def _insert_result_lines(self, lines):
+        # One insert() per run of lines sharing a tag instead of one per line
+        self.results_text.configure(state="normal")
+        run_text, run_tag = [], None
+        new_urls = []
+        for text, tag in self._with_page_metadata(lines, new_urls):
+            if run_text and tag != run_tag:
+                self.results_text.insert("end", "".join(run_text), run_tag)
+                run_text = []
+            run_text.append(text)
+            run_tag = tag
+        if run_text:
+            self.results_text.insert("end", "".join(run_text), run_tag)
         self.results_text.configure(state="disabled")
-        self.results_text.see("end") # Scroll to bottom
+        self._page_urls.update(new_urls)
+        if self.page_enricher is not None:
+            missing = [url for url in new_urls if url not in self._page_metadata]
+            if missing:
+                self.page_enricher.request(missing) # Shown results first; the rest is fetched when its page is opened
+
+    def _with_page_metadata(self, lines, urls):
+        """Yields (text, tag) for `lines`, adding the known title and description below each result URL.
+
+        The URLs of the result lines are appended to `urls`.
+        """
+        for line in lines:
+            yield line[0], line[1]
+            if len(line) < 3:
+                continue
+            urls.append(line[2])
+            metadata = self._page_metadata.get(line[2])
+            if metadata is None:
+                continue
+            if metadata["title"]:
+                yield f"    {metadata['title']}\n", "title_tag"
+            if metadata["description"]:
+                yield f"    {metadata['description']}\n", "snippet_tag"
+
+    def _drain_metadata_queue(self):
+        """Re-renders the shown page once titles or descriptions of its results have arrived."""
+        page_changed = False
+        try:
+            while True:
+                url, metadata = self._metadata_queue.get_nowait()
+                self._page_metadata[url] = metadata
+                page_changed |= url in self._page_urls
+        except queue.Empty:
+            pass
+        if page_changed:
+            scroll_position = self.results_text.yview()[0]
+            self.show_results_page(self._results_page, scroll_to_top=False)
+            self.results_text.yview_moveto(scroll_position)
+        self.after(ENRICHMENT_DRAIN_INTERVAL_MS, self._drain_metadata_queue)
 
     def set_gui_state_on_search(self, disabled):
         """Sets the state (enabled/disabled) of GUI widgets during search."""
@@ -578,6 +954,10 @@ class SearchApp(ctk.CTk):
         self.engine_combobox.configure(state=state)
         self.manage_engines_button.configure(state=state)
         self.theme_toggle_button.configure(state=state)
+        self.clear_cache_button.configure(state=state)
+        self.max_results_entry.configure(state=state)
+        self.stop_button.configure(state="normal" if disabled else "disabled")
+        self.load_more_button.configure(state="normal" if not disabled and self._next_pages else "disabled")
         if disabled:
             self.progress_bar.start()
         else:
@@ -590,13 +970,143 @@ class SearchApp(ctk.CTk):
         self._search_in_progress = False
         self.set_gui_state_on_search(False)
         
+    def open_history_window(self):
+        """Opens a window for searching the results of past searches (no network access)."""
+        history_window = ctk.CTkToplevel(self)
+        history_window.title("Search History")
+        history_window.geometry("700x450")
+        history_window.transient(self)
+
+        search_frame = ctk.CTkFrame(history_window, fg_color="transparent")
+        search_frame.pack(fill="x", padx=10, pady=10)
+        history_entry = ctk.CTkEntry(search_frame, placeholder_text="Words in past queries, URLs, titles or descriptions")
+        history_entry.pack(side="left", fill="x", expand=True, padx=(0, 5))
+        history_text = ctk.CTkTextbox(history_window, wrap="word")
+        history_text.pack(fill="both", expand=True, padx=10, pady=(0, 10))
+
+        show_matches = lambda event=None: self.show_history_matches(history_entry.get(), history_text)
+        history_entry.bind("<Return>", show_matches)
+        ctk.CTkButton(search_frame, text="Search", width=90, command=show_matches).pack(side="right")
+        show_matches()
+        history_entry.focus_set()
+
+    def show_history_matches(self, text, history_text):
+        """Lists past results matching `text`, or the most recent searches if `text` is empty.
+
+        The lookup runs on a worker thread (flushing waits for the history writer), and
+        the lines are shown once it has finished.
+        """
+        self._history_request += 1
+        lines_queue = queue.Queue()
+
+        def look_up():
+            try:
+                lines_queue.put(self._history_match_lines(text))
+            except Exception as e:
+                lines_queue.put([f"Could not read the search history: {e}\n"])
+
+        threading.Thread(target=look_up, daemon=True).start()
+        self._show_history_lines(self._history_request, lines_queue, history_text)
+
+    def _show_history_lines(self, request, lines_queue, history_text):
+        try:
+            lines = lines_queue.get_nowait()
+        except queue.Empty:
+            self.after(RESULTS_DRAIN_INTERVAL_MS, self._show_history_lines, request, lines_queue, history_text)
+            return
+        if request != self._history_request or not history_text.winfo_exists():
+            return # A newer lookup was started, or the window was closed
+        history_text.configure(state="normal")
+        history_text.delete("1.0", "end")
+        history_text.insert("end", "".join(lines))
+        history_text.configure(state="disabled")
+
+    def _history_match_lines(self, text):
+        # Runs on a worker thread
+        self.search_history.flush() # Include the results of the search that just finished
+        lines = []
+        if text.strip():
+            matches = self.search_history.search(text, HISTORY_MATCH_LIMIT)
+            lines.append(f"{len(matches)} past result(s) matching '{text.strip()}':\n\n")
+            for match in matches:
+                searched_at = time.strftime("%Y-%m-%d %H:%M", time.localtime(match["searched_at"]))
+                title = f"{match['title']}\n   " if match["title"] else ""
+                lines.append(f"{title}{match['url']}\n   '{match['query']}' on {match['engine'].replace('_', ' ').title()} #{match['rank']}, {searched_at}\n\n")
+        else:
+            lines.append("Recent searches:\n\n")
+            for query, searched_at in self.search_history.recent_searches():
+                lines.append(f"{time.strftime('%Y-%m-%d %H:%M', time.localtime(searched_at))}  {query}\n")
+        return lines
+
+    def open_metrics_window(self):
+        """Opens a live table of per-engine latency and failures for this session."""
+        metrics_window = ctk.CTkToplevel(self)
+        metrics_window.title("Engine Metrics")
+        metrics_window.geometry("900x450")
+        metrics_window.transient(self)
+
+        controls_frame = ctk.CTkFrame(metrics_window, fg_color="transparent")
+        controls_frame.pack(fill="x", padx=10, pady=10)
+        sort_button = ctk.CTkSegmentedButton(controls_frame, values=[METRICS_SORT_SLOWEST, METRICS_SORT_FAILING])
+        sort_button.set(METRICS_SORT_SLOWEST)
+        sort_button.pack(side="left")
+        ctk.CTkButton(controls_frame, text="Export Prometheus", width=130,
+                      command=lambda: self.export_metrics("prometheus")).pack(side="right", padx=5)
+        ctk.CTkButton(controls_frame, text="Export JSON", width=110, command=lambda: self.export_metrics("json")).pack(side="right", padx=5)
+
+        metrics_text = ctk.CTkTextbox(metrics_window, wrap="none", font=ctk.CTkFont(family="Courier", size=12))
+        metrics_text.pack(fill="both", expand=True, padx=10, pady=(0, 10))
+
+        def refresh():
+            if not metrics_window.winfo_exists():
+                return
+            self.show_engine_metrics(metrics_text, "failing" if sort_button.get() == METRICS_SORT_FAILING else "slowest")
+            metrics_window.after(METRICS_REFRESH_MS, refresh)
+
+        sort_button.configure(command=lambda value: self.show_engine_metrics(metrics_text, "failing" if value == METRICS_SORT_FAILING else "slowest"))
+        refresh()
+
+    def show_engine_metrics(self, metrics_text, sort_by):
+        """Renders the engine metrics summary as a table into `metrics_text`."""
+        rows = self.engine_metrics.summary(sort_by)
+        lines = [f"{'Engine':<28}{'Reqs':>6}{'Errors':>8}{'p50 ms':>9}{'p95 ms':>9}{'Conn':>7}{'TTFB':>7}{'Down':>7}{'Parse':>7}{'KB':>8}{'Links':>7}  Last error\n"]
+        for row in rows:
+            phases = row["phases"]
+            last_error = (row["last_error"] or "")[:60]
+            lines.append(f"{row['engine'][:27]:<28}{row['requests']:>6}{row['error_rate']:>8.0%}{row['p50'] * 1000:>9.0f}{row['p95'] * 1000:>9.0f}"
+                         f"{phases['connect'] * 1000:>7.0f}{phases['ttfb'] * 1000:>7.0f}{phases['download'] * 1000:>7.0f}{phases['parse'] * 1000:>7.0f}"
+                         f"{row['bytes'] / 1024:>8.1f}{row['results']:>7.1f}  {last_error}\n")
+        if not rows:
+            lines.append("\nNo engine requests yet. Metrics cover the requests of this session (cache hits are not counted).\n")
+        else:
+            lines.append(f"\nTimes are over the last {self.engine_metrics.window} requests of each engine; phase columns are means in ms.\n")
+        metrics_text.configure(state="normal")
+        metrics_text.delete("1.0", "end")
+        metrics_text.insert("end", "".join(lines))
+        metrics_text.configure(state="disabled")
+
+    def export_metrics(self, export_format):
+        """Saves the engine metrics as JSON or in the Prometheus text format."""
+        extension = ".json" if export_format == "json" else ".prom"
+        file_path = filedialog.asksaveasfilename(defaultextension=extension, initialfile=f"engine_metrics{extension}")
+        if not file_path:
+            return
+        try:
+            with open(file_path, 'w') as f:
+                if export_format == "json":
+                    json.dump(self.engine_metrics.to_json(), f, indent=4)
+                else:
+                    f.write(self.engine_metrics.to_prometheus())
+        except OSError as e:
+            messagebox.showerror("Export Failed", f"Could not write {file_path}: {e}")
+
     def open_manage_engines_window(self):
         """Opens a new window to manage search engines."""
         if self._search_in_progress:
             messagebox.showwarning("Warning", "Cannot open management window while a search is in progress.")
             return
 
-        manage_window = ctk.CTkToplevel(self)
+        manage_window = self._manage_window = ctk.CTkToplevel(self)
         manage_window.title("Manage Search Engines")
         manage_window.geometry("500x400")
         manage_window.transient(self) # Make the management window appear on top of the main window
@@ -623,26 +1133,37 @@ class SearchApp(ctk.CTk):
         manage_window.protocol("WM_DELETE_WINDOW", lambda: self.on_manage_window_close(manage_window))
 
     def update_engines_listbox(self):
-        """Updates the list of search engines in the management window."""
-        # Clear all existing labels
-        for label in self.engines_labels.values():
-            label.destroy()
-        self.engines_labels = {}
-
-        # Add new labels for each search engine
-        for name, url_template in sorted(self.available_engines.items()):
-            label = ctk.CTkLabel(self.engines_list_scrollable_frame, text=f"{name}: {url_template}", anchor="w")
-            label.pack(fill="x", pady=2, padx=5)
-            label.bind("<Button-1>", lambda e, n=name: self._select_engine_label(e, n))
-            self.engines_labels[name] = label
+        """Updates the list of search engines in the management window, only touching the engines that changed."""
+        # Remove labels of deleted engines
+        for name in [name for name in self.engines_labels if name not in self.available_engines]:
+            self.engines_labels.pop(name).destroy()
+        if self._current_selected_engine in self.engines_labels:
+            self.engines_labels[self._current_selected_engine].configure(fg_color="transparent")
+
+        # Add labels for new engines (packed before their successor to keep the list sorted) and update changed URLs
+        next_label = None
+        for name, url_template in sorted(self.available_engines.items(), reverse=True):
+            text = f"{name}: {url_template}"
+            label = self.engines_labels.get(name)
+            if label is None:
+                label = ctk.CTkLabel(self.engines_list_scrollable_frame, text=text, anchor="w")
+                if next_label is None:
+                    label.pack(fill="x", pady=2, padx=5)
+                else:
+                    label.pack(fill="x", pady=2, padx=5, before=next_label)
+                label.bind("<Button-1>", lambda e, n=name: self._select_engine_label(e, n))
+                self.engines_labels[name] = label
+            elif label.cget("text") != text:
+                label.configure(text=text)
+            next_label = label
             
         self._current_selected_engine = None # Reset selection after update
 
     def _select_engine_label(self, event, engine_name):
         """Handles the selection of a search engine label in the management window."""
-        # Reset color of all labels
-        for label in self.engines_labels.values():
-            label.configure(fg_color="transparent")
+        # Reset color of the previously selected label
+        if self._current_selected_engine in self.engines_labels:
+            self.engines_labels[self._current_selected_engine].configure(fg_color="transparent")
             
         # Set color of the selected label
         event.widget.configure(fg_color=ctk.ThemeManager.theme["CTkButton"]["fg_color"]) # Use button theme color
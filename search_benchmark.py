@@ -0,0 +1,355 @@
+"""Offline benchmarks for fetching and parsing, against a local stand-in for the search engines.
+
+Example:
+    python search_benchmark.py --queries 50 --workers 16 --latency 0.05 -o report.json
+    python search_benchmark.py --queries 50 --workers 16 --latency 0.05 --compare report.json
+
+MockSearchServer serves result pages shaped like Google, Bing, DuckDuckGo and a plain
+"fallback" site on 127.0.0.1, with configurable latency, error and throttling rates.
+Pages recorded with --record (or any <engine>.html files in --fixtures) replace the
+built-in synthetic pages. Every run writes a JSON report; --compare prints the change
+of each metric against an earlier report.
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import statistics
+import sys
+import threading
+import time
+import tracemalloc
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlsplit
+
+from search_core import (
+    DEFAULT_ENGINES_FILE, HTML_PARSER, MAX_RESULTS_PER_ENGINE, REQUEST_HEADERS,
+    HostRateLimiter, create_fetch_backend, engine_page_url, get_http_session, iter_batch_results, load_engines, parse_results, search_engine
+)
+
+BENCHMARK_ENGINES = ("google", "bing", "duckduckgo", "fallback")
+REPORT_VERSION = 1
+
+# --- Synthetic Fixtures ---
+# Built to match the parser rules in search_core.DEFAULT_PARSER_RULES. Each page holds
+# 10 results plus the navigation, inline scripts and ads real result pages carry.
+
+def _page(title, body, padding_kb):
+    script = "<script>var _s=" + json.dumps("x" * 1000) + ";</script>\n"
+    nav = "".join(f'<a href="/settings?tab={i}">Settings {i}</a>' for i in range(20))
+    return (f"<!DOCTYPE html><html><head><title>{title}</title><style>.r{{margin:0}}</style></head>"
+            f"<body><div id=\"nav\">{nav}</div>{script * (padding_kb // 2)}<div id=\"main\">{body}</div>"
+            f"{script * (padding_kb - padding_kb // 2)}</body></html>")
+
+def _google_page(query, padding_kb):
+    body = "".join(f'<div class="g"><div class="r"><a href="https://site{i}.example.com/{query}/page">'
+                   f'<h3>Result {i} for {query}</h3></a></div><div class="s">Snippet {i} about {query}.</div>'
+                   f'<a href="https://www.google.com/url?q=https://site{i}.example.com/">Cached</a></div>' for i in range(10))
+    return _page(f"{query} - Google Search", body, padding_kb)
+
+def _bing_page(query, padding_kb):
+    body = "<ol id=\"b_results\">" + "".join(
+        f'<li class="b_algo"><h2><a href="https://site{i}.example.org/{query}">Result {i} for {query}</a></h2>'
+        f'<div class="b_caption"><p>Snippet {i} about {query}.</p></div></li>' for i in range(10)) + "</ol>"
+    return _page(f"{query} - Bing", body, padding_kb)
+
+def _duckduckgo_page(query, padding_kb):
+    body = "".join(f'<div class="result results_links web-result"><h2 class="result__title">'
+                   f'<a class="result__a" href="//duckduckgo.com/l/?uddg=site{i}">Result {i}</a></h2>'
+                   f'<a class="result__url" href="https://site{i}.example.net/{query}">site{i}.example.net</a>'
+                   f'<a class="result__snippet">Snippet {i} about {query}.</a></div>' for i in range(10))
+    return _page(f"{query} at DuckDuckGo", body, padding_kb)
+
+def _fallback_page(query, padding_kb):
+    body = "".join(f'<p><a href="https://docs.example.com/{query}/section-{i}">Section {i}</a> mentions {query}.</p>' for i in range(10))
+    return _page(f"Search: {query}", body, padding_kb)
+
+FIXTURE_BUILDERS = {
+    "google": _google_page,
+    "bing": _bing_page,
+    "duckduckgo": _duckduckgo_page,
+    "fallback": _fallback_page
+}
+
+def load_fixtures(fixtures_dir=None, padding_kb=100):
+    """Returns engine -> page template; recorded <engine>.html files in `fixtures_dir` win over synthetic pages.
+
+    Templates are bytes with a {query} placeholder (as the literal text "{query}").
+    """
+    fixtures = {engine: builder("{query}", padding_kb).encode("utf-8") for engine, builder in FIXTURE_BUILDERS.items()}
+    if fixtures_dir and os.path.isdir(fixtures_dir):
+        for file_name in os.listdir(fixtures_dir):
+            engine, extension = os.path.splitext(file_name)
+            if extension == ".html":
+                with open(os.path.join(fixtures_dir, file_name), "rb") as f:
+                    fixtures[engine] = f.read()
+    return fixtures
+
+def record_fixtures(engine_names, query, fixtures_dir, engines_file=DEFAULT_ENGINES_FILE):
+    """Downloads live result pages for `query` into `fixtures_dir` (the only function that goes online)."""
+    engines = load_engines(engines_file)
+    os.makedirs(fixtures_dir, exist_ok=True)
+    for engine_name in engine_names:
+        url = engine_page_url(engines[engine_name], query)
+        response = get_http_session().get(url, headers=REQUEST_HEADERS, timeout=15)
+        response.raise_for_status()
+        # Store the query as a placeholder so the page can be served for any benchmark query
+        page = response.content.replace(query.encode("utf-8"), b"{query}")
+        with open(os.path.join(fixtures_dir, f"{engine_name}.html"), "wb") as f:
+            f.write(page)
+        print(f"Recorded {engine_name}: {len(page)} bytes")
+
+# --- Mock Search Server ---
+
+class _QuietHTTPServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def handle_error(self, request, client_address):
+        # Clients closing keep-alive connections at the end of a run are expected
+        if not isinstance(sys.exc_info()[1], ConnectionError):
+            super().handle_error(request, client_address)
+
+class MockSearchServer:
+    """Local HTTP server answering /<engine>/search?q=... with fixture pages.
+
+    Each request waits `latency` seconds (+/- `jitter`), fails with 500 at `error_rate`
+    and answers 429 at `throttle_rate`. Outcomes are derived from `seed` and the request
+    path, so the same benchmark run sees the same errors and delays.
+    """
+
+    def __init__(self, fixtures, latency=0.0, jitter=0.0, error_rate=0.0, throttle_rate=0.0, seed=0):
+        self.fixtures = fixtures
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.throttle_rate = throttle_rate
+        self.seed = seed
+        self.requests_served = 0
+        self._lock = threading.Lock()
+        self._server = _QuietHTTPServer(("127.0.0.1", 0), self._make_handler())
+        self._thread = threading.Thread(target=self._server.serve_forever, name="mock-search-server", daemon=True)
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def engines(self):
+        """Returns engine name -> URL template for every fixture, like load_engines()."""
+        port = self._server.server_address[1]
+        return {engine: f"http://127.0.0.1:{port}/{engine}/search?q={{query}}" for engine in self.fixtures}
+
+    def _make_handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1" # Keep-alive, like real engines
+
+            def log_message(self, *args):
+                pass
+
+            def do_GET(self):
+                server._handle(self)
+
+        return Handler
+
+    def _handle(self, handler):
+        with self._lock:
+            self.requests_served += 1
+        parts = urlsplit(handler.path)
+        engine = parts.path.strip("/").split("/")[0]
+        query = parts.query.partition("q=")[2].split("&")[0]
+        rng = random.Random(zlib.crc32(f"{self.seed}:{handler.path}".encode("utf-8")))
+        time.sleep(max(0.0, self.latency + rng.uniform(-self.jitter, self.jitter)))
+        if engine not in self.fixtures:
+            status, body = 404, b"Unknown engine"
+        elif rng.random() < self.error_rate:
+            status, body = 500, b"Internal Server Error"
+        elif rng.random() < self.throttle_rate:
+            status, body = 429, b"Too Many Requests"
+        else:
+            status, body = 200, self.fixtures[engine].replace(b"{query}", query.encode("utf-8"))
+        handler.send_response(status)
+        handler.send_header("Content-Type", "text/html; charset=utf-8")
+        handler.send_header("Content-Length", str(len(body)))
+        handler.end_headers()
+        handler.wfile.write(body)
+
+# --- Benchmarks ---
+
+def percentiles(values):
+    """Returns count, mean and p50/p90/p99/max of `values` (seconds are converted to ms by the caller)."""
+    if not values:
+        return {"count": 0}
+    ordered = sorted(values)
+    pick = lambda q: ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+    return {"count": len(ordered), "mean": statistics.fmean(ordered), "p50": pick(0.50), "p90": pick(0.90),
+            "p99": pick(0.99), "max": ordered[-1]}
+
+def _ms(stats):
+    return {k: (round(v * 1000, 3) if k != "count" else v) for k, v in stats.items()}
+
+def bench_parse(fixtures, repeats=20):
+    """Times parse_results() on every fixture page."""
+    report = {}
+    for engine, template in fixtures.items():
+        page = template.replace(b"{query}", b"benchmark")
+        timings = []
+        for _ in range(repeats):
+            start = time.perf_counter()
+            results = parse_results(engine, page, f"https://{engine}.example/search", MAX_RESULTS_PER_ENGINE)
+            timings.append(time.perf_counter() - start)
+        report[engine] = {"page_bytes": len(page), "results": len(results), "ms": _ms(percentiles(timings)),
+                          "mb_per_s": round(len(page) * repeats / sum(timings) / 1e6, 2)}
+    return report
+
+def bench_latency(engines, queries, workers):
+    """Times individual search_engine() calls per engine (fetch + parse)."""
+    timings = {engine: [] for engine in engines}
+    statuses = {engine: {} for engine in engines}
+
+    def run(engine, query):
+        start = time.perf_counter()
+        result_data = search_engine(query, engine, engines[engine])
+        return engine, result_data["status"], time.perf_counter() - start
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        for engine, status, elapsed in executor.map(lambda job: run(*job), [(e, q) for q in queries for e in engines]):
+            timings[engine].append(elapsed)
+            statuses[engine][status] = statuses[engine].get(status, 0) + 1
+    return {engine: {"ms": _ms(percentiles(timings[engine])), "statuses": statuses[engine]} for engine in engines}
+
+def bench_throughput(engines, queries, workers, backend=None):
+    """Runs the full batch pipeline (iter_batch_results()) and measures requests per second."""
+    # No politeness delay: every mock engine shares the host 127.0.0.1
+    rate_limiter = HostRateLimiter(0, max_rate=1e6, min_rate=1e3)
+    statuses = {}
+    start = time.perf_counter()
+    for result_data in iter_batch_results(queries, list(engines), engines, max_workers=workers, rate_limiter=rate_limiter, backend=backend):
+        statuses[result_data["status"]] = statuses.get(result_data["status"], 0) + 1
+    elapsed = time.perf_counter() - start
+    total = sum(statuses.values())
+    return {"requests": total, "seconds": round(elapsed, 3), "requests_per_s": round(total / elapsed, 2), "statuses": statuses}
+
+def bench_memory(engines, queries, workers, backend=None):
+    """Peak Python heap allocated during one batch run (tracemalloc)."""
+    tracemalloc.start()
+    try:
+        bench_throughput(engines, queries, workers, backend)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return {"peak_kb": round(peak / 1024, 1)}
+
+def run_benchmarks(args):
+    fixtures = load_fixtures(args.fixtures, args.padding_kb)
+    queries = [f"query{i}" for i in range(args.queries)]
+    backend = create_fetch_backend(args.backend)
+    report = {
+        "version": REPORT_VERSION,
+        "created_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "environment": {"python": platform.python_version(), "platform": platform.platform(), "html_parser": HTML_PARSER},
+        "settings": {k: v for k, v in vars(args).items() if k not in ("output", "compare", "record")}
+    }
+    try:
+        report["parse"] = bench_parse(fixtures, args.parse_repeats)
+        with MockSearchServer(fixtures, args.latency, args.jitter, args.error_rate, args.throttle_rate, args.seed) as server:
+            engines = server.engines()
+            report["latency"] = bench_latency(engines, queries, args.workers)
+            report["throughput"] = bench_throughput(engines, queries, args.workers, backend)
+            report["memory"] = bench_memory(engines, queries, args.workers, backend)
+    finally:
+        if backend is not None:
+            backend.close()
+    return report
+
+# --- Reports ---
+
+LOWER_IS_BETTER = ("ms", "seconds", "peak_kb")
+
+def _flatten(value, prefix=""):
+    if isinstance(value, dict):
+        items = {}
+        for key, child in value.items():
+            items.update(_flatten(child, f"{prefix}.{key}" if prefix else key))
+        return items
+    return {prefix: value} if isinstance(value, (int, float)) and not isinstance(value, bool) else {}
+
+def compare_reports(old_report, new_report):
+    """Returns (metric, old, new, percent change, "better"/"worse"/"") for the metrics of both reports."""
+    old_metrics = _flatten({k: v for k, v in old_report.items() if k not in ("settings", "version")})
+    new_metrics = _flatten({k: v for k, v in new_report.items() if k not in ("settings", "version")})
+    rows = []
+    for metric, new_value in new_metrics.items():
+        old_value = old_metrics.get(metric)
+        if old_value is None or old_value == 0:
+            continue
+        change = (new_value - old_value) / old_value * 100
+        lower_is_better = any(part in LOWER_IS_BETTER for part in metric.split("."))
+        verdict = "" if abs(change) < 5 else ("better" if (change < 0) == lower_is_better else "worse")
+        rows.append((metric, old_value, new_value, change, verdict))
+    return rows
+
+def print_summary(report, output=sys.stderr):
+    for engine, stats in report["parse"].items():
+        print(f"parse      {engine:<12} {stats['page_bytes']:>8} B  p50 {stats['ms']['p50']:>8.2f} ms  {stats['mb_per_s']:>7.2f} MB/s", file=output)
+    for engine, stats in report["latency"].items():
+        print(f"latency    {engine:<12} p50 {stats['ms']['p50']:>8.2f} ms  p99 {stats['ms']['p99']:>8.2f} ms  {stats['statuses']}", file=output)
+    throughput = report["throughput"]
+    print(f"throughput {throughput['requests']} requests in {throughput['seconds']} s = {throughput['requests_per_s']} req/s  {throughput['statuses']}", file=output)
+    print(f"memory     peak {report['memory']['peak_kb']} KB", file=output)
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark fetching and parsing against a local mock search engine server.")
+    parser.add_argument("-q", "--queries", type=int, default=20, help="Queries per engine.")
+    parser.add_argument("-w", "--workers", type=int, default=8, help="Requests in flight at once.")
+    parser.add_argument("--backend", choices=("threads", "async"), default="threads", help="Fetch backend for the batch benchmarks.")
+    parser.add_argument("--latency", type=float, default=0.02, help="Mean server response delay in seconds.")
+    parser.add_argument("--jitter", type=float, default=0.01, help="Random +/- variation of the delay in seconds.")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Fraction of requests answered with 500.")
+    parser.add_argument("--throttle-rate", type=float, default=0.0, help="Fraction of requests answered with 429.")
+    parser.add_argument("--seed", type=int, default=1, help="Seed for the server's delays and failures.")
+    parser.add_argument("--padding-kb", type=int, default=100, help="Extra page weight of the synthetic fixtures.")
+    parser.add_argument("--parse-repeats", type=int, default=20, help="Parses per fixture in the parse benchmark.")
+    parser.add_argument("--fixtures", help="Directory of recorded <engine>.html pages to serve instead of synthetic ones.")
+    parser.add_argument("--record", metavar="QUERY",
+                        help="Download live pages for QUERY into --fixtures (engines: " + ", ".join(BENCHMARK_ENGINES[:-1]) + ") and exit.")
+    parser.add_argument("-o", "--output", help="Write the JSON report to this file (default: standard output).")
+    parser.add_argument("--compare", help="Earlier JSON report to compare this run against.")
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    args = parse_args(argv)
+    if args.record:
+        if not args.fixtures:
+            print("--record needs --fixtures DIR.", file=sys.stderr)
+            return 2
+        record_fixtures(BENCHMARK_ENGINES[:-1], args.record, args.fixtures)
+        return 0
+
+    report = run_benchmarks(args)
+    print_summary(report)
+    report_json = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(report_json + "\n")
+    else:
+        print(report_json)
+
+    if args.compare:
+        with open(args.compare, "r", encoding="utf-8") as f:
+            old_report = json.load(f)
+        if old_report.get("settings") != report["settings"]:
+            print("Note: the reports were made with different settings.", file=sys.stderr)
+        for metric, old_value, new_value, change, verdict in compare_reports(old_report, report):
+            print(f"{metric:<45} {old_value:>12} -> {new_value:<12} {change:+7.1f}% {verdict}", file=sys.stderr)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
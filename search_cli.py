@@ -0,0 +1,129 @@
+"""Headless command-line entry point for batch searching without the GUI.
+
+Example:
+    python search_cli.py queries.txt --engines google,bing --workers 16 > results.jsonl
+
+Each line of the query file is one search term. Results are written as JSON Lines,
+one line per (query, engine) pair, in the order the engines answer. With --merged,
+one line per query holds the engines' results fused into a single ranking; add
+--merged-updates to also get the ranking so far each time another engine answers.
+"""
+import argparse
+import json
+import sys
+
+from search_core import (
+    DEFAULT_ENGINES_FILE, DEFAULT_MAX_CONCURRENT_SEARCHES, DEFAULT_PER_HOST_DELAY,
+    DEFAULT_CACHE_SETTINGS, DEFAULT_HTTP_CACHE_SETTINGS, DEFAULT_PARSE_WORKERS, DEFAULT_RESPONSE_SETTINGS, DEFAULT_RATE_LIMIT_SETTINGS, DEFAULT_FETCH_BACKEND,
+    DEFAULT_HEDGE_SETTINGS, CancellationToken, CircuitBreaker, EngineMetrics, HostRateLimiter, HttpCache, ParserPool, RequestHedger, ResultCache,
+    batch_search, configure_response_reading,
+    create_fetch_backend
+)
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Run search queries across search engines without the GUI.")
+    parser.add_argument("query_file", help="File with one query per line ('-' reads from standard input).")
+    parser.add_argument("-e", "--engines", default="google",
+                        help="Comma-separated engine names, or 'all' for every engine (default: google).")
+    parser.add_argument("-o", "--output", default="-", help="JSON Lines output file (default: standard output).")
+    parser.add_argument("--engines-file", default=DEFAULT_ENGINES_FILE, help="Search engine list to use.")
+    parser.add_argument("-w", "--workers", type=int, default=DEFAULT_MAX_CONCURRENT_SEARCHES,
+                        help="Maximum number of requests in flight at once (with --backend async, hundreds or thousands are fine; "
+                             "requests to the same host still queue behind its rate limit).")
+    parser.add_argument("--backend", choices=("threads", "async"), default=DEFAULT_FETCH_BACKEND,
+                        help="Fetch on a thread pool, or as coroutines on an asyncio event loop (needs httpx).")
+    parser.add_argument("--per-host-delay", type=float, default=DEFAULT_PER_HOST_DELAY,
+                        help="Initial seconds between two requests to the same host (adapts to the host's responses).")
+    parser.add_argument("-n", "--max-results", type=int, default=None,
+                        help="Stop querying further engines for a query once this many unique results were found.")
+    parser.add_argument("-p", "--parse-workers", type=int, default=DEFAULT_PARSE_WORKERS,
+                        help="Worker processes for HTML parsing (0 parses in the fetching threads).")
+    parser.add_argument("--page", type=int, default=1,
+                        help="Result page to fetch (engines need {page} or {offset} in their URL; others are skipped).")
+    parser.add_argument("--merged", action="store_true",
+                        help="Write one merged ranking per query (weighted reciprocal rank fusion) instead of per-engine results.")
+    parser.add_argument("--merged-updates", action="store_true",
+                        help="Like --merged, but also write the ranking so far whenever another engine answers (\"final\": false).")
+    parser.add_argument("--max-page-bytes", type=int, default=DEFAULT_RESPONSE_SETTINGS["max_bytes"],
+                        help="Stop reading a result page after this many bytes.")
+    parser.add_argument("--hedge", action="store_true",
+                        help="Send a duplicate request when an engine answers slower than usual, and use whichever answers first.")
+    parser.add_argument("--hedge-engines",
+                        help="Comma-separated engines to hedge with --hedge (default: engines with dedicated parser rules).")
+    parser.add_argument("--metrics-file",
+                        help="Write per-engine latency and failure metrics here when done (Prometheus text format for .prom files, else JSON).")
+    parser.add_argument("--cache-file", default=DEFAULT_CACHE_SETTINGS["db_file"], help="Result cache database.")
+    parser.add_argument("--no-cache", action="store_true", help="Do not read or write the result cache.")
+    parser.add_argument("--http-cache-file", default=DEFAULT_HTTP_CACHE_SETTINGS["db_file"],
+                        help="Cache of raw result pages, revalidated with ETag/Last-Modified.")
+    parser.add_argument("--no-http-cache", action="store_true", help="Always download result pages in full.")
+    return parser.parse_args(argv)
+
+def write_metrics(metrics, metrics_file):
+    with open(metrics_file, "w", encoding="utf-8") as f:
+        if metrics_file.endswith(".prom"):
+            f.write(metrics.to_prometheus())
+        else:
+            json.dump(metrics.to_json(), f, indent=2)
+
+def main(argv=None):
+    args = parse_args(argv)
+
+    try:
+        backend = create_fetch_backend(args.backend)
+    except RuntimeError as e:
+        print(e, file=sys.stderr)
+        return 2
+    configure_response_reading(max_bytes=args.max_page_bytes)
+    engine_names = None if args.engines.strip().lower() == "all" else [e.strip() for e in args.engines.split(",") if e.strip()]
+    cache = None
+    if not args.no_cache:
+        cache = ResultCache(DEFAULT_CACHE_SETTINGS["ttl_seconds"], DEFAULT_CACHE_SETTINGS["max_entries"], args.cache_file)
+    http_cache = None
+    if not args.no_http_cache:
+        http_cache = HttpCache(args.http_cache_file, DEFAULT_HTTP_CACHE_SETTINGS["max_bytes"])
+    parser_pool = ParserPool(args.parse_workers) if args.parse_workers > 0 else None
+    rate_limiter = HostRateLimiter(args.per_host_delay, DEFAULT_RATE_LIMIT_SETTINGS["max_rate"], DEFAULT_RATE_LIMIT_SETTINGS["min_rate"],
+                                   max_wait=DEFAULT_RATE_LIMIT_SETTINGS["max_wait"])
+    circuit_breaker = CircuitBreaker(DEFAULT_RATE_LIMIT_SETTINGS["failure_threshold"], DEFAULT_RATE_LIMIT_SETTINGS["cooldown_seconds"])
+    cancel_token = CancellationToken()
+    metrics = EngineMetrics() if args.metrics_file else None
+    hedger = None
+    if args.hedge:
+        hedge_settings = {k: v for k, v in DEFAULT_HEDGE_SETTINGS.items() if k != "enabled"}
+        if args.hedge_engines:
+            hedge_settings["engines"] = [e.strip() for e in args.hedge_engines.split(",") if e.strip()]
+        hedger = RequestHedger(**hedge_settings)
+
+    query_file = sys.stdin if args.query_file == "-" else open(args.query_file, "r", encoding="utf-8")
+    output = sys.stdout if args.output == "-" else open(args.output, "w", encoding="utf-8")
+    results = batch_search(query_file, engine_names, args.engines_file, args.workers, args.per_host_delay, cache, parser_pool=parser_pool,
+                           rate_limiter=rate_limiter, circuit_breaker=circuit_breaker, cancel_token=cancel_token,
+                           max_unique_results=args.max_results, merged=args.merged or args.merged_updates, backend=backend,
+                           http_cache=http_cache, metrics=metrics, hedger=hedger, page=max(1, args.page),
+                           merged_updates=args.merged_updates)
+    try:
+        for result_data in results:
+            output.write(json.dumps(result_data) + "\n")
+            output.flush()
+    except KeyboardInterrupt:
+        cancel_token.cancel() # Abort in-flight requests before the worker pool is shut down
+        results.close()
+        return 130
+    finally:
+        if query_file is not sys.stdin:
+            query_file.close()
+        if output is not sys.stdout:
+            output.close()
+        if parser_pool is not None:
+            parser_pool.shutdown()
+        if backend is not None:
+            backend.close()
+        if hedger is not None:
+            hedger.close()
+        if metrics is not None:
+            write_metrics(metrics, args.metrics_file)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,2707 @@
+"""Headless search core: engine list, HTTP session, parsers, caching and concurrent fan-out.
+
+This module has no GUI dependencies so it can be used from the command line
+(see search_cli.py), from cron jobs or from other Python code.
+"""
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from bs4 import BeautifulSoup, SoupStrainer
+import soupsieve
+import asyncio
+import contextlib
+import functools
+import heapq
+import itertools
+import datetime
+import email.utils
+import json
+import multiprocessing
+import os
+import re
+import queue
+import shutil
+import sys
+import threading
+import time
+import sqlite3
+import zlib
+from collections import OrderedDict, deque
+from concurrent.futures import Future, ThreadPoolExecutor, ProcessPoolExecutor, FIRST_COMPLETED, wait
+from concurrent.futures.process import BrokenProcessPool
+from urllib.parse import parse_qsl, urlencode, urljoin, urlparse, urlsplit, urlunsplit
+
+DEFAULT_ENGINES_FILE = "search_engines.json"
+DEFAULT_ENGINE_SAVE_DELAY = 0.5 # Seconds EngineStore waits to combine several engine changes into one write
+
+# --- HTML Parser Backend ---
+# lxml is much faster than Python's built-in html.parser; it is used when installed.
+try:
+    import lxml # noqa: F401
+    HTML_PARSER = "lxml"
+except ImportError:
+    HTML_PARSER = "html.parser"
+
+# --- Async Fetch Backend ---
+# httpx is only needed for the optional asyncio fetch backend (see AsyncFetchBackend).
+try:
+    import httpx
+except ImportError:
+    httpx = None
+
+# --- Search Concurrency Settings ---
+# Both values can be overridden in app_config.json.
+DEFAULT_MAX_CONCURRENT_SEARCHES = 8 # Global cap on engines queried at the same time
+DEFAULT_PER_HOST_DELAY = 0.5 # Minimum seconds between two requests to the same host
+
+# --- Rate Limiting / Circuit Breaker Settings ---
+# Can be overridden with the "rate_limit" section of app_config.json.
+DEFAULT_RATE_LIMIT_SETTINGS = {
+    "max_rate": 5.0, # Requests per second a well-behaved host can be ramped up to
+    "min_rate": 0.05, # Lowest rate a host is throttled down to after 429/503 responses
+    "max_wait": 15, # Engines whose host asks for a longer pause (429/503, Retry-After) are skipped
+    "failure_threshold": 3, # Consecutive errors before an engine is skipped
+    "cooldown_seconds": 300 # How long a failing engine is skipped
+}
+
+# --- Hedged Request Settings ---
+# A duplicate request is sent when an engine has not answered within its usual (p95)
+# latency; the first successful answer wins. Can be overridden with the "hedging"
+# section of app_config.json.
+DEFAULT_HEDGE_SETTINGS = {
+    "enabled": False,
+    "engines": None, # Engines to hedge; null hedges the engines with dedicated parser rules
+    "hedge_after": {}, # Fixed per-engine delays in seconds, instead of the observed latency
+    "quantile": 0.95, # Observed latency quantile after which a duplicate is sent
+    "min_samples": 10, # Successful requests needed before the observed latency is trusted
+    "default_delay": 2.0, # Delay used until enough latencies have been observed
+    "min_delay": 0.25,
+    "max_delay": 10.0,
+    "max_extra_ratio": 0.1, # Duplicates may add at most this fraction of extra requests
+    "max_in_flight": 8 # Duplicates running at once
+}
+
+# --- Parsing Settings ---
+# Number of worker processes used to parse result pages; 0 parses in the fetching thread.
+# Can be overridden with "parse_workers" in app_config.json.
+DEFAULT_PARSE_WORKERS = 0
+
+# --- Result Page Settings ---
+# URL templates may contain {page} (1, 2, ...) and/or {offset} (position of the page's first
+# result: 0, RESULTS_PER_PAGE, ...) so further result pages can be loaded.
+RESULTS_PER_PAGE = 10
+DEFAULT_PREFETCH_SETTINGS = {
+    "enabled": True,
+    "max_pages": 8, # Prefetched pages kept until they are shown or a new search starts
+    "max_in_flight": 2 # Prefetches running at once
+}
+
+# --- Response Reading Settings ---
+# Result pages are read in chunks and parsed early once enough of the page is in (see
+# PageReader). Can be overridden with the "response" section of app_config.json.
+DEFAULT_RESPONSE_SETTINGS = {
+    "max_bytes": 2 * 1024 * 1024, # Stop reading a result page after this many bytes
+    "early_parse_bytes": 64 * 1024, # First try parsing a partial page at this size, then each time it doubles
+    "chunk_size": 16384
+}
+
+# --- HTTP Session Settings ---
+# Can be overridden with the "http" section of app_config.json.
+DEFAULT_HTTP_SETTINGS = {
+    "pool_connections": 32, # Number of per-host connection pools kept alive
+    "pool_maxsize": 8, # Keep-alive connections kept in each host pool
+    "max_retries": 2, # Retries for connection errors and 502/504 responses
+    "backoff_factor": 0.5 # Sleep between retries: backoff_factor * 2 ** (retry - 1)
+}
+
+# --- Fetch Backend Settings ---
+# "threads" fetches with the shared requests.Session on a thread pool; "async" runs every
+# request as a coroutine on one event loop thread (needs httpx), which keeps thousands
+# of requests in flight cheaply. Can be overridden with "fetch_backend" and the "async"
+# section of app_config.json.
+DEFAULT_FETCH_BACKEND = "threads"
+DEFAULT_ASYNC_SETTINGS = {
+    "max_connections": 512, # Open connections across all hosts
+    "max_keepalive_connections": 128, # Idle connections kept alive for reuse
+    "max_retries": 2, # Retries for failed connection attempts
+    "timeout": 15 # Seconds per request phase (connect, read, ...)
+}
+
+# --- Result Cache Settings ---
+# Can be overridden with the "cache" section of app_config.json.
+DEFAULT_CACHE_SETTINGS = {
+    "enabled": True,
+    "ttl_seconds": 3600, # How long a cached engine result stays valid
+    "max_entries": 1000, # Least recently used entries are evicted above this size
+    "db_file": "search_cache.sqlite3" # On-disk store, set to null to keep the cache in memory only
+}
+
+# --- HTTP Cache Settings ---
+# Raw result pages kept for conditional requests (ETag / Last-Modified). Can be
+# overridden with the "http_cache" section of app_config.json.
+DEFAULT_HTTP_CACHE_SETTINGS = {
+    "enabled": True,
+    "db_file": "http_cache.sqlite3",
+    "max_bytes": 50 * 1024 * 1024 # Compressed bodies above this total are evicted, least recently used first
+}
+
+# --- Search History Settings ---
+DEFAULT_HISTORY_SETTINGS = {
+    "enabled": True,
+    "db_file": "search_history.sqlite3",
+    "max_searches": 2000, # Oldest searches (and their results) are dropped above this count
+    "max_age_days": 180, # Searches older than this are dropped; null keeps them regardless of age
+    "flush_interval": 2.0, # Seconds the background writer waits to batch up results
+    "batch_size": 500 # Max records written in one transaction
+}
+
+# --- Result Enrichment Settings ---
+# Titles and descriptions of result pages, fetched in the background (see PageEnricher).
+DEFAULT_ENRICHMENT_SETTINGS = {
+    "enabled": True,
+    "workers": 4, # Result pages fetched at once
+    "max_bytes": 32768, # Only the start of a page is read; <title> and <meta> live in its <head>
+    "timeout": 5,
+    "ttl_seconds": 7 * 86400, # How long fetched metadata is reused
+    "max_entries": 20000,
+    "db_file": "page_metadata.sqlite3" # On-disk store, set to null to keep metadata in memory only
+}
+MAX_TITLE_LENGTH = 200
+MAX_DESCRIPTION_LENGTH = 300
+
+# --- Default Search Engines ---
+# Used when search_engines.json is missing or invalid.
+DEFAULT_ENGINES = {
+        # --- General Search Engines ---
+        "google": "https://www.google.com/search?q={query}&start={offset}",
+        "bing": "https://www.bing.com/search?q={query}",
+        "yahoo": "https://search.yahoo.com/search?p={query}",
+        "duckduckgo": "https://duckduckgo.com/?q={query}",
+        "ecosia": "https://www.ecosia.org/search?q={query}",
+        "startpage": "https://www.startpage.com/sp/search?q={query}",
+        "yandex": "https://yandex.com/search/?text={query}",
+        "baidu": "https://www.baidu.com/s?wd={query}",
+        "naver": "https://search.naver.com/search.naver?query={query}",
+        "ask": "https://www.ask.com/web?q={query}",
+        "aol": "https://search.aol.com/aol/search?q={query}",
+        "dogpile": "https://www.dogpile.com/search?q={query}",
+        "excite": "https://www.excite.com/search/web?q={query}",
+        "info": "https://www.info.com/search?q={query}",
+        "lycos": "https://search.lycos.com/?q={query}",
+        "metacrawler": "https://www.metacrawler.com/metacrawler/search?q={query}",
+        "msn": "https://www.msn.com/en-us/search?q={query}",
+        "petal": "https://petalsearch.com/search?q={query}",
+        "qwant": "https://www.qwant.com/?q={query}",
+        "rambler": "https://nova.rambler.ru/search?query={query}",
+        "searchcom": "https://www.search.com/search?q={query}",
+        "sogou": "https://www.sogou.com/web?query={query}",
+        "swisscows": "https://swisscows.com/en/web?query={query}",
+        "teoma": "https://search.teoma.com/search?q={query}",
+        "walla": "https://walla.co.il/?q={query}",
+        "webcrawler": "https://www.webcrawler.com/serp?q={query}",
+        "wolframalpha": "https://www.wolframalpha.com/input/?i={query}",
+        "zapmeta": "https://www.zapmeta.com/web?q={query}",
+        "192com": "https://www.192.com/search/people?q={query}",
+        "abacho": "https://www.abacho.com/search.php?q={query}",
+        "accoona": "https://www.accoona.com/search.php?q={query}",
+        "acoon": "https://www.acoon.com/search.php?q={query}",
+        "adalta": "https://www.adalta.com/search?q={query}",
+        "adfind": "https://www.adfind.com/search?q={query}",
+        "aeiwi": "https://www.aeiwi.com/search?q={query}",
+        "alltheweb": "https://www.alltheweb.com/search?q={query}",
+        "ansearch": "https://www.ansearch.com/search?q={query}",
+        "arianna": "https://www.arianna.it/search?q={query}",
+        "arios": "https://www.arios.com/search?q={query}",
+        "auone": "https://auone.jp/search?q={query}",
+        "avivo": "https://www.avivo.com/search?q={query}",
+        "azekon": "https://www.azekon.com/search?q={query}",
+        "baidubrother": "https://www.baidubrother.com/search?q={query}",
+        "beekio": "https://beek.io/?s={query}",
+        "befun": "https://www.befun.com/search?q={query}",
+        "biglobe": "https://search.biglobe.ne.jp/q/{query}",
+        "blitzsuche": "https://www.blitzsuche.de/start.php?q={query}",
+        "bluewin": "https://www.bluewin.ch/fr/search.html?q={query}",
+        "boardreader": "https://boardreader.com/s/{query}",
+        "boxxet": "https://www.boxxet.com/search?q={query}",
+        "brainboost": "https://www.brainboost.com/search?q={query}",
+        "bravo": "https://www.bravo.de/suche?s={query}",
+        "business": "https://www.business.com/directory/search/?q={query}",
+        "cauti": "https://www.cauti.com/search?q={query}",
+        "centrata": "https://www.centrata.com/search?q={query}",
+        "chacha": "https://www.chacha.com/search?q={query}",
+        "chlubber": "https://www.chlubber.com/search?q={query}",
+        "clipular": "https://clipular.com/search?q={query}",
+        "cluuz": "https://www.cluuz.com/search?q={query}",
+        "cnn": "https://edition.cnn.com/search?q={query}", # This could also go into news, but since `cnn` is specific, it can be general
+        "coccinelles": "https://www.coccinelles.fr/recherche.php?q={query}",
+        "colibrism": "https://colibri.sm/search?q={query}",
+        "cosmos": "https://www.cosmos.com.my/search?q={query}",
+        "crawler": "https://www.crawler.com/search?q={query}",
+        
+        # --- Image Search Engines ---
+        "google_images": "https://www.google.com/search?q={query}&tbm=isch",
+        "bing_images": "https://www.bing.com/images/search?q={query}",
+        "flickr": "https://www.flickr.com/search/?text={query}",
+        "pinterest": "https://www.pinterest.com/search/pins/?q={query}",
+        "getty_images": "https://www.gettyimages.com/search/{query}",
+        "unsplash": "https://unsplash.com/s/photos/{query}",
+        "pexels": "https://www.pexels.com/search/{query}/",
+        "pixabay": "https://pixabay.com/images/search/{query}/",
+        "shutterstock": "https://www.shutterstock.com/search/{query}",
+        "deviantart": "https://www.deviantart.com/search?q={query}",
+        "google_arts_culture": "https://artsandculture.google.com/search/{query}",
+
+        # --- Video Search Engines ---
+        "youtube": "https://www.youtube.com/results?search_query={query}", # This URL is a bit unusual, might need checking
+        "vimeo": "https://vimeo.com/search?q={query}",
+        "dailymotion": "https://www.dailymotion.com/search/{query}",
+        "metacafe": "https://www.metacafe.com/videos/?query={query}",
+        "twitch_channels": "https://www.twitch.tv/search?query={query}&type=channels",
+        "twitch_videos": "https://www.twitch.tv/search?query={query}&type=videos",
+        "internet_archive_videos": "https://archive.org/details/movies?query={query}",
+
+        # --- News Search Engines ---
+        "google_news": "https://news.google.com/search?q={query}",
+        "bing_news": "https://www.bing.com/news/search?q={query}",
+        "reuters": "https://www.reuters.com/search/news?q={query}",
+        "bbc_news": "https://www.bbc.com/search?q={query}",
+        "cnn_news": "https://edition.cnn.com/search?q={query}",
+        "al_jazeera": "https://www.aljazeera.com/search/{query}",
+        "the_guardian": "https://www.theguardian.com/search?q={query}",
+        "new_york_times": "https://www.nytimes.com/search?query={query}",
+        "associated_press": "https://apnews.com/search?q={query}",
+        "kompas_id": "https://www.kompas.com/search?q={query}",
+        "detik_id": "https://www.detik.com/search?query={query}",
+
+        # --- Academic/Scientific Search Engines ---
+        "google_scholar": "https://scholar.google.com/scholar?q={query}",
+        "semantic_scholar": "https://www.semanticscholar.org/search?q={query}",
+        "pubmed": "https://pubmed.ncbi.nlm.nih.gov/?term={query}",
+        "researchgate": "https://www.researchgate.net/search?q={query}",
+        "academia_edu": "https://www.academia.edu/search?q={query}",
+        "jstor": "https://www.jstor.org/action/doBasicSearch?Query={query}",
+        "sciencedirect": "https://www.sciencedirect.com/search?qs={query}",
+        "ieee_xplore": "https://ieeexplore.ieee.org/search/searchresult.jsp?queryText={query}",
+        "arxiv": "https://arxiv.org/search/?query={query}&searchtype=all&source=header",
+        "philpapers": "https://philpapers.org/s/{query}",
+        "ssrn": "https://papers.ssrn.com/sol3/results.cfm?q={query}",
+
+        # --- Social Media Platforms (for searching within platforms) ---
+        "twitter": "https://twitter.com/search?q={query}",
+        "instagram": "https://www.instagram.com/explore/tags/{query}/",
+        "tiktok": "https://www.tiktok.com/tag/{query}",
+        "facebook": "https://www.facebook.com/search/top/?q={query}",
+        "reddit": "https://www.reddit.com/search/?q={query}",
+        "linkedin": "https://www.linkedin.com/search/results/all/?keywords={query}",
+        "tumblr": "https://www.tumblr.com/search/{query}",
+        "pinterest_social": "https://www.pinterest.com/search/pins/?q={query}", # Duplicate with images, but relevant here too
+
+        # --- Shopping/E-commerce Sites ---
+        "amazon": "https://www.amazon.com/s?k={query}",
+        "tokopedia": "https://www.tokopedia.com/search?st=product&q={query}",
+        "shopee": "https://shopee.co.id/search?keyword={query}",
+        "ebay": "https://www.ebay.com/sch/i.html?_nkw={query}",
+        "etsy": "https://www.etsy.com/search?q={query}",
+        "alibaba": "https://www.alibaba.com/trade/search?SearchText={query}",
+
+        # --- Q&A Sites ---
+        "quora": "https://www.quora.com/search?q={query}",
+        "stackoverflow": "https://stackoverflow.com/search?q={query}",
+        "wikihow": "https://www.wikihow.com/wikiHow/search?q={query}",
+        "superuser_se": "https://superuser.com/search?q={query}",
+        "ask_ubuntu_se": "https://askubuntu.com/search?q={query}",
+        "server_fault_se": "https://serverfault.com/search?q={query}",
+        "math_stack_exchange": "https://math.stackexchange.com/search?q={query}",
+        "physics_stack_exchange": "https://physics.stackexchange.com/search?q={query}",
+        "chemistry_stack_exchange": "https://chemistry.stackexchange.com/search?q={query}",
+    }
+
+def read_engines(engines_file=DEFAULT_ENGINES_FILE):
+    """Reads the engine file and registers its parser rules, weights and categories.
+
+    Each entry is either a URL template string or an object with a "url" template, an
+    optional "parser" rule, an optional rank fusion "weight" and an optional "category".
+    Returns name -> URL template. Raises OSError or ValueError (including
+    json.JSONDecodeError) if the file cannot be used; nothing is registered then.
+    """
+    with open(engines_file, 'r') as f:
+        raw_engines = json.load(f)
+    if not isinstance(raw_engines, dict):
+        raise ValueError("Invalid search engine file format.")
+    engines, parser_specs, weights, categories = {}, {}, {}, {}
+    for name, entry in raw_engines.items():
+        if isinstance(entry, dict):
+            if "parser" in entry:
+                parser_specs[name] = entry["parser"]
+            if "weight" in entry:
+                weights[name] = entry["weight"]
+            if "category" in entry:
+                categories[name] = entry["category"]
+            entry = entry.get("url")
+        engines[name] = entry
+    # Basic format validation
+    if not all(isinstance(k, str) and isinstance(v, str) and '{query}' in v for k, v in engines.items()):
+        raise ValueError("Invalid search engine file format.")
+    register_parser_rules(parser_specs)
+    register_engine_weights(weights)
+    register_engine_categories(categories)
+    return engines
+
+def load_engines(engines_file=DEFAULT_ENGINES_FILE):
+    """Loads the list of search engines from a JSON file or uses (and saves) the defaults.
+
+    See read_engines() for the file format.
+    """
+    try:
+        return read_engines(engines_file)
+    except (FileNotFoundError, ValueError):
+        # If file not found, corrupted, or invalid format, use defaults
+        print(f"{engines_file} not found or corrupted. Creating from defaults.", file=sys.stderr)
+        default_engines = dict(DEFAULT_ENGINES)
+        register_parser_rules({})
+        register_engine_weights({})
+        register_engine_categories({})
+        save_engines(default_engines, engines_file)
+        return default_engines
+
+def save_engines(engines, engines_file=DEFAULT_ENGINES_FILE):
+    """Saves the list of search engines to a JSON file, keeping declared parser rules, weights and categories.
+
+    The file is replaced atomically, so readers never see a half-written list.
+    """
+    lines = []
+    for name, url_template in engines.items():
+        entry = {"url": url_template}
+        if name in _declared_parser_specs:
+            entry["parser"] = _declared_parser_specs[name]
+        if name in _declared_weights:
+            entry["weight"] = _declared_weights[name]
+        if name in _declared_categories:
+            entry["category"] = _declared_categories[name]
+        # One engine per line: readable, and written by json's C encoder, which indent= would bypass
+        lines.append(f"    {json.dumps(name)}: {json.dumps(entry if len(entry) > 1 else url_template)}")
+    write_file_atomic(engines_file, "{\n" + ",\n".join(lines) + "\n}\n" if lines else "{}\n")
+
+def write_file_atomic(path, text):
+    """Writes `text` to a temporary file next to `path`, then renames it over `path`."""
+    temp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp" # Unique per writer, in the same directory for the rename
+    try:
+        with open(temp_path, 'w') as f:
+            f.write(text)
+            f.flush()
+            os.fsync(f.fileno())
+        if os.path.exists(path):
+            shutil.copymode(path, temp_path)
+        os.replace(temp_path, path)
+    except BaseException:
+        with contextlib.suppress(OSError):
+            os.remove(temp_path)
+        raise
+
+class EngineStore:
+    """The engine file of a running application, with coalesced saves and hot reload (thread-safe).
+
+    save() only schedules a write: all changes made within `save_delay` seconds are written
+    together, atomically, on a background thread. poll() reads the file again when someone
+    else has changed it and returns what changed, so callers can patch their engine list
+    instead of rebuilding it. While a save is pending, the application's changes win and
+    outside edits are not read. A file that fails to parse is ignored until it changes again.
+    """
+
+    def __init__(self, engines_file=DEFAULT_ENGINES_FILE, save_delay=DEFAULT_ENGINE_SAVE_DELAY):
+        self.engines_file = engines_file
+        self.save_delay = save_delay
+        self._lock = threading.Lock()
+        self._engines = {} # Engines as last loaded or saved
+        self._pending = None # Engines waiting to be written
+        self._timer = None
+        self._signature = None # (mtime, size) of the file as last read or written by this store
+
+    def _file_signature(self):
+        try:
+            stat_result = os.stat(self.engines_file)
+        except OSError:
+            return None
+        return stat_result.st_mtime_ns, stat_result.st_size
+
+    def load(self):
+        """Loads the engine file like load_engines() and remembers its state."""
+        with self._lock:
+            engines = load_engines(self.engines_file)
+            self._engines = dict(engines)
+            self._signature = self._file_signature()
+        return engines
+
+    def save(self, engines):
+        """Schedules `engines` to be written; a later call before the write replaces them."""
+        with self._lock:
+            self._pending = dict(engines)
+            if self._timer is None:
+                self._timer = threading.Timer(self.save_delay, self.flush)
+                self._timer.daemon = True
+                self._timer.start()
+
+    def flush(self):
+        """Writes pending changes now."""
+        with self._lock:
+            timer, self._timer = self._timer, None
+            if timer is not None:
+                timer.cancel()
+            engines, self._pending = self._pending, None
+            if engines is None:
+                return
+            try:
+                save_engines(engines, self.engines_file)
+            except OSError as e:
+                print(f"Could not save {self.engines_file} ({e}).", file=sys.stderr)
+                return
+            self._engines = engines
+            self._signature = self._file_signature()
+
+    def poll(self):
+        """Returns (changed, removed) if the file was modified outside this store, else None.
+
+        `changed` maps new and edited engines to their URL templates and `removed` holds the
+        names of deleted ones. Parser rules, weights and categories are re-registered, so
+        callers should refresh whatever depends on them even if both are empty.
+        """
+        signature = self._file_signature()
+        with self._lock:
+            if signature is None or signature == self._signature or self._pending is not None:
+                return None
+            self._signature = signature
+            try:
+                engines = read_engines(self.engines_file)
+            except (OSError, ValueError) as e:
+                print(f"Not reloading {self.engines_file} ({e}).", file=sys.stderr)
+                return None
+            changed = {name: url_template for name, url_template in engines.items() if self._engines.get(name) != url_template}
+            removed = self._engines.keys() - engines.keys()
+            self._engines = engines
+        return changed, removed
+
+def engine_page_url(engine_url_template, query, page=1):
+    """Fills in an engine's URL template for result page `page` (1 is the first page)."""
+    return engine_url_template.format(query=query, page=page, offset=(page - 1) * RESULTS_PER_PAGE)
+
+def supports_pages(engine_url_template):
+    """Returns True if the template has a {page} or {offset} placeholder for further result pages."""
+    return "{page}" in engine_url_template or "{offset}" in engine_url_template
+
+# --- URL Canonicalization ---
+# The same page is often returned with tracking parameters, another scheme, "www." or a
+# trailing slash. clean_url() removes what never changes the page; canonical_url_key()
+# additionally folds the variants together so duplicates can be detected.
+
+TRACKING_PARAMS = {"gclid", "fbclid", "msclkid", "dclid", "yclid", "igshid", "mc_cid", "mc_eid", "_hsenc", "_hsmi", "srsltid", "ref_src"}
+TRACKING_PARAM_PREFIXES = ("utm_",)
+DEFAULT_PORTS = {"http": 80, "https": 443}
+
+def clean_url(url):
+    """Lowercases scheme and host, drops default ports, fragments and tracking parameters."""
+    try:
+        parts = urlsplit(url)
+        scheme = parts.scheme.lower()
+        host = (parts.hostname or "").lower()
+        port = parts.port
+    except ValueError:
+        return url # Malformed URL, leave it alone
+    netloc = f"[{host}]" if ":" in host else host
+    if port is not None and port != DEFAULT_PORTS.get(scheme):
+        netloc = f"{netloc}:{port}"
+    query = parts.query
+    if query:
+        params = parse_qsl(query, keep_blank_values=True)
+        kept = [(k, v) for k, v in params if k.lower() not in TRACKING_PARAMS and not k.lower().startswith(TRACKING_PARAM_PREFIXES)]
+        if len(kept) != len(params): # Only re-encode when something was removed
+            query = urlencode(kept, doseq=True)
+    return urlunsplit((scheme, netloc, parts.path or "/", query, ""))
+
+def canonical_url_key(url):
+    """Returns the key under which equivalent URLs are deduplicated (scheme-, www- and slash-insensitive)."""
+    parts = urlsplit(clean_url(url))
+    host = parts.netloc[4:] if parts.netloc.startswith("www.") else parts.netloc
+    key = host + parts.path.rstrip("/")
+    if parts.query:
+        key += "?" + "&".join(sorted(parts.query.split("&")))
+    return key
+
+# --- Declarative Parser Rules ---
+# Important: Search engine HTML structures often change.
+# These rules might need adjustments in the future if site changes occur.
+#
+# A rule describes where the result links of an engine live:
+#   "container":        CSS selector of one search result (optional)
+#   "link":             CSS selector of the result link inside the container (default "a[href]")
+#   "first":            take only the first link of each container (default: true with a container)
+#   "include"/"exclude": substrings a link must / must not contain
+#   "resolve_relative": turn relative links into absolute ones using the page URL (default false)
+# Engines in search_engines.json can declare their own rule under "parser".
+
+MAX_RESULTS_PER_ENGINE = 20
+
+PARSER_RULE_KEYS = {"container", "link", "first", "include", "exclude", "resolve_relative"}
+
+_STACKEXCHANGE_RULE = {"container": "div.s-post-summary", "link": "h3 a[href]", "resolve_relative": True}
+
+DEFAULT_PARSER_RULES = {
+    "google": {
+        "container": "div.g",
+        # Filter Google's internal URLs (redirects, cache, search related)
+        "exclude": ["google.com/url?", "webcache.googleusercontent.com", "/search?q=", "accounts.google.com"]
+    },
+    "bing": {"container": "li.b_algo", "link": "h2 a[href]"},
+    "duckduckgo": {"container": "div.web-result", "link": "a.result__url[href]"},
+    "yahoo": {"container": "div.algo", "link": "h3 a[href]"},
+    "arxiv": {"container": "li.arxiv-result", "link": "p.list-title a[href]"},
+    "pubmed": {"container": "article.full-docsum", "link": "a.docsum-title[href]", "resolve_relative": True},
+    "ebay": {"container": "li.s-item", "link": "a.s-item__link[href]"},
+    "stackoverflow": _STACKEXCHANGE_RULE,
+    "superuser_se": _STACKEXCHANGE_RULE,
+    "ask_ubuntu_se": _STACKEXCHANGE_RULE,
+    "server_fault_se": _STACKEXCHANGE_RULE,
+    "math_stack_exchange": _STACKEXCHANGE_RULE,
+    "physics_stack_exchange": _STACKEXCHANGE_RULE,
+    "chemistry_stack_exchange": _STACKEXCHANGE_RULE,
+}
+
+# Fallback rule: Grab all valid links.
+# This might not be as accurate as engine specific rules.
+GENERIC_PARSER_RULE = {"link": "a[href]", "first": False}
+
+def has_class(class_name):
+    """SoupStrainer attribute filter matching `class_name` inside a multi-valued class attribute."""
+    # While straining, the class attribute is still the raw string (e.g. "result web-result")
+    def match(value):
+        if value is None:
+            return False
+        values = value.split() if isinstance(value, str) else value
+        return class_name in values
+    return match
+
+_SIMPLE_COMPOUND = re.compile(r"^([a-zA-Z][\w-]*)?(?:\.([\w-]+))?")
+
+def strainer_for_selector(selector):
+    """Builds a SoupStrainer keeping only the outermost elements `selector` can start from.
+
+    Only the tag name and first class of the selector's first compound are used, so the
+    strained tree is always a superset of what the selector matches. Returns None (parse
+    everything) when the selector cannot be narrowed down safely.
+    """
+    if any(c in selector for c in ",+~"):
+        return None
+    match = _SIMPLE_COMPOUND.match(selector.strip())
+    tag_name, class_name = match.group(1), match.group(2)
+    if not tag_name and not class_name:
+        return None
+    if class_name:
+        return SoupStrainer(tag_name, class_=has_class(class_name))
+    return SoupStrainer(tag_name)
+
+class ParserRule:
+    """A declarative extraction rule, compiled once and reused for every response."""
+
+    def __init__(self, spec):
+        unknown_keys = set(spec) - PARSER_RULE_KEYS
+        if unknown_keys:
+            raise ValueError(f"Unknown parser rule key(s): {', '.join(sorted(unknown_keys))}")
+        self.spec = dict(spec)
+        container = spec.get("container")
+        link = spec.get("link", "a[href]")
+        self._container = soupsieve.compile(container) if container else None
+        self._link = soupsieve.compile(link)
+        self.first_only = bool(spec.get("first", container is not None))
+        self.resolve_relative = bool(spec.get("resolve_relative", False))
+        self._include = self._compile_substrings(spec.get("include"))
+        self._exclude = self._compile_substrings(spec.get("exclude"))
+        self.strainer = strainer_for_selector(container or link)
+
+    @staticmethod
+    def _compile_substrings(substrings):
+        # All substrings are matched in a single regex pass
+        if not substrings:
+            return None
+        if isinstance(substrings, str):
+            substrings = [substrings]
+        return re.compile("|".join(re.escape(s) for s in substrings))
+
+    def extract(self, soup, base_url=None, limit=None):
+        """Returns the cleaned, deduplicated result URLs in `soup`, stopping after `limit` links."""
+        results = []
+        seen = set() # Canonical keys, so duplicates do not count towards `limit`
+        containers = self._container.iselect(soup) if self._container is not None else [soup]
+        for container in containers:
+            if self.first_only:
+                link_tag = self._link.select_one(container)
+                link_tags = [link_tag] if link_tag is not None else []
+            else:
+                link_tags = self._link.iselect(container)
+            for link_tag in link_tags:
+                href = link_tag.get('href')
+                if not href:
+                    continue
+                if self.resolve_relative and base_url:
+                    href = urljoin(base_url, href)
+                # Only add if it's a full web URL
+                if not href.startswith(('http://', 'https://')):
+                    continue
+                if self._exclude is not None and self._exclude.search(href):
+                    continue
+                if self._include is not None and not self._include.search(href):
+                    continue
+                href = clean_url(href)
+                key = canonical_url_key(href)
+                if key in seen:
+                    continue
+                seen.add(key)
+                results.append(href)
+                if limit is not None and len(results) >= limit:
+                    return results
+        return results
+
+    def __reduce__(self):
+        # Pickled by spec (e.g. for ParserPool workers) and recompiled once per process
+        return (compile_parser_rule, (json.dumps(self.spec, sort_keys=True),))
+
+@functools.lru_cache(maxsize=None)
+def compile_parser_rule(spec_json):
+    """Compiles a rule from its JSON text; cached so each distinct rule is compiled once."""
+    return ParserRule(json.loads(spec_json))
+
+ENGINE_PARSERS = {name: compile_parser_rule(json.dumps(spec, sort_keys=True)) for name, spec in DEFAULT_PARSER_RULES.items()}
+GENERIC_PARSER = compile_parser_rule(json.dumps(GENERIC_PARSER_RULE, sort_keys=True))
+
+# Rules declared in search_engines.json (name -> spec / compiled rule). Replaced as a whole
+# by register_parser_rules() so search threads never see a half-updated registry.
+_declared_parser_specs = {}
+_custom_parsers = {}
+
+def register_parser_rules(specs):
+    """Compiles and installs the parser rules declared in the engine file.
+
+    Invalid rules are reported and not used, so one bad entry cannot break the whole file.
+    """
+    global _declared_parser_specs, _custom_parsers
+    declared, compiled = {}, {}
+    for engine_name, spec in specs.items():
+        declared[engine_name] = spec # Kept as written so saving never drops a user's rule
+        try:
+            if not isinstance(spec, dict):
+                raise ValueError("parser rule must be an object")
+            compiled[engine_name.lower()] = compile_parser_rule(json.dumps(spec, sort_keys=True))
+        except (ValueError, TypeError, soupsieve.SelectorSyntaxError) as e:
+            print(f"Ignoring invalid parser rule for '{engine_name}': {e}", file=sys.stderr)
+    _declared_parser_specs, _custom_parsers = declared, compiled
+
+# --- Rank Fusion Weights ---
+# How much an engine's ranking counts when results are merged (see RankFusion).
+# Set per engine with "weight" in search_engines.json.
+
+DEFAULT_ENGINE_WEIGHT = 1.0
+DEFAULT_RRF_K = 60 # Reciprocal rank fusion constant; larger values flatten rank differences
+
+_declared_weights = {}
+_engine_weights = {}
+
+def register_engine_weights(weights):
+    """Installs the rank fusion weights declared in the engine file; invalid ones are ignored."""
+    global _declared_weights, _engine_weights
+    valid = {}
+    for engine_name, weight in weights.items():
+        if isinstance(weight, (int, float)) and not isinstance(weight, bool) and weight >= 0:
+            valid[engine_name.lower()] = float(weight)
+        else:
+            print(f"Ignoring invalid weight for '{engine_name}': {weight!r}", file=sys.stderr)
+    _declared_weights, _engine_weights = dict(weights), valid
+
+def get_engine_weight(engine_name):
+    """Returns the rank fusion weight configured for `engine_name`."""
+    return _engine_weights.get(engine_name.lower(), DEFAULT_ENGINE_WEIGHT)
+
+# --- Engine Categories ---
+# Engines are grouped into categories by keywords in their names, unless search_engines.json
+# lists them explicitly with "category" (a name or a list of names).
+
+ENGINE_CATEGORIES = ("General", "Images", "Videos", "News", "Academic", "Social", "Shopping", "Q&A")
+DEFAULT_CATEGORY = "General" # For engines no keyword matches
+
+CATEGORY_KEYWORDS = {
+    "Images": ["image", "images", "photo", "unsplash", "pexels", "pixabay", "shutterstock", "deviantart", "getty_images", "google_arts_culture"],
+    "Videos": ["video", "youtube", "vimeo", "dailymotion", "twitch", "metacafe", "internet_archive_videos"],
+    "News": ["news", "reuters", "bbc", "cnn", "al_jazeera", "guardian", "times", "press", "kompas", "detik"],
+    "Academic": ["scholar", "pubmed", "semantic", "wolframalpha", "researchgate", "academia", "jstor", "sciencedirect", "ieee", "arxiv",
+                 "philpapers", "ssrn"],
+    "Social": ["twitter", "instagram", "tiktok", "facebook", "reddit", "linkedin", "tumblr", "pinterest_social"],
+    "Shopping": ["amazon", "shop", "tokopedia", "shopee", "ebay", "etsy", "alibaba"],
+    "Q&A": ["quora", "stack", "answers", "ask", "wikihow", "superuser", "ubuntu", "server_fault", "math_stack_exchange",
+            "physics_stack_exchange", "chemistry_stack_exchange"]
+}
+
+class EngineClassifier:
+    """Assigns engines to categories by the keywords their names contain (thread-safe).
+
+    All keywords are compiled into one regular expression that finds, in a single pass,
+    the longest keyword starting at each position of the name; every keyword contained in
+    that match counts as found too, so the result equals testing each keyword separately.
+    Results are cached per name.
+    """
+
+    def __init__(self, keywords=None, default_category=DEFAULT_CATEGORY):
+        keywords = CATEGORY_KEYWORDS if keywords is None else keywords
+        self.default_category = default_category
+        self._order = {category: i for i, category in enumerate(keywords)}
+        keyword_categories = {}
+        for category, category_keywords in keywords.items():
+            for keyword in category_keywords:
+                keyword_categories.setdefault(keyword.lower(), set()).add(category)
+        # Categories of every keyword contained in each keyword
+        self._covered = {keyword: frozenset(itertools.chain.from_iterable(categories for other, categories in keyword_categories.items()
+                                                                          if other in keyword))
+                         for keyword in keyword_categories}
+        alternatives = "|".join(re.escape(keyword) for keyword in sorted(keyword_categories, key=len, reverse=True))
+        self._pattern = re.compile(f"(?=({alternatives}))") if alternatives else None
+        self._cache = {}
+
+    def classify(self, engine_name):
+        """Returns the categories of `engine_name` as a tuple, in category order."""
+        lower_name = engine_name.lower()
+        categories = self._cache.get(lower_name)
+        if categories is None:
+            found = set()
+            if self._pattern is not None:
+                for match in self._pattern.finditer(lower_name):
+                    found |= self._covered[match.group(1)]
+            categories = tuple(sorted(found, key=self._order.get)) or (self.default_category,)
+            self._cache[lower_name] = categories
+        return categories
+
+_category_classifier = EngineClassifier()
+_declared_categories = {}
+_engine_categories = {}
+
+def register_engine_categories(categories):
+    """Installs the explicit categories declared in the engine file; unknown category names are ignored."""
+    global _declared_categories, _engine_categories
+    valid = {}
+    for engine_name, declared in categories.items():
+        names = [declared] if isinstance(declared, str) else declared if isinstance(declared, list) else []
+        known = tuple(category for category in ENGINE_CATEGORIES if category in names)
+        if known:
+            valid[engine_name.lower()] = known
+        else:
+            print(f"Ignoring invalid category for '{engine_name}': {declared!r}", file=sys.stderr)
+    _declared_categories, _engine_categories = dict(categories), valid
+
+def get_engine_categories(engine_name):
+    """Returns the categories of `engine_name`: the declared ones, else those its name suggests."""
+    return _engine_categories.get(engine_name.lower()) or _category_classifier.classify(engine_name)
+
+def categorize_engines(engine_names):
+    """Returns category -> sorted engine names, for every category in ENGINE_CATEGORIES."""
+    categorized = {category: [] for category in ENGINE_CATEGORIES}
+    for engine_name in sorted(set(engine_names)):
+        for category in get_engine_categories(engine_name):
+            categorized[category].append(engine_name)
+    return categorized
+
+def get_engine_parser(engine_name):
+    """Returns the compiled parser rule for `engine_name`: declared, built-in or generic."""
+    lower_name = engine_name.lower()
+    return _custom_parsers.get(lower_name) or ENGINE_PARSERS.get(lower_name) or GENERIC_PARSER
+
+def parse_google_results(soup):
+    return ENGINE_PARSERS["google"].extract(soup)
+
+def parse_bing_results(soup):
+    return ENGINE_PARSERS["bing"].extract(soup)
+
+def parse_duckduckgo_results(soup):
+    return ENGINE_PARSERS["duckduckgo"].extract(soup)
+
+def parse_generic_results(soup):
+    return GENERIC_PARSER.extract(soup)
+
+def parse_results(engine_name, content, base_url=None, limit=None, parser=None):
+    """Parses a result page with `parser` or the rule registered for `engine_name`."""
+    if parser is None:
+        parser = get_engine_parser(engine_name)
+    soup = BeautifulSoup(content, HTML_PARSER, parse_only=parser.strainer)
+    return parser.extract(soup, base_url, limit)
+
+class ParserPool:
+    """Runs parse_results() in a pool of worker processes so parsing scales across cores.
+
+    Fetching threads hand the raw HTML to parse() and block (without holding the GIL)
+    until a worker returns the links. If the process pool cannot be started or breaks,
+    parsing silently falls back to the calling thread. Workers are started with
+    "forkserver" (or "spawn") rather than forked from a process that runs other threads.
+    """
+
+    def __init__(self, workers=None):
+        self.workers = workers or os.cpu_count() or 1
+        self._lock = threading.Lock()
+        try:
+            start_method = "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+            self._executor = ProcessPoolExecutor(max_workers=self.workers, mp_context=multiprocessing.get_context(start_method))
+        except (OSError, NotImplementedError, ValueError) as e:
+            print(f"Could not start parser processes ({e}). Parsing in-process.", file=sys.stderr)
+            self._executor = None
+
+    def parse(self, engine_name, content, base_url=None, limit=None, parser=None):
+        """Same as parse_results(), but in a worker process (or in-process as a fallback)."""
+        executor = self._executor
+        if executor is not None:
+            try:
+                return executor.submit(parse_results, engine_name, content, base_url, limit, parser).result()
+            except (BrokenProcessPool, OSError, RuntimeError) as e:
+                self._disable(executor, e)
+        return parse_results(engine_name, content, base_url, limit, parser)
+
+    def shutdown(self):
+        """Stops the worker processes; later parse() calls run in-process."""
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=True, cancel_futures=True)
+
+    def _disable(self, executor, error):
+        with self._lock:
+            if self._executor is not executor:
+                return # Another thread already fell back
+            self._executor = None
+        print(f"Parser processes failed ({error}). Parsing in-process.", file=sys.stderr)
+        executor.shutdown(wait=False, cancel_futures=True)
+
+# --- Shared HTTP Session ---
+# A single requests.Session is shared by all search threads so TCP/TLS connections
+# are kept alive and reused. urllib3's connection pools are thread-safe; the session
+# itself is only configured once and never mutated while searches are running.
+
+_http_session = None
+_http_session_lock = threading.Lock()
+
+def create_http_session(pool_connections=32, pool_maxsize=8, max_retries=2, backoff_factor=0.5):
+    """Creates a requests.Session with keep-alive connection pools and a retry/backoff policy."""
+    retry = Retry(
+        total=max_retries,
+        backoff_factor=backoff_factor,
+        status_forcelist=(502, 504), # 429/503 are handled by HostRateLimiter
+        allowed_methods=frozenset(["GET", "HEAD"]),
+        respect_retry_after_header=False,
+        raise_on_status=False # Let raise_for_status() report the final response
+    )
+    adapter = HTTPAdapter(pool_connections=pool_connections, pool_maxsize=pool_maxsize, max_retries=retry)
+    session = requests.Session()
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+def get_http_session():
+    """Returns the shared HTTP session, creating it with the default settings if needed."""
+    global _http_session
+    with _http_session_lock:
+        if _http_session is None:
+            _http_session = create_http_session(**DEFAULT_HTTP_SETTINGS)
+        return _http_session
+
+def configure_http_session(**settings):
+    """Replaces the shared HTTP session with one built from `settings` (see DEFAULT_HTTP_SETTINGS)."""
+    global _http_session
+    merged = dict(DEFAULT_HTTP_SETTINGS)
+    merged.update({k: v for k, v in settings.items() if k in DEFAULT_HTTP_SETTINGS})
+    new_session = create_http_session(**merged)
+    with _http_session_lock:
+        old_session, _http_session = _http_session, new_session
+    if old_session is not None:
+        old_session.close()
+
+# --- Cancellation ---
+
+class SearchCancelled(Exception):
+    """Raised inside a search when its CancellationToken has been cancelled."""
+
+class CancellationToken:
+    """Cooperative cancellation flag shared between a caller and a running search (thread-safe).
+
+    Cancelling a token also cancels every child token created with `parent=token`.
+    """
+
+    def __init__(self, parent=None):
+        self._event = threading.Event()
+        self._lock = threading.Lock()
+        self._children = set()
+        self._callbacks = []
+        self._parent = parent
+        if parent is not None:
+            parent._add_child(self)
+
+    @property
+    def cancelled(self):
+        return self._event.is_set()
+
+    def cancel(self):
+        self._event.set()
+        with self._lock:
+            children, self._children = self._children, set()
+            callbacks, self._callbacks = self._callbacks, []
+        for callback in callbacks:
+            callback()
+        for child in children:
+            child.cancel()
+
+    def wait(self, timeout):
+        """Sleeps up to `timeout` seconds; returns True early if the token gets cancelled."""
+        return self._event.wait(timeout)
+
+    def add_callback(self, callback):
+        """Calls `callback()` once the token gets cancelled (right away if it already is)."""
+        with self._lock:
+            if not self.cancelled:
+                self._callbacks.append(callback)
+                return
+        callback()
+
+    def remove_callback(self, callback):
+        with self._lock:
+            if callback in self._callbacks:
+                self._callbacks.remove(callback)
+
+    def detach(self):
+        """Stops following the parent token (lets finished child tokens be freed)."""
+        if self._parent is not None:
+            with self._parent._lock:
+                self._parent._children.discard(self)
+            self._parent = None
+
+    def _add_child(self, child):
+        with self._lock:
+            self._children.add(child)
+        if self.cancelled:
+            child.cancel()
+
+_response_settings = dict(DEFAULT_RESPONSE_SETTINGS)
+
+def configure_response_reading(**settings):
+    """Changes how result pages are read (see DEFAULT_RESPONSE_SETTINGS)."""
+    _response_settings.update({k: v for k, v in settings.items() if k in DEFAULT_RESPONSE_SETTINGS})
+
+class PageReader:
+    """Collects a streamed result page and stops it early once the engine's result quota is met.
+
+    Feed chunks with add(). Whenever the page has doubled in size since the last try
+    (starting at `early_parse_bytes`), add() returns True and the caller should call
+    try_finish_early(), which parses the partial page; if it already holds more than
+    `limit` results, or `max_bytes` has been read, reading can stop. Because the
+    checkpoints double, the partial parses cost at most about as much as one parse of
+    the full page. finish() returns the page and its results, parsing it if needed.
+    """
+
+    def __init__(self, engine_name, parser_pool=None, limit=MAX_RESULTS_PER_ENGINE, max_bytes=None, early_parse_bytes=None):
+        self.engine_name = engine_name
+        self.parser_pool = parser_pool
+        self.limit = limit
+        self.max_bytes = max_bytes if max_bytes is not None else _response_settings["max_bytes"]
+        self._next_parse = early_parse_bytes if early_parse_bytes is not None else _response_settings["early_parse_bytes"]
+        self._chunks = []
+        self._size = 0
+        self.page_url = None # Set by the caller to resolve relative links
+        self.results = None
+        self.truncated = False
+        self.parse_seconds = 0.0 # Time spent parsing, including partial pages
+
+    @property
+    def bytes_read(self):
+        return self._size
+
+    def _parse(self, content, limit):
+        started = time.perf_counter()
+        try:
+            return parse_fetched_page(self.engine_name, content, self.page_url, self.parser_pool, limit)
+        finally:
+            self.parse_seconds += time.perf_counter() - started
+
+    def add(self, chunk):
+        """Adds a chunk; returns True when try_finish_early() is due."""
+        self._chunks.append(chunk)
+        self._size += len(chunk)
+        return self._size >= self._next_parse or self._size >= self.max_bytes
+
+    def try_finish_early(self):
+        """Parses the page read so far; returns True if the rest of the page is not needed."""
+        if self._size >= self.max_bytes:
+            self.truncated = True
+            return True
+        # One result more than needed: the last link may be cut off at the end of the partial page
+        results = self._parse(self.content(), self.limit + 1)
+        self._next_parse = self._size * 2
+        if len(results) > self.limit:
+            self.results = results[:self.limit]
+            self.truncated = True
+            return True
+        return False
+
+    def content(self):
+        if len(self._chunks) > 1:
+            self._chunks = [b"".join(self._chunks)]
+        return self._chunks[0] if self._chunks else b""
+
+    def finish(self):
+        """Returns (page bytes, parsed results)."""
+        content = self.content()[:self.max_bytes]
+        if self.results is None:
+            self.results = self._parse(content, self.limit)
+        return content, self.results
+
+def read_response_page(response, reader, cancel_token=None):
+    """Reads a streamed response into `reader` (a PageReader); aborts as soon as `cancel_token` is cancelled."""
+    reader.page_url = response.url
+    for chunk in response.iter_content(chunk_size=_response_settings["chunk_size"]):
+        if cancel_token is not None and cancel_token.cancelled:
+            raise SearchCancelled()
+        if reader.add(chunk) and reader.try_finish_early():
+            break
+    return reader.finish()
+
+REQUEST_HEADERS = {
+    "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/114.0.0.0 Safari/537.36"
+}
+
+def parse_fetched_page(engine_name, content, page_url, parser_pool=None, limit=MAX_RESULTS_PER_ENGINE):
+    """Extracts the result URLs from a downloaded result page, in a ParserPool worker if one is given."""
+    parser = get_engine_parser(engine_name)
+    if parser_pool is not None:
+        return parser_pool.parse(engine_name, content, page_url, limit, parser)[:limit]
+    return parse_results(engine_name, content, page_url, limit, parser)[:limit]
+
+class FetchTiming:
+    """Collects how long the phases of one engine request took, for EngineMetrics.
+
+    Phases: "connect" (DNS, TCP and TLS; only measured by the async backend, otherwise
+    part of "ttfb"), "ttfb" (until the response headers arrived), "download" and "parse".
+    """
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self._mark = self.started
+        self.phases = {}
+        self.http_status = None
+        self.bytes = 0
+
+    def mark(self, phase):
+        """Books the time since the previous mark under `phase`."""
+        now = time.perf_counter()
+        self.add(phase, now - self._mark)
+        self._mark = now
+
+    def add(self, phase, seconds):
+        self.phases[phase] = self.phases.get(phase, 0.0) + max(0.0, seconds)
+
+    def restart(self):
+        """Starts the next phase now, without booking the time before it."""
+        self._mark = time.perf_counter()
+
+    def finish_read(self, reader):
+        """Splits the time since the last mark into "download" and "parse" using `reader`'s parse time."""
+        now = time.perf_counter()
+        self.add("parse", reader.parse_seconds)
+        self.add("download", now - self._mark - reader.parse_seconds)
+        self._mark = now
+        self.bytes = reader.bytes_read
+
+    @property
+    def total(self):
+        return time.perf_counter() - self.started
+
+def cached_page_result(engine_name, http_cache, cache_entry, parser_pool=None, revalidated=False):
+    """Builds the result dict for a page served from an HttpCache, or returns None if it is gone.
+
+    Pages that are still fresh are marked with "cached": True since no request was sent;
+    revalidated pages did take a round trip to the engine and are not.
+    """
+    parsed_results = http_cache.results(cache_entry, engine_name, parser_pool)
+    if parsed_results is None:
+        return None
+    if revalidated:
+        return {"engine": engine_name, "status": "Success", "message": "Page not modified; reused previous results.", "results": parsed_results}
+    return {"engine": engine_name, "status": "Success", "message": "Page still fresh; reused previous results.", "results": parsed_results,
+            "cached": True}
+
+def search_engine(query, engine_name, engine_url_template, delay=1, parser_pool=None, rate_limiter=None, cancel_token=None,
+                  http_cache=None, timing=None, page=1, revalidate=False):
+    # With `revalidate`, a page still fresh in `http_cache` is not reused without asking the
+    # server: a conditional request is sent instead (a 304 still saves the download).
+    headers = REQUEST_HEADERS
+    
+    url = engine_page_url(engine_url_template, query, page)
+    timing = timing if timing is not None else FetchTiming()
+
+    try:
+        if cancel_token is not None and cancel_token.cancelled:
+            raise SearchCancelled()
+        cache_entry = http_cache.lookup(url, engine_name) if http_cache is not None else None
+        if cache_entry is not None:
+            if cache_entry["fresh"] and not revalidate:
+                result_data = cached_page_result(engine_name, http_cache, cache_entry, parser_pool)
+                if result_data is not None:
+                    return result_data
+            headers = {**headers, **HttpCache.conditional_headers(cache_entry)}
+        timing.restart()
+        # Streamed so a cancelled search stops downloading; closing returns the connection to the pool
+        with get_http_session().get(url, headers=headers, verify=True, timeout=15, stream=True) as response: # Increased timeout
+            timing.mark("ttfb")
+            timing.http_status = response.status_code
+            if rate_limiter is not None:
+                rate_limiter.record_response(url, response.status_code, response.headers.get("Retry-After"))
+            if response.status_code == 304 and cache_entry is not None:
+                http_cache.revalidated(cache_entry, response.headers)
+                result_data = cached_page_result(engine_name, http_cache, cache_entry, parser_pool, revalidated=True)
+                if result_data is not None:
+                    return result_data
+                raise requests.exceptions.HTTPError(f"Got 304 Not Modified for an evicted page: {url}", response=response)
+            response.raise_for_status()
+            # Parsed while streaming: reading stops once the result quota is met or the size cap is hit
+            reader = PageReader(engine_name, parser_pool)
+            content, parsed_results = read_response_page(response, reader, cancel_token)
+            timing.finish_read(reader)
+
+        if http_cache is not None:
+            http_cache.store(url, response.url, response.headers, content, engine_name, parsed_results, reader.truncated)
+        return {"engine": engine_name, "status": "Success", "message": "Search successful.", "results": parsed_results}
+
+    except SearchCancelled:
+        return {"engine": engine_name, "status": "Cancelled", "message": "Search cancelled.", "results": []}
+    except requests.exceptions.Timeout:
+        return {"engine": engine_name, "status": "Error", "message": f"Request to {engine_name.capitalize()} timed out.", "results": []}
+    except requests.exceptions.RequestException as e:
+        return {"engine": engine_name, "status": "Error", "message": f"An error occurred while searching on {engine_name.capitalize()}: {e}", "results": []}
+    except Exception as e:
+        return {"engine": engine_name, "status": "Error", "message": f"An unexpected error occurred: {e}", "results": []}
+
+def parse_retry_after(value):
+    """Returns the delay in seconds from a Retry-After header (seconds or HTTP date), or None."""
+    if not value:
+        return None
+    value = value.strip()
+    if value.isdigit():
+        return float(value)
+    try:
+        retry_at = email.utils.parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if retry_at.tzinfo is None:
+        retry_at = retry_at.replace(tzinfo=datetime.timezone.utc)
+    return max(0.0, (retry_at - datetime.datetime.now(datetime.timezone.utc)).total_seconds())
+
+class HostRateLimiter:
+    """Per-host token bucket that adapts to how each host responds (thread-safe).
+
+    Every host starts at `1 / per_host_delay` requests per second. Successful responses
+    slowly raise the rate up to `max_rate`; 429/503 responses halve it, and a Retry-After
+    header pauses the host for the requested time. acquire() reserves a slot and sleeps
+    until it is due. Only a pause the host imposed is limited: if it lasts longer than
+    `max_wait`, the request is refused instead. Time spent queueing behind our own
+    requests is not limited; the caller's concurrency bounds that backlog.
+    """
+
+    def __init__(self, per_host_delay=DEFAULT_PER_HOST_DELAY, max_rate=5.0, min_rate=0.05, burst=1,
+                 rate_increase=0.1, max_wait=15):
+        self.initial_rate = 1.0 / per_host_delay if per_host_delay > 0 else max_rate
+        self.max_rate = max(max_rate, self.initial_rate)
+        self.min_rate = min_rate
+        self.burst = burst
+        self.rate_increase = rate_increase
+        self.max_wait = max_wait
+        self._lock = threading.Lock()
+        self._hosts = {} # host -> {"rate", "tokens", "updated", "throttled_until"}
+
+    def _state(self, host, now):
+        # Caller must hold self._lock; refills the bucket up to `burst` tokens
+        state = self._hosts.get(host)
+        if state is None:
+            state = self._hosts[host] = {"rate": self.initial_rate, "tokens": float(self.burst), "updated": now, "throttled_until": 0.0}
+        else:
+            state["tokens"] = min(self.burst, state["tokens"] + (now - state["updated"]) * state["rate"])
+            state["updated"] = now
+        return state
+
+    def acquire(self, url, cancel_token=None):
+        """Waits for a request slot for the host of `url`.
+
+        Returns True once the request may be sent, or False (without waiting) if the host
+        asked us to pause for longer than `max_wait` seconds. The wait ends early if
+        `cancel_token` is cancelled; callers should check the token afterwards.
+        """
+        delay = self.reserve(url)
+        if delay is None:
+            return False
+        if delay > 0:
+            if cancel_token is not None:
+                cancel_token.wait(delay)
+            else:
+                time.sleep(delay)
+        return True
+
+    def reserve(self, url):
+        """Reserves a request slot without waiting; returns the seconds until it is due, or None.
+
+        None means the host asked us to pause for longer than `max_wait` and no slot was taken.
+        """
+        host = urlparse(url).hostname or ""
+        with self._lock:
+            now = time.monotonic()
+            state = self._state(host, now)
+            if state["throttled_until"] - now > self.max_wait:
+                return None
+            delay = max(0.0, (1 - state["tokens"]) / state["rate"])
+            state["tokens"] -= 1 # Tokens going negative reserve future slots for waiting requests
+            return delay
+
+    def record_response(self, url, status_code, retry_after=None):
+        """Adapts the host's rate to a response status and optional Retry-After header value."""
+        host = urlparse(url).hostname or ""
+        with self._lock:
+            state = self._state(host, time.monotonic())
+            if status_code in (429, 503):
+                state["rate"] = max(self.min_rate, state["rate"] / 2)
+                pause = parse_retry_after(retry_after)
+                if pause is None: # Without Retry-After, pause for one slot at the new rate
+                    pause = 1.0 / state["rate"]
+                if pause > 0: # "Retry-After: 0" allows the next request right away
+                    state["tokens"] = min(state["tokens"], 0.0) - pause * state["rate"]
+                    state["throttled_until"] = max(state["throttled_until"], state["updated"] + pause)
+            elif status_code < 400:
+                state["rate"] = min(self.max_rate, state["rate"] + self.rate_increase)
+
+    def retry_in(self, url):
+        """Returns the seconds until the host of `url` has a free slot again."""
+        host = urlparse(url).hostname or ""
+        with self._lock:
+            state = self._state(host, time.monotonic())
+            return max(0.0, (1 - state["tokens"]) / state["rate"])
+
+    def throttled_for(self, url):
+        """Returns the seconds left of the pause the host of `url` imposed (0 if it did not)."""
+        host = urlparse(url).hostname or ""
+        with self._lock:
+            state = self._state(host, time.monotonic())
+            return max(0.0, state["throttled_until"] - state["updated"])
+
+class CircuitBreaker:
+    """Skips engines that keep failing until a cool-down period has passed (thread-safe).
+
+    After `failure_threshold` consecutive errors the circuit of an engine opens for
+    `cooldown_seconds`. The first request after the cool-down is a trial: a success closes
+    the circuit again, another failure re-opens it immediately. Other requests for the
+    engine are rejected while the trial is running.
+    """
+
+    def __init__(self, failure_threshold=3, cooldown_seconds=300):
+        self.failure_threshold = failure_threshold
+        self.cooldown_seconds = cooldown_seconds
+        self._lock = threading.Lock()
+        self._failures = {} # engine -> consecutive failures
+        self._open_until = {} # engine -> time.time() when a trial request is allowed
+        self._trials = set() # Engines whose trial request is running (half-open circuit)
+
+    def allow(self, engine_name):
+        """Returns True if `engine_name` may be queried now."""
+        with self._lock:
+            open_until = self._open_until.get(engine_name)
+            if open_until is None:
+                return True
+            if time.time() < open_until or engine_name in self._trials:
+                return False
+            self._trials.add(engine_name) # This request is the trial; the others wait for its outcome
+            return True
+
+    def open_until(self, engine_name):
+        """Returns the time.time() at which the engine will be tried again, or None."""
+        with self._lock:
+            return self._open_until.get(engine_name)
+
+    def record_success(self, engine_name):
+        with self._lock:
+            self._failures.pop(engine_name, None)
+            self._open_until.pop(engine_name, None)
+            self._trials.discard(engine_name)
+
+    def record_failure(self, engine_name):
+        with self._lock:
+            self._trials.discard(engine_name)
+            failures = self._failures.get(engine_name, 0) + 1
+            self._failures[engine_name] = failures
+            if failures >= self.failure_threshold:
+                self._open_until[engine_name] = time.time() + self.cooldown_seconds
+
+    def release(self, engine_name):
+        """Ends a trial request that never reached the engine (cancelled, or answered from a cache)."""
+        with self._lock:
+            self._trials.discard(engine_name)
+
+class RequestHedger:
+    """Sends a duplicate ("hedged") request when an engine is slower than usual (thread-safe).
+
+    If an engine's request has not finished after its hedge delay, a second identical
+    request is started and the first successful answer is used; the other one is
+    cancelled. The delay is the engine's fixed `hedge_after` entry, or the `quantile` of
+    its recently observed latencies once `min_samples` are known (else `default_delay`),
+    clamped to [`min_delay`, `max_delay`]. Extra load is capped globally: every request
+    earns `max_extra_ratio` of a duplicate, and at most `max_in_flight` run at once.
+    """
+
+    def __init__(self, engines=None, hedge_after=None, quantile=0.95, min_samples=10, default_delay=2.0, min_delay=0.25,
+                 max_delay=10.0, max_extra_ratio=0.1, max_in_flight=8, window=100):
+        self.engines = {engine_name.lower() for engine_name in engines} if engines is not None else None
+        self.hedge_after = {engine_name.lower(): delay for engine_name, delay in (hedge_after or {}).items()}
+        self.quantile = quantile
+        self.min_samples = min_samples
+        self.default_delay = default_delay
+        self.min_delay = min_delay
+        self.max_delay = max_delay
+        self.max_extra_ratio = max_extra_ratio
+        self.max_in_flight = max_in_flight
+        self.window = window
+        self.hedges_sent = 0
+        self.hedges_won = 0
+        self._lock = threading.Lock()
+        self._latencies = {} # engine -> deque of recent successful latencies
+        self._budget = 1.0 # Duplicates that may be sent now; refilled by max_extra_ratio per request
+        self._in_flight = 0
+        self._executor = None # Created on first use by the thread path
+
+    def hedges(self, engine_name):
+        """Returns True if requests to `engine_name` are hedged."""
+        lower_name = engine_name.lower()
+        if self.engines is not None:
+            return lower_name in self.engines
+        return lower_name in ENGINE_PARSERS or lower_name in _custom_parsers
+
+    def delay_for(self, engine_name):
+        """Returns the seconds to wait before hedging a request to `engine_name`."""
+        lower_name = engine_name.lower()
+        if lower_name in self.hedge_after:
+            return self.hedge_after[lower_name]
+        with self._lock:
+            latencies = sorted(self._latencies.get(lower_name, ()))
+        if len(latencies) < self.min_samples:
+            delay = self.default_delay
+        else:
+            delay = latencies[min(len(latencies) - 1, int(len(latencies) * self.quantile))]
+        return min(self.max_delay, max(self.min_delay, delay))
+
+    def observe(self, engine_name, seconds):
+        """Adds the latency of a successful request."""
+        with self._lock:
+            latencies = self._latencies.get(engine_name.lower())
+            if latencies is None:
+                latencies = self._latencies[engine_name.lower()] = deque(maxlen=self.window)
+            latencies.append(seconds)
+
+    def close(self):
+        """Stops the worker threads of the thread path; running requests finish in the background."""
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+
+    def _count_request(self):
+        with self._lock:
+            self._budget = min(float(max(1, self.max_in_flight)), self._budget + self.max_extra_ratio)
+
+    def _take_budget(self, url, rate_limiter):
+        # A duplicate is only sent if the global budget and the host's rate limit allow it right away
+        with self._lock:
+            if self._budget < 1 or self._in_flight >= self.max_in_flight:
+                return False
+            if rate_limiter is not None:
+                if rate_limiter.retry_in(url) > 0:
+                    return False
+                rate_limiter.reserve(url)
+            self._budget -= 1
+            self._in_flight += 1
+            self.hedges_sent += 1
+            return True
+
+    def _hedge_done(self, *_):
+        with self._lock:
+            self._in_flight -= 1
+
+    def _pick(self, engine_name, finished):
+        # `finished` holds (result, timing, is_hedge) tuples in completion order
+        for result_data, timing, is_hedge in finished:
+            if result_data["status"] == "Success":
+                if not result_data.get("cached"): # A fresh cache hit says nothing about the engine's latency
+                    self.observe(engine_name, timing.total)
+                if is_hedge:
+                    with self._lock:
+                        self.hedges_won += 1
+                return result_data, timing
+        # Every attempt failed: report the original request's outcome
+        return next((result_data, timing) for result_data, timing, is_hedge in finished if not is_hedge)
+
+    def run(self, engine_name, url, attempt, cancel_token, rate_limiter=None):
+        """Runs `attempt(cancel_token)` -> (result, FetchTiming) on worker threads, hedging it if slow."""
+        if not self.hedges(engine_name):
+            return attempt(cancel_token)
+        self._count_request()
+        with self._lock:
+            if self._executor is None:
+                # Threads are only started as needed; the bound just has to exceed any sensible batch concurrency
+                self._executor = ThreadPoolExecutor(max_workers=512, thread_name_prefix="hedged-request")
+        tokens = {}
+        primary_token = CancellationToken(cancel_token)
+        primary = self._executor.submit(attempt, primary_token)
+        tokens[primary] = (primary_token, False)
+        finished = []
+        try:
+            done, _ = wait([primary], timeout=self.delay_for(engine_name))
+            if not done and not cancel_token.cancelled and self._take_budget(url, rate_limiter):
+                hedge_token = CancellationToken(cancel_token)
+                hedge = self._executor.submit(attempt, hedge_token)
+                hedge.add_done_callback(self._hedge_done)
+                tokens[hedge] = (hedge_token, True)
+            pending = set(tokens)
+            while pending:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                finished += [future.result() + (tokens[future][1],) for future in done]
+                if any(result_data["status"] == "Success" for result_data, _, _ in finished):
+                    break
+            return self._pick(engine_name, finished)
+        finally:
+            for token, _ in tokens.values():
+                token.cancel() # Stops the losing request; the winner has finished already
+                token.detach()
+
+    async def run_async(self, engine_name, url, attempt, cancel_token, rate_limiter=None):
+        """Async counterpart of run(): `attempt(cancel_token)` is a coroutine function."""
+        if not self.hedges(engine_name):
+            return await attempt(cancel_token)
+        self._count_request()
+        tasks = {}
+        primary_token = CancellationToken(cancel_token)
+        primary = asyncio.ensure_future(attempt(primary_token))
+        tasks[primary] = (primary_token, False)
+        finished = []
+        try:
+            done, _ = await asyncio.wait([primary], timeout=self.delay_for(engine_name))
+            if not done and not cancel_token.cancelled and self._take_budget(url, rate_limiter):
+                hedge_token = CancellationToken(cancel_token)
+                hedge = asyncio.ensure_future(attempt(hedge_token))
+                hedge.add_done_callback(self._hedge_done)
+                tasks[hedge] = (hedge_token, True)
+            pending = set(tasks)
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                finished += [task.result() + (tasks[task][1],) for task in done]
+                if any(result_data["status"] == "Success" for result_data, _, _ in finished):
+                    break
+            return self._pick(engine_name, finished)
+        finally:
+            for task, (token, _) in tasks.items():
+                token.cancel()
+                token.detach()
+                task.cancel() # Unlike threads, a coroutine can be interrupted while waiting for the server
+
+class EngineMetrics:
+    """In-memory latency and health metrics per engine (thread-safe).
+
+    record() takes one finished request. Two views are kept:
+    - cumulative counters and histograms of each phase's duration (FetchTiming phases and
+      "total"), exported in the Prometheus text format by to_prometheus();
+    - the last `window` requests of every engine, summarized by summary() (percentiles,
+      error rate, mean phase times) for the GUI and to_json().
+    """
+
+    PHASES = ("connect", "ttfb", "download", "parse", "total")
+    BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0) # Histogram upper bounds in seconds
+
+    def __init__(self, window=100):
+        self.window = window
+        self._lock = threading.Lock()
+        self._engines = {} # engine -> {"recent": deque, "requests", "statuses", "http_statuses", "bytes", "results", "histograms"}
+
+    def record(self, engine_name, result_data, timing):
+        """Adds one request: its result dict (as search_engine() returns) and FetchTiming."""
+        if result_data["status"] == "Cancelled":
+            return
+        phases = dict(timing.phases, total=timing.total)
+        sample = {"at": time.time(), "ok": result_data["status"] == "Success", "phases": phases, "http_status": timing.http_status,
+                  "bytes": timing.bytes, "results": len(result_data["results"]), "message": result_data["message"]}
+        with self._lock:
+            stats = self._engines.get(engine_name)
+            if stats is None:
+                stats = self._engines[engine_name] = {"recent": deque(maxlen=self.window), "requests": 0, "statuses": {}, "http_statuses": {},
+                                                      "bytes": 0, "results": 0, "histograms": {}}
+            stats["recent"].append(sample)
+            stats["requests"] += 1
+            stats["statuses"][result_data["status"]] = stats["statuses"].get(result_data["status"], 0) + 1
+            if timing.http_status is not None:
+                stats["http_statuses"][timing.http_status] = stats["http_statuses"].get(timing.http_status, 0) + 1
+            stats["bytes"] += timing.bytes
+            stats["results"] += sample["results"]
+            for phase, seconds in phases.items():
+                histogram = stats["histograms"].get(phase)
+                if histogram is None:
+                    histogram = stats["histograms"][phase] = {"buckets": [0] * len(self.BUCKETS), "count": 0, "sum": 0.0}
+                histogram["count"] += 1
+                histogram["sum"] += seconds
+                for i, bound in enumerate(self.BUCKETS):
+                    if seconds <= bound:
+                        histogram["buckets"][i] += 1
+
+    def summary(self, sort_by="slowest"):
+        """Returns one dict per engine over its recent requests, slowest (p95) or most failing first."""
+        rows = []
+        with self._lock:
+            for engine_name, stats in self._engines.items():
+                recent = list(stats["recent"])
+                totals = sorted(sample["phases"]["total"] for sample in recent)
+                failures = [sample for sample in recent if not sample["ok"]]
+                rows.append({
+                    "engine": engine_name,
+                    "requests": len(recent),
+                    "error_rate": len(failures) / len(recent),
+                    "p50": totals[len(totals) // 2],
+                    "p95": totals[min(len(totals) - 1, int(len(totals) * 0.95))],
+                    "phases": {phase: sum(sample["phases"].get(phase, 0.0) for sample in recent) / len(recent) for phase in self.PHASES},
+                    "bytes": sum(sample["bytes"] for sample in recent) / len(recent),
+                    "results": sum(sample["results"] for sample in recent) / len(recent),
+                    "last_error": failures[-1]["message"] if failures else None,
+                    "total_requests": stats["requests"],
+                    "statuses": dict(stats["statuses"]),
+                    "http_statuses": dict(stats["http_statuses"])
+                })
+        if sort_by == "failing":
+            rows.sort(key=lambda row: (-row["error_rate"], -row["p95"]))
+        else:
+            rows.sort(key=lambda row: -row["p95"])
+        return rows
+
+    def to_json(self):
+        """Returns the summary and the cumulative histograms as a JSON-serializable dict."""
+        with self._lock:
+            histograms = {engine_name: {phase: {"buckets": dict(zip(map(str, self.BUCKETS), histogram["buckets"])), "count": histogram["count"],
+                                                "sum": histogram["sum"]}
+                                        for phase, histogram in stats["histograms"].items()}
+                          for engine_name, stats in self._engines.items()}
+        return {"generated_at": time.time(), "window": self.window, "engines": self.summary(), "histograms": histograms}
+
+    def to_prometheus(self):
+        """Returns the cumulative metrics in the Prometheus text exposition format."""
+        lines = ["# HELP search_engine_requests_total Engine requests by result status.", "# TYPE search_engine_requests_total counter"]
+        escape = lambda value: str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+        with self._lock:
+            engines = sorted((escape(engine_name), stats) for engine_name, stats in self._engines.items())
+            for engine_name, stats in engines:
+                for status, count in sorted(stats["statuses"].items()):
+                    lines.append(f'search_engine_requests_total{{engine="{engine_name}",status="{status}"}} {count}')
+            lines += ["# HELP search_engine_http_responses_total Engine responses by HTTP status code.", "# TYPE search_engine_http_responses_total counter"]
+            for engine_name, stats in engines:
+                for code, count in sorted(stats["http_statuses"].items()):
+                    lines.append(f'search_engine_http_responses_total{{engine="{engine_name}",code="{code}"}} {count}')
+            lines += ["# HELP search_engine_response_bytes_total Bytes of result pages read.", "# TYPE search_engine_response_bytes_total counter"]
+            lines += [f'search_engine_response_bytes_total{{engine="{engine_name}"}} {stats["bytes"]}' for engine_name, stats in engines]
+            lines += ["# HELP search_engine_results_total Result links returned.", "# TYPE search_engine_results_total counter"]
+            lines += [f'search_engine_results_total{{engine="{engine_name}"}} {stats["results"]}' for engine_name, stats in engines]
+            lines += ["# HELP search_engine_phase_seconds Duration of each request phase.", "# TYPE search_engine_phase_seconds histogram"]
+            for engine_name, stats in engines:
+                for phase, histogram in sorted(stats["histograms"].items()):
+                    labels = f'engine="{engine_name}",phase="{phase}"'
+                    for bound, count in zip(self.BUCKETS, histogram["buckets"]):
+                        lines.append(f'search_engine_phase_seconds_bucket{{{labels},le="{bound}"}} {count}')
+                    lines.append(f'search_engine_phase_seconds_bucket{{{labels},le="+Inf"}} {histogram["count"]}')
+                    lines.append(f'search_engine_phase_seconds_sum{{{labels}}} {histogram["sum"]:.6f}')
+                    lines.append(f'search_engine_phase_seconds_count{{{labels}}} {histogram["count"]}')
+        return "\n".join(lines) + "\n"
+
+    def reset(self):
+        with self._lock:
+            self._engines.clear()
+
+class AsyncFetchBackend:
+    """Fetches result pages as coroutines on an asyncio event loop running in a background thread.
+
+    An alternative to fetching on a thread pool: each in-flight request costs a coroutine
+    instead of a thread, so thousands can be pending at once. submit() schedules a
+    coroutine from any thread and returns a concurrent.futures.Future; search_engine()
+    returns the same result dicts as the module-level search_engine(). Needs httpx.
+    """
+
+    def __init__(self, max_connections=512, max_keepalive_connections=128, max_retries=2, timeout=15):
+        if httpx is None:
+            raise RuntimeError("The async fetch backend needs httpx (pip install httpx).")
+        self.max_in_flight = max_connections
+        self.loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self.loop.run_forever, name="async-fetch-loop", daemon=True)
+        self._thread.start()
+        limits = httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_keepalive_connections)
+        self._client = self.submit(self._create_client(limits, max_retries, timeout)).result()
+
+    async def _create_client(self, limits, max_retries, timeout):
+        # Created on the loop so the connection pool belongs to it
+        transport = httpx.AsyncHTTPTransport(limits=limits, retries=max_retries)
+        return httpx.AsyncClient(transport=transport, headers=REQUEST_HEADERS, timeout=timeout, follow_redirects=True)
+
+    def submit(self, coroutine):
+        """Runs `coroutine` on the backend's event loop; returns a concurrent.futures.Future."""
+        return asyncio.run_coroutine_threadsafe(coroutine, self.loop)
+
+    def close(self):
+        """Closes the connection pool and stops the event loop thread."""
+        if self.loop.is_closed():
+            return
+        self.submit(self._client.aclose()).result()
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self._thread.join()
+        self.loop.close()
+
+    async def acquire(self, rate_limiter, url, cancel_token=None):
+        """Async counterpart of HostRateLimiter.acquire(): waits for a slot without blocking the loop."""
+        delay = rate_limiter.reserve(url)
+        if delay is None:
+            return False
+        if delay <= 0:
+            return True
+        if cancel_token is None:
+            await asyncio.sleep(delay)
+            return True
+        # Sleep until the slot is due, or until the token wakes us up when it gets cancelled
+        cancelled = self.loop.create_future()
+
+        def wake_up():
+            self.loop.call_soon_threadsafe(lambda: cancelled.done() or cancelled.set_result(None))
+
+        cancel_token.add_callback(wake_up)
+        try:
+            await asyncio.wait([cancelled], timeout=delay)
+        finally:
+            cancel_token.remove_callback(wake_up)
+            cancelled.cancel()
+        return True
+
+    async def search_engine(self, query, engine_name, engine_url_template, parser_pool=None, rate_limiter=None, cancel_token=None,
+                            http_cache=None, timing=None, page=1, revalidate=False):
+        """Fetches and parses one engine's result page; see the module-level search_engine()."""
+        url = engine_page_url(engine_url_template, query, page)
+        timing = timing if timing is not None else FetchTiming()
+        connect_started = {}
+
+        async def trace(event_name, info):
+            # httpcore trace events: time spent opening the connection (DNS + TCP, then TLS)
+            step, _, state = event_name.rpartition(".")
+            if step in ("connection.connect_tcp", "connection.start_tls"):
+                if state == "started":
+                    connect_started[step] = time.perf_counter()
+                elif state == "complete" and step in connect_started:
+                    timing.add("connect", time.perf_counter() - connect_started.pop(step))
+
+        try:
+            if cancel_token is not None and cancel_token.cancelled:
+                raise SearchCancelled()
+            # The HTTP cache does blocking SQLite I/O and may re-parse, so it runs in the executor too
+            cache_entry = await self.loop.run_in_executor(None, http_cache.lookup, url, engine_name) if http_cache is not None else None
+            if cache_entry is not None and cache_entry["fresh"] and not revalidate:
+                result_data = await self.loop.run_in_executor(None, cached_page_result, engine_name, http_cache, cache_entry, parser_pool)
+                if result_data is not None:
+                    return result_data
+            timing.restart()
+            async with self._client.stream("GET", url, headers=HttpCache.conditional_headers(cache_entry), extensions={"trace": trace}) as response:
+                timing.mark("ttfb")
+                timing.phases["ttfb"] -= timing.phases.get("connect", 0.0)
+                timing.http_status = response.status_code
+                if rate_limiter is not None:
+                    rate_limiter.record_response(url, response.status_code, response.headers.get("Retry-After"))
+                if response.status_code == 304 and cache_entry is not None:
+                    await self.loop.run_in_executor(None, http_cache.revalidated, cache_entry, response.headers)
+                    result_data = await self.loop.run_in_executor(None, functools.partial(
+                        cached_page_result, engine_name, http_cache, cache_entry, parser_pool, revalidated=True))
+                    if result_data is not None:
+                        return result_data
+                    raise httpx.HTTPStatusError(f"Got 304 Not Modified for an evicted page: {url}", request=response.request, response=response)
+                response.raise_for_status()
+                reader = PageReader(engine_name, parser_pool)
+                reader.page_url = str(response.url)
+                async for chunk in response.aiter_bytes(_response_settings["chunk_size"]):
+                    if cancel_token is not None and cancel_token.cancelled:
+                        raise SearchCancelled()
+                    # Parsing is CPU-bound: keep it off the event loop thread
+                    if reader.add(chunk) and await self.loop.run_in_executor(None, reader.try_finish_early):
+                        break
+            content, parsed_results = await self.loop.run_in_executor(None, reader.finish)
+            timing.finish_read(reader)
+            if http_cache is not None:
+                await self.loop.run_in_executor(None, http_cache.store, url, str(response.url), response.headers, content,
+                                                engine_name, parsed_results, reader.truncated)
+            return {"engine": engine_name, "status": "Success", "message": "Search successful.", "results": parsed_results}
+
+        except SearchCancelled:
+            return {"engine": engine_name, "status": "Cancelled", "message": "Search cancelled.", "results": []}
+        except httpx.TimeoutException:
+            return {"engine": engine_name, "status": "Error", "message": f"Request to {engine_name.capitalize()} timed out.", "results": []}
+        except httpx.HTTPError as e:
+            reason = str(e).splitlines()[0] if str(e) else type(e).__name__ # httpx appends a documentation link line
+            return {"engine": engine_name, "status": "Error", "message": f"An error occurred while searching on {engine_name.capitalize()}: {reason}", "results": []}
+        except Exception as e:
+            return {"engine": engine_name, "status": "Error", "message": f"An unexpected error occurred: {e}", "results": []}
+
+def create_fetch_backend(name, settings=None):
+    """Returns an AsyncFetchBackend for name "async", or None (the thread pool) for "threads"."""
+    if name == "threads":
+        return None
+    if name != "async":
+        raise ValueError(f"Unknown fetch backend '{name}' (use 'threads' or 'async').")
+    merged = dict(DEFAULT_ASYNC_SETTINGS)
+    merged.update({k: v for k, v in (settings or {}).items() if k in DEFAULT_ASYNC_SETTINGS})
+    return AsyncFetchBackend(**merged)
+
+class ResultCache:
+    """Thread-safe TTL + LRU cache of engine results, optionally persisted to SQLite.
+
+    Entries are keyed on (engine, normalized query, URL template). Only successful
+    results are stored. With a `db_path` every write goes through to disk so the
+    cache survives a restart of the application.
+    """
+
+    def __init__(self, ttl_seconds=3600, max_entries=1000, db_path=None):
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self._entries = OrderedDict() # key -> (created_at, results), oldest first
+        self._lock = threading.Lock()
+        self._db = None
+        if db_path:
+            self._db = sqlite3.connect(db_path, check_same_thread=False)
+            self._db.execute("CREATE TABLE IF NOT EXISTS result_cache (key TEXT PRIMARY KEY, created_at REAL, results TEXT)")
+            self._db.execute("DELETE FROM result_cache WHERE created_at < ?", (time.time() - ttl_seconds,))
+            self._db.commit()
+            rows = self._db.execute("SELECT key, created_at, results FROM result_cache ORDER BY created_at DESC LIMIT ?", (max_entries,)).fetchall()
+            for key, created_at, results in reversed(rows):
+                self._entries[key] = (created_at, json.loads(results))
+
+    @staticmethod
+    def make_key(engine_name, query, engine_url_template, page=1):
+        """Builds the cache key; queries are compared case- and whitespace-insensitively."""
+        normalized_query = " ".join(query.lower().split())
+        parts = (engine_name, normalized_query, engine_url_template) + ((str(page),) if page > 1 else ())
+        return "\x1f".join(parts)
+
+    def get(self, key):
+        """Returns the cached results for `key`, or None on a miss or expired entry."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            created_at, results = entry
+            if time.time() - created_at > self.ttl_seconds:
+                self._delete(key)
+                return None
+            self._entries.move_to_end(key) # Mark as recently used
+            return list(results)
+
+    def put(self, key, results):
+        """Stores `results` under `key`, evicting the least recently used entries if needed."""
+        created_at = time.time()
+        with self._lock:
+            self._entries[key] = (created_at, list(results))
+            self._entries.move_to_end(key)
+            if self._db is not None:
+                self._db.execute("INSERT OR REPLACE INTO result_cache (key, created_at, results) VALUES (?, ?, ?)",
+                                 (key, created_at, json.dumps(results)))
+            while len(self._entries) > self.max_entries:
+                self._delete(next(iter(self._entries)))
+            if self._db is not None:
+                self._db.commit()
+
+    def clear(self):
+        """Removes every entry from memory and from the on-disk store."""
+        with self._lock:
+            self._entries.clear()
+            if self._db is not None:
+                self._db.execute("DELETE FROM result_cache")
+                self._db.commit()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def _delete(self, key):
+        # Caller must hold self._lock
+        self._entries.pop(key, None)
+        if self._db is not None:
+            self._db.execute("DELETE FROM result_cache WHERE key = ?", (key,))
+            self._db.commit()
+
+def parse_cache_control(value):
+    """Parses a Cache-Control header into a dict of lowercase directive -> value (True if bare)."""
+    directives = {}
+    for part in (value or "").split(","):
+        name, _, argument = part.strip().partition("=")
+        if name:
+            directives[name.lower()] = argument.strip('" ') if argument else True
+    return directives
+
+def parser_fingerprint(engine_name):
+    """Identifies the parser rule of an engine, so cached results are re-parsed when it changes."""
+    return json.dumps(get_engine_parser(engine_name).spec, sort_keys=True)
+
+class HttpCache:
+    """On-disk HTTP cache of raw result pages with revalidation (thread-safe).
+
+    Bodies are stored zlib-compressed together with the results parsed from them.
+    lookup() returns the stored entry; a fresh entry (per Cache-Control max-age or
+    Expires) is used without any request, a stale one is revalidated with
+    If-None-Match / If-Modified-Since (see conditional_headers()). When the server
+    answers 304, the stored results are reused and the page is not parsed again.
+    Responses marked no-store, or without validators or a lifetime, are not stored.
+    Pages whose download was cut short (see PageReader) are stored as partial: their
+    results are reused as long as the engine's parser is unchanged, but they are never
+    parsed again. The total size of the compressed bodies is kept under `max_bytes`.
+    """
+
+    def __init__(self, db_path=":memory:", max_bytes=50 * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(db_path, check_same_thread=False)
+        self._db.execute("""CREATE TABLE IF NOT EXISTS http_cache (url TEXT PRIMARY KEY, page_url TEXT, etag TEXT, last_modified TEXT,
+                            fresh_until REAL, last_used REAL, size INTEGER, body BLOB, parser TEXT, results TEXT,
+                            partial INTEGER NOT NULL DEFAULT 0)""")
+        if "partial" not in {row[1] for row in self._db.execute("PRAGMA table_info(http_cache)")}: # Cache file from an older version
+            self._db.execute("ALTER TABLE http_cache ADD COLUMN partial INTEGER NOT NULL DEFAULT 0")
+        self._db.commit()
+        self._total_bytes = self._db.execute("SELECT IFNULL(SUM(size), 0) FROM http_cache").fetchone()[0]
+
+    def lookup(self, url, engine_name=None):
+        """Returns the stored entry for `url` as a dict (with a "fresh" flag), or None.
+
+        With `engine_name`, a partial page whose results came from an older version of
+        the engine's parser is treated as missing, since it cannot be parsed again.
+        """
+        with self._lock:
+            row = self._db.execute("SELECT page_url, etag, last_modified, fresh_until, parser, partial FROM http_cache WHERE url = ?",
+                                   (url,)).fetchone()
+            if row is None:
+                return None
+            if engine_name is not None and row[5] and row[4] != parser_fingerprint(engine_name):
+                return None
+            self._db.execute("UPDATE http_cache SET last_used = ? WHERE url = ?", (time.time(), url))
+            self._db.commit()
+        page_url, etag, last_modified, fresh_until = row[:4]
+        return {"url": url, "page_url": page_url, "etag": etag, "last_modified": last_modified, "fresh": time.time() < fresh_until}
+
+    @staticmethod
+    def conditional_headers(entry):
+        """Returns the If-None-Match / If-Modified-Since headers to revalidate `entry`."""
+        headers = {}
+        if entry is not None:
+            if entry["etag"]:
+                headers["If-None-Match"] = entry["etag"]
+            if entry["last_modified"]:
+                headers["If-Modified-Since"] = entry["last_modified"]
+        return headers
+
+    def results(self, entry, engine_name, parser_pool=None):
+        """Returns the parsed results of a stored page, re-parsing it only if the engine's parser changed."""
+        fingerprint = parser_fingerprint(engine_name)
+        with self._lock:
+            row = self._db.execute("SELECT parser, results, body, partial FROM http_cache WHERE url = ?", (entry["url"],)).fetchone()
+        if row is None:
+            return None # Evicted meanwhile
+        parser, results, body, partial = row
+        if parser == fingerprint:
+            return json.loads(results)
+        if partial:
+            return None # Only the start of the page is stored; parsing it again could miss results
+        parsed_results = parse_fetched_page(engine_name, zlib.decompress(body), entry["page_url"], parser_pool)
+        with self._lock:
+            self._db.execute("UPDATE http_cache SET parser = ?, results = ? WHERE url = ?", (fingerprint, json.dumps(parsed_results), entry["url"]))
+            self._db.commit()
+        return parsed_results
+
+    def revalidated(self, entry, response_headers):
+        """Records a 304 response: the stored page is valid for the lifetime the server gave again."""
+        with self._lock:
+            self._db.execute("UPDATE http_cache SET fresh_until = ?, etag = IFNULL(?, etag) WHERE url = ?",
+                             (self._fresh_until(response_headers), response_headers.get("ETag"), entry["url"]))
+            self._db.commit()
+
+    def store(self, url, page_url, response_headers, body, engine_name, parsed_results, partial=False):
+        """Stores a 200 response and its parsed results if the response may be cached.
+
+        `partial` marks a body that holds only the start of the page.
+        """
+        cache_control = parse_cache_control(response_headers.get("Cache-Control"))
+        etag, last_modified = response_headers.get("ETag"), response_headers.get("Last-Modified")
+        fresh_until = self._fresh_until(response_headers)
+        if "no-store" in cache_control or not (etag or last_modified or fresh_until > time.time()):
+            return
+        compressed = zlib.compress(body)
+        if len(compressed) > self.max_bytes:
+            return
+        with self._lock:
+            old = self._db.execute("SELECT size FROM http_cache WHERE url = ?", (url,)).fetchone()
+            self._db.execute("INSERT OR REPLACE INTO http_cache (url, page_url, etag, last_modified, fresh_until, last_used, size, body, parser, results, "
+                             "partial) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                             (url, page_url, etag, last_modified, fresh_until, time.time(), len(compressed), compressed,
+                              parser_fingerprint(engine_name), json.dumps(parsed_results), int(partial)))
+            self._total_bytes += len(compressed) - (old[0] if old else 0)
+            self._evict()
+            self._db.commit()
+
+    def clear(self):
+        """Removes every stored page."""
+        with self._lock:
+            self._db.execute("DELETE FROM http_cache")
+            self._db.commit()
+            self._total_bytes = 0
+
+    def _evict(self):
+        # Caller must hold self._lock; drops least recently used pages until under max_bytes
+        while self._total_bytes > self.max_bytes:
+            row = self._db.execute("SELECT url, size FROM http_cache ORDER BY last_used LIMIT 1").fetchone()
+            if row is None:
+                break
+            self._db.execute("DELETE FROM http_cache WHERE url = ?", (row[0],))
+            self._total_bytes -= row[1]
+
+    @staticmethod
+    def _fresh_until(response_headers):
+        # time.time() until which a response may be used without revalidation (0 = revalidate every time)
+        cache_control = parse_cache_control(response_headers.get("Cache-Control"))
+        if "no-cache" in cache_control:
+            return 0.0
+        now = time.time()
+        max_age = cache_control.get("max-age")
+        if isinstance(max_age, str) and max_age.isdigit():
+            age = response_headers.get("Age", "0")
+            return now + int(max_age) - (int(age) if age.isdigit() else 0)
+        expires = response_headers.get("Expires")
+        if expires:
+            try:
+                return email.utils.parsedate_to_datetime(expires).timestamp()
+            except (TypeError, ValueError):
+                return 0.0 # Invalid Expires values mean "already expired"
+        return 0.0
+
+class SearchHistory:
+    """On-disk history of searches and their results with a full-text index (SQLite FTS5).
+
+    record_search(), record_result() and record_metadata() only queue the data; a
+    background thread writes it in batched transactions, so they are safe to call from
+    the GUI or the search threads. Retention limits are applied by compact(), which the
+    writer runs at startup and periodically. search() queries the index without any
+    network access.
+    """
+
+    COMPACT_INTERVAL = 3600 # Seconds between automatic compactions
+
+    def __init__(self, db_path, max_searches=2000, max_age_days=180, flush_interval=2.0, batch_size=500):
+        self.db_path = db_path
+        self.max_searches = max_searches
+        self.max_age_days = max_age_days
+        self.flush_interval = flush_interval
+        self.batch_size = max(1, batch_size)
+        self._db = sqlite3.connect(db_path, check_same_thread=False)
+        self._lock = threading.Lock() # Serializes use of self._db between the writer and readers
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.executescript("""
+            CREATE TABLE IF NOT EXISTS searches (id INTEGER PRIMARY KEY, query TEXT NOT NULL, searched_at REAL NOT NULL);
+            CREATE TABLE IF NOT EXISTS engine_runs (search_id INTEGER NOT NULL, engine TEXT NOT NULL, status TEXT,
+                                                    message TEXT, cached INTEGER, result_count INTEGER);
+            CREATE TABLE IF NOT EXISTS results (id INTEGER PRIMARY KEY, search_id INTEGER NOT NULL, engine TEXT NOT NULL,
+                                                rank INTEGER, url TEXT NOT NULL, title TEXT, snippet TEXT);
+            CREATE INDEX IF NOT EXISTS engine_runs_search ON engine_runs (search_id);
+            CREATE INDEX IF NOT EXISTS results_search ON results (search_id);
+            CREATE INDEX IF NOT EXISTS results_url ON results (url);
+        """)
+        try:
+            self._db.execute("CREATE VIRTUAL TABLE IF NOT EXISTS results_fts USING fts5(query, url, title, snippet)")
+            self.full_text = True
+        except sqlite3.OperationalError:
+            self.full_text = False # SQLite built without FTS5: search() falls back to LIKE matching
+        self._db.commit()
+        # record_search() hands out handles of this instance; SQLite assigns the row ids when the
+        # search is written, so several processes can share one database
+        self._search_handles = itertools.count(1)
+        self._search_rows = {} # handle -> searches.id, used by the writer thread only
+        self._pending = queue.Queue()
+        self._last_compact = 0.0
+        self._writer = threading.Thread(target=self._write_loop, name="search-history-writer", daemon=True)
+        self._writer.start()
+
+    def record_search(self, query):
+        """Queues a new search and returns its id for record_result()."""
+        handle = next(self._search_handles)
+        self._pending.put(("search", handle, query, time.time()))
+        return handle
+
+    def record_result(self, search_id, result_data):
+        """Queues one engine result dict (as returned by search_engine()) of search `search_id`."""
+        self._pending.put(("result", search_id, result_data))
+
+    def record_metadata(self, url, title, snippet):
+        """Queues the page title and description of `url` for every recorded result with that URL."""
+        self._pending.put(("metadata", url, title or None, snippet or None))
+
+    def flush(self):
+        """Blocks until everything queued so far is written."""
+        self._pending.put(("flush",)) # Makes the writer stop batching and write right away
+        self._pending.join()
+
+    def close(self):
+        """Writes the queued records and stops the writer thread."""
+        self._pending.put(None)
+        self._writer.join()
+        with self._lock:
+            self._db.close()
+
+    def search(self, text, limit=100):
+        """Returns past results matching `text`, best match first, as dicts.
+
+        Every word of `text` must occur in the query, URL, title or snippet of a result
+        (words match as prefixes). Each dict has "query", "searched_at", "engine", "rank",
+        "url", "title" and "snippet".
+        """
+        words = re.findall(r"\w+", text.lower())
+        if not words:
+            return []
+        select = ("SELECT s.query, s.searched_at, r.engine, r.rank, r.url, r.title, r.snippet "
+                  "FROM results r JOIN searches s ON s.id = r.search_id ")
+        if self.full_text:
+            match = " ".join('"' + word + '"*' for word in words)
+            sql = select + "JOIN results_fts f ON f.rowid = r.id WHERE results_fts MATCH ? ORDER BY f.rank, s.searched_at DESC LIMIT ?"
+            params = (match, limit)
+        else:
+            haystack = "(s.query || ' ' || r.url || ' ' || IFNULL(r.title, '') || ' ' || IFNULL(r.snippet, ''))"
+            sql = select + "WHERE " + " AND ".join(f"{haystack} LIKE ?" for _ in words) + " ORDER BY s.searched_at DESC LIMIT ?"
+            params = tuple(f"%{word}%" for word in words) + (limit,)
+        with self._lock:
+            rows = self._db.execute(sql, params).fetchall()
+        keys = ("query", "searched_at", "engine", "rank", "url", "title", "snippet")
+        return [dict(zip(keys, row)) for row in rows]
+
+    def recent_searches(self, limit=50):
+        """Returns the most recent searches as (query, searched_at) tuples, newest first."""
+        with self._lock:
+            return self._db.execute("SELECT query, searched_at FROM searches ORDER BY id DESC LIMIT ?", (limit,)).fetchall()
+
+    def compact(self):
+        """Drops searches beyond the retention limits and compacts the index and database file."""
+        with self._lock:
+            expired = []
+            if self.max_age_days is not None:
+                cutoff = time.time() - self.max_age_days * 86400
+                expired += [row[0] for row in self._db.execute("SELECT id FROM searches WHERE searched_at < ?", (cutoff,))]
+            if self.max_searches is not None:
+                expired += [row[0] for row in self._db.execute("SELECT id FROM searches ORDER BY id DESC LIMIT -1 OFFSET ?", (self.max_searches,))]
+            if expired:
+                expired_ids = [(search_id,) for search_id in set(expired)]
+                if self.full_text:
+                    self._db.executemany("DELETE FROM results_fts WHERE rowid IN (SELECT id FROM results WHERE search_id = ?)", expired_ids)
+                self._db.executemany("DELETE FROM results WHERE search_id = ?", expired_ids)
+                self._db.executemany("DELETE FROM engine_runs WHERE search_id = ?", expired_ids)
+                self._db.executemany("DELETE FROM searches WHERE id = ?", expired_ids)
+            if self.full_text:
+                self._db.execute("INSERT INTO results_fts (results_fts) VALUES ('optimize')") # Merge index segments
+            self._db.commit()
+            if expired:
+                self._db.execute("VACUUM") # Give the space of dropped rows back to the file system
+            self._last_compact = time.time()
+
+    def _write_loop(self):
+        while True:
+            batch = [self._pending.get()]
+            deadline = time.monotonic() + self.flush_interval
+            while batch[-1] is not None and batch[-1][0] != "flush" and len(batch) < self.batch_size:
+                remaining = deadline - time.monotonic()
+                try:
+                    batch.append(self._pending.get(timeout=remaining) if remaining > 0 else self._pending.get_nowait())
+                except queue.Empty:
+                    break
+            stopping = batch[-1] is None
+            try:
+                self._write_batch([record for record in batch if record is not None])
+                if time.time() - self._last_compact > self.COMPACT_INTERVAL:
+                    self.compact()
+            except sqlite3.Error as e:
+                print(f"Could not write search history: {e}", file=sys.stderr)
+            finally:
+                for _ in batch:
+                    self._pending.task_done()
+            if stopping:
+                return
+
+    def _write_batch(self, batch):
+        if not any(record[0] in ("search", "result", "metadata") for record in batch):
+            return
+        queries = {} # search id -> query, for the full-text rows
+        next_ranks = {} # (search id, engine) -> rank of the engine's next result, for further result pages
+        metadata = {}
+        new_handles = []
+        with self._lock:
+            try:
+                for record in batch:
+                    if record[0] == "search":
+                        _, handle, query, searched_at = record
+                        search_id = self._db.execute("INSERT INTO searches (query, searched_at) VALUES (?, ?)", (query, searched_at)).lastrowid
+                        self._search_rows[handle] = search_id
+                        new_handles.append(handle)
+                        queries[search_id] = query
+                    elif record[0] == "result":
+                        self._write_result(self._search_rows.get(record[1]), record[2], queries, next_ranks)
+                    elif record[0] == "metadata":
+                        metadata[record[1]] = record[2:] # Written after this batch's results, which it may describe
+                for url, (title, snippet) in metadata.items():
+                    result_ids = [row[0] for row in self._db.execute("SELECT id FROM results WHERE url = ?", (url,))]
+                    if not result_ids:
+                        continue
+                    self._db.execute("UPDATE results SET title = ?, snippet = ? WHERE url = ?", (title, snippet, url))
+                    if self.full_text:
+                        self._db.executemany("UPDATE results_fts SET title = ?, snippet = ? WHERE rowid = ?",
+                                             [(title, snippet, result_id) for result_id in result_ids])
+                self._db.commit()
+            except sqlite3.Error:
+                self._db.rollback()
+                for handle in new_handles: # Their rows are gone; results for them are dropped
+                    del self._search_rows[handle]
+                raise
+
+    def _write_result(self, search_id, result_data, queries, next_ranks):
+        # Caller holds self._lock and commits
+        if search_id is None:
+            return # Its search could not be written
+        engine_name = result_data["engine"]
+        self._db.execute("INSERT INTO engine_runs (search_id, engine, status, message, cached, result_count) VALUES (?, ?, ?, ?, ?, ?)",
+                         (search_id, engine_name, result_data["status"], result_data.get("message"), int(bool(result_data.get("cached"))),
+                          len(result_data["results"])))
+        key = (search_id, engine_name)
+        first_rank = 1
+        if result_data.get("page", 1) > 1: # Further pages continue after the results stored for the engine
+            if key not in next_ranks:
+                next_ranks[key] = self._db.execute("SELECT COUNT(*) FROM results WHERE search_id = ? AND engine = ?", key).fetchone()[0] + 1
+            first_rank = next_ranks[key]
+        next_ranks[key] = first_rank + len(result_data["results"])
+        if self.full_text and search_id not in queries: # Search recorded in an earlier batch
+            found = self._db.execute("SELECT query FROM searches WHERE id = ?", (search_id,)).fetchone()
+            queries[search_id] = found[0] if found else ""
+        fts_rows = []
+        for rank, url in enumerate(result_data["results"], start=first_rank):
+            result_id = self._db.execute("INSERT INTO results (search_id, engine, rank, url) VALUES (?, ?, ?, ?)",
+                                         (search_id, engine_name, rank, url)).lastrowid
+            fts_rows.append((result_id, queries.get(search_id), url))
+        if self.full_text and fts_rows:
+            self._db.executemany("INSERT INTO results_fts (rowid, query, url) VALUES (?, ?, ?)", fts_rows)
+
+class ResultIndex:
+    """Cross-engine index of the unique result URLs of a search (thread-safe).
+
+    Every distinct page (by canonical_url_key()) is stored once, together with the
+    (engine, rank) pairs of all engines that returned it.
+    """
+
+    def __init__(self):
+        self._entries = {} # canonical key -> {"url": first URL seen, "sources": [(engine, rank), ...]}
+        self._lock = threading.Lock()
+
+    def add(self, engine_name, urls, first_rank=1):
+        """Records the ranked `urls` of one engine and returns those not seen before, in rank order.
+
+        `first_rank` is the rank of the first URL, for result pages after the first.
+        """
+        new_urls = []
+        with self._lock:
+            for rank, url in enumerate(urls, start=first_rank):
+                key = canonical_url_key(url)
+                entry = self._entries.get(key)
+                if entry is None:
+                    entry = self._entries[key] = {"url": url, "sources": []}
+                    new_urls.append(url)
+                entry["sources"].append((engine_name, rank))
+        return new_urls
+
+    def sources(self, url):
+        """Returns the (engine, rank) pairs that returned `url` or an equivalent URL."""
+        with self._lock:
+            entry = self._entries.get(canonical_url_key(url))
+            return list(entry["sources"]) if entry else []
+
+    def entries(self):
+        """Returns a snapshot of all unique results as {"url", "sources"} dicts."""
+        with self._lock:
+            return [{"url": e["url"], "sources": list(e["sources"])} for e in self._entries.values()]
+
+    def __len__(self):
+        return len(self._entries)
+
+class RankFusion(ResultIndex):
+    """ResultIndex that also merges the engines' rankings with weighted reciprocal rank fusion.
+
+    Each engine adds weight / (k + rank) to the score of every URL it returns. Scores
+    are updated incrementally as engine results arrive; ranked() sorts on demand.
+    Weights default to the ones configured in search_engines.json.
+    """
+
+    def __init__(self, weights=None, k=DEFAULT_RRF_K):
+        super().__init__()
+        self.weights = weights
+        self.k = k
+        self._scores = {} # canonical key -> fused score
+        self._order = {} # canonical key -> arrival position, used to break ties
+
+    def add(self, engine_name, urls, first_rank=1):
+        weight = self.weights.get(engine_name, DEFAULT_ENGINE_WEIGHT) if self.weights is not None else get_engine_weight(engine_name)
+        new_urls = super().add(engine_name, urls, first_rank)
+        with self._lock:
+            for rank, url in enumerate(urls, start=first_rank):
+                key = canonical_url_key(url)
+                self._scores[key] = self._scores.get(key, 0.0) + weight / (self.k + rank)
+                self._order.setdefault(key, len(self._order))
+        return new_urls
+
+    def ranked(self, limit=None):
+        """Returns the merged results, best first, as {"url", "score", "sources"} dicts."""
+        with self._lock:
+            sort_key = lambda key: (-self._scores[key], self._order[key])
+            if limit is not None and limit < len(self._scores):
+                keys = heapq.nsmallest(limit, self._scores, key=sort_key)
+            else:
+                keys = sorted(self._scores, key=sort_key)
+            return [{"url": self._entries[key]["url"], "score": self._scores[key], "sources": list(self._entries[key]["sources"])}
+                    for key in keys]
+
+# --- Result Enrichment ---
+
+METADATA_STRAINER = SoupStrainer(["title", "meta"])
+
+def extract_page_metadata(content):
+    """Returns the "title" and "description" of an HTML page (or its first bytes); missing ones are empty."""
+    soup = BeautifulSoup(content, HTML_PARSER, parse_only=METADATA_STRAINER)
+    title_tag = soup.find("title")
+    title = " ".join(title_tag.get_text().split()) if title_tag else ""
+    meta_content = {}
+    for meta in soup.find_all("meta"):
+        name = (meta.get("name") or meta.get("property") or "").lower()
+        if name in ("description", "og:description", "og:title") and meta.get("content"):
+            meta_content.setdefault(name, " ".join(meta["content"].split()))
+    title = title or meta_content.get("og:title", "")
+    description = meta_content.get("description") or meta_content.get("og:description", "")
+    return {"title": title[:MAX_TITLE_LENGTH], "description": description[:MAX_DESCRIPTION_LENGTH]}
+
+def fetch_page_metadata(url, max_bytes=DEFAULT_ENRICHMENT_SETTINGS["max_bytes"], timeout=DEFAULT_ENRICHMENT_SETTINGS["timeout"]):
+    """Downloads the start of `url` (until </head> or `max_bytes`) and returns its extract_page_metadata()."""
+    content = bytearray()
+    with get_http_session().get(url, headers=REQUEST_HEADERS, timeout=timeout, stream=True) as response:
+        response.raise_for_status()
+        if "html" not in response.headers.get("Content-Type", "text/html").lower():
+            return {"title": "", "description": ""} # PDFs, images etc. have no metadata worth a download
+        for chunk in response.iter_content(chunk_size=8192):
+            # Look for the end of <head> in the new chunk, plus a few bytes before it in case the tag is split
+            search_start = max(0, len(content) - 6)
+            content += chunk
+            if len(content) >= max_bytes or b"</head" in content[search_start:].lower():
+                break
+    return extract_page_metadata(bytes(content[:max_bytes]))
+
+class PageEnricher:
+    """Fetches the titles and descriptions of result pages on a bounded pool of threads.
+
+    request() queues URLs; the URLs of the latest call are fetched first, in the order
+    given, so the results currently on screen are enriched before older ones. Metadata is
+    stored in `cache` (a ResultCache keyed on canonical_url_key()), so a page found again
+    by another engine or query is not fetched again. `on_metadata(url, metadata)` is
+    called from a worker thread for every requested page whose metadata is known, whether
+    it was fetched or found in the cache; request() itself never touches the cache, so it
+    is cheap to call from a GUI thread. Pages that fail to load are not retried during
+    this session.
+    """
+
+    def __init__(self, on_metadata, cache=None, workers=DEFAULT_ENRICHMENT_SETTINGS["workers"],
+                 max_bytes=DEFAULT_ENRICHMENT_SETTINGS["max_bytes"], timeout=DEFAULT_ENRICHMENT_SETTINGS["timeout"], max_queued=1000):
+        self.on_metadata = on_metadata
+        self.cache = cache if cache is not None else ResultCache(DEFAULT_ENRICHMENT_SETTINGS["ttl_seconds"],
+                                                                 DEFAULT_ENRICHMENT_SETTINGS["max_entries"])
+        self.max_bytes = max_bytes
+        self.timeout = timeout
+        self.max_queued = max_queued
+        self._cond = threading.Condition()
+        self._heap = [] # (batch, sequence, url, key); lower batches were requested later
+        self._queued = {} # key -> batch of its current heap entry; older entries for the key are skipped
+        self._in_flight = set()
+        self._failed = set()
+        self._batch = 0
+        self._sequence = itertools.count()
+        self._closed = False
+        self._threads = [threading.Thread(target=self._work, name=f"enrich-{i}", daemon=True) for i in range(max(1, workers))]
+        for thread in self._threads:
+            thread.start()
+
+    def get(self, url):
+        """Returns the cached metadata of `url`, or None if it has not been fetched."""
+        cached = self.cache.get(canonical_url_key(url))
+        return None if cached is None else {"title": cached[0], "description": cached[1]}
+
+    def request(self, urls):
+        """Queues the pages of `urls`, ahead of everything requested before."""
+        keys = [(url, canonical_url_key(url)) for url in urls]
+        with self._cond:
+            self._batch -= 1
+            for url, key in keys:
+                if key in self._in_flight or key in self._failed or self._queued.get(key) == self._batch:
+                    continue
+                self._queued[key] = self._batch
+                heapq.heappush(self._heap, (self._batch, next(self._sequence), url, key))
+            if len(self._heap) > 2 * self.max_queued:
+                # Forget the oldest requests (and entries superseded by a later request for the same page);
+                # pages scrolled away long ago are the least interesting
+                current = [entry for entry in self._heap if self._queued.get(entry[3]) == entry[0]]
+                self._heap = heapq.nsmallest(self.max_queued, current)
+                heapq.heapify(self._heap)
+                self._queued = {key: batch for batch, _, _, key in self._heap}
+            self._cond.notify_all()
+
+    def cancel(self):
+        """Drops every queued page; pages being fetched still complete."""
+        with self._cond:
+            self._heap.clear()
+            self._queued.clear()
+
+    def close(self):
+        """Stops the worker threads once their current page is done."""
+        with self._cond:
+            self._closed = True
+            self._heap.clear()
+            self._queued.clear()
+            self._cond.notify_all()
+
+    def _work(self):
+        while True:
+            with self._cond:
+                while not self._heap and not self._closed:
+                    self._cond.wait()
+                if self._closed:
+                    return
+                batch, _, url, key = heapq.heappop(self._heap)
+                if self._queued.get(key) != batch:
+                    continue # Requested again later; that entry is the one to use
+                del self._queued[key]
+                self._in_flight.add(key)
+            metadata = self.get(url)
+            if metadata is not None:
+                with self._cond:
+                    self._in_flight.discard(key)
+                self.on_metadata(url, metadata)
+                continue
+            try:
+                metadata = fetch_page_metadata(url, self.max_bytes, self.timeout)
+            except Exception: # Any page can fail in any way; it just stays without metadata
+                metadata = None
+            with self._cond:
+                self._in_flight.discard(key)
+                if metadata is None:
+                    self._failed.add(key)
+            if metadata is not None:
+                self.cache.put(key, [metadata["title"], metadata["description"]])
+                self.on_metadata(url, metadata)
+
+# --- Result Page Prefetching ---
+
+class PagePrefetcher:
+    """Loads result pages in the background before they are asked for, within a budget (thread-safe).
+
+    prefetch() starts `fetch()` (which returns one result dict) for a page unless it is
+    already held, `max_in_flight` prefetches are running or `max_pages` pages are held.
+    Held pages are never dropped for new ones; take() hands a page over (waiting for it if
+    it is still loading) and frees its place, clear() frees all of them.
+    """
+
+    def __init__(self, max_pages=DEFAULT_PREFETCH_SETTINGS["max_pages"], max_in_flight=DEFAULT_PREFETCH_SETTINGS["max_in_flight"]):
+        self.max_pages = max_pages
+        self.max_in_flight = max_in_flight
+        self._lock = threading.Lock()
+        self._pages = {} # (engine, normalized query, page) -> Future of the result dict
+        self._executor = ThreadPoolExecutor(max_workers=max(1, max_in_flight), thread_name_prefix="prefetch")
+
+    @staticmethod
+    def _key(engine_name, query, page):
+        return engine_name, " ".join(query.lower().split()), page
+
+    def prefetch(self, engine_name, query, page, fetch):
+        """Starts loading a page; returns False if it is held already or the budget is used up."""
+        key = self._key(engine_name, query, page)
+        with self._lock:
+            if key in self._pages or len(self._pages) >= self.max_pages:
+                return False
+            if sum(1 for future in self._pages.values() if not future.done()) >= self.max_in_flight:
+                return False
+            self._pages[key] = self._executor.submit(fetch)
+            return True
+
+    def take(self, engine_name, query, page):
+        """Returns the prefetched result dict of a page (waiting if needed) and forgets it, or None."""
+        with self._lock:
+            future = self._pages.pop(self._key(engine_name, query, page), None)
+        if future is None or future.cancelled():
+            return None
+        try:
+            return future.result()
+        except Exception: # The page is simply loaded again by the caller
+            return None
+
+    def clear(self):
+        """Forgets every held page; prefetches that have not started are cancelled."""
+        with self._lock:
+            pages, self._pages = self._pages, {}
+        for future in pages.values():
+            future.cancel()
+
+    def close(self):
+        """Forgets every held page and stops the prefetch threads."""
+        self.clear()
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+def iter_search_results(query, engine_names, engines, max_workers=DEFAULT_MAX_CONCURRENT_SEARCHES, per_host_delay=DEFAULT_PER_HOST_DELAY,
+                        cache=None, use_cache=True, parser_pool=None, rate_limiter=None, circuit_breaker=None,
+                        cancel_token=None, max_unique_results=None, backend=None, http_cache=None, metrics=None, hedger=None, page=1):
+    """Searches several engines concurrently and yields each result dict as soon as it is ready.
+
+    At most `max_workers` requests are in flight at once. Requests to the same host go
+    through a HostRateLimiter (a new one starting at `per_host_delay` spacing unless one
+    is passed in), and engines with an open CircuitBreaker are reported with status
+    "Skipped" without a request. When a ResultCache is
+    given, cached results are returned without a request (marked with "cached": True,
+    like pages that are still fresh in the HttpCache);
+    `use_cache=False` bypasses the lookup but still refreshes the cache; pages in the
+    HttpCache are then revalidated with the engine even if they are still fresh. With a
+    ParserPool, fetched pages are parsed in worker processes. An HttpCache stores the
+    raw pages so unchanged ones are revalidated instead of downloaded and parsed again.
+    Every request is recorded in `metrics` (an EngineMetrics) if one is given. A
+    RequestHedger duplicates requests that take unusually long on the engines it covers.
+    `page` selects a further result page (see engine_page_url()); results of pages after
+    the first carry their "page" number, and engines whose URL has no page placeholder
+    are reported as "Skipped".
+
+    Cancelling `cancel_token` aborts in-flight downloads, skips queued engines and ends
+    the iteration. With `max_unique_results`, the search stops the same way once that
+    many distinct pages (by canonical_url_key()) have been yielded.
+
+    With an AsyncFetchBackend as `backend`, requests run as coroutines on its event
+    loop instead of on a thread pool; `max_workers` is then the number in flight.
+    """
+    return iter_batch_results([query], engine_names, engines, max_workers=max_workers, per_host_delay=per_host_delay,
+                              cache=cache, use_cache=use_cache, parser_pool=parser_pool, rate_limiter=rate_limiter,
+                              circuit_breaker=circuit_breaker, cancel_token=cancel_token, max_unique_results=max_unique_results,
+                              backend=backend, http_cache=http_cache, metrics=metrics, hedger=hedger, page=page)
+
+def iter_batch_results(queries, engine_names, engines, max_workers=DEFAULT_MAX_CONCURRENT_SEARCHES, per_host_delay=DEFAULT_PER_HOST_DELAY,
+                       cache=None, use_cache=True, parser_pool=None, rate_limiter=None, circuit_breaker=None,
+                       cancel_token=None, max_unique_results=None, merged=False, weights=None, rrf_k=DEFAULT_RRF_K, backend=None,
+                       http_cache=None, metrics=None, hedger=None, page=1, merged_updates=False):
+    """Runs every query in `queries` on every engine and yields result dicts in completion order.
+
+    `queries` may be any iterable (e.g. a file object); it is consumed lazily so only a
+    bounded number of (query, engine) jobs is pending at any time. Each yielded dict has
+    the same shape as search_engine() returns, plus the "query" it belongs to.
+    `max_unique_results` applies to each query separately. See iter_search_results()
+    for the other arguments.
+
+    With `merged=True`, the per-engine dicts are not yielded; instead, once all engines
+    of a query have answered, one dict with engine "merged" is yielded whose "results"
+    are the URLs ranked by RankFusion (using `weights` and `rrf_k`) and whose "ranking"
+    holds each URL's score and sources. It has "final": True. With `merged_updates=True`,
+    a snapshot of the ranking so far (with "final": False and the number of engines still
+    "pending") is also yielded every time another engine of the query returns results,
+    so the ranking can be shown while slower engines are still running.
+    """
+    engine_names = list(engine_names)
+    if not engine_names:
+        return
+    if rate_limiter is None:
+        rate_limiter = HostRateLimiter(per_host_delay)
+    # Cancelled when the caller cancels or stops iterating, so no request outlives the generator
+    run_token = CancellationToken(cancel_token)
+
+    def before_fetch(query, engine_name, query_token):
+        """Returns (result dict, None) if the engine needs no request, else (None, URL template)."""
+        if query_token.cancelled:
+            return {"engine": engine_name, "status": "Cancelled", "message": "Search cancelled.", "results": [], "query": query}, None
+        engine_url_template = engines.get(engine_name)
+        if not engine_url_template:
+            return {"engine": engine_name, "status": "Error", "message": f"URL for '{engine_name}' not found.", "results": [], "query": query}, None
+        if page > 1 and not supports_pages(engine_url_template):
+            return {"engine": engine_name, "status": "Skipped", "message": f"{engine_name.capitalize()} has no further result pages ({{page}} or {{offset}} is not in its URL).",
+                    "results": [], "query": query}, None
+        if cache is not None and use_cache:
+            cached_results = cache.get(ResultCache.make_key(engine_name, query, engine_url_template, page))
+            if cached_results is not None:
+                return {"engine": engine_name, "status": "Success", "message": "Served from cache.", "results": cached_results, "cached": True, "query": query}, None
+        if circuit_breaker is not None and not circuit_breaker.allow(engine_name):
+            retry_at = time.strftime("%H:%M:%S", time.localtime(circuit_breaker.open_until(engine_name) or time.time()))
+            return {"engine": engine_name, "status": "Skipped", "message": f"{engine_name.capitalize()} failed repeatedly; skipped until {retry_at}.",
+                    "results": [], "query": query}, None
+        return None, engine_url_template
+
+    def rate_limited(query, engine_name, engine_url_template):
+        if circuit_breaker is not None:
+            circuit_breaker.release(engine_name)
+        retry_in = rate_limiter.throttled_for(engine_url_template)
+        return {"engine": engine_name, "status": "Skipped", "message": f"{engine_name.capitalize()} is rate limiting requests; skipped (retry in {retry_in:.0f}s).",
+                "results": [], "query": query}
+
+    def run_one(query, engine_name, query_token):
+        result_data, engine_url_template = before_fetch(query, engine_name, query_token)
+        if result_data is not None:
+            return result_data
+        if not rate_limiter.acquire(engine_url_template, query_token):
+            return rate_limited(query, engine_name, engine_url_template)
+
+        def attempt(token):
+            timing = FetchTiming()
+            return search_engine(query, engine_name, engine_url_template, parser_pool=parser_pool, rate_limiter=rate_limiter,
+                                 cancel_token=token, http_cache=http_cache, timing=timing, page=page, revalidate=not use_cache), timing
+
+        if hedger is not None:
+            result_data, timing = hedger.run(engine_name, engine_page_url(engine_url_template, query, page), attempt, query_token, rate_limiter)
+        else:
+            result_data, timing = attempt(query_token)
+        return after_fetch(query, engine_name, engine_url_template, result_data, timing)
+
+    async def run_one_async(query, engine_name, query_token):
+        result_data, engine_url_template = before_fetch(query, engine_name, query_token)
+        if result_data is not None:
+            return result_data
+        if not await backend.acquire(rate_limiter, engine_url_template, query_token):
+            return rate_limited(query, engine_name, engine_url_template)
+
+        async def attempt(token):
+            timing = FetchTiming()
+            return await backend.search_engine(query, engine_name, engine_url_template, parser_pool=parser_pool, rate_limiter=rate_limiter,
+                                               cancel_token=token, http_cache=http_cache, timing=timing, page=page, revalidate=not use_cache), timing
+
+        if hedger is not None:
+            result_data, timing = await hedger.run_async(engine_name, engine_page_url(engine_url_template, query, page), attempt, query_token,
+                                                         rate_limiter)
+        else:
+            result_data, timing = await attempt(query_token)
+        return after_fetch(query, engine_name, engine_url_template, result_data, timing)
+
+    def after_fetch(query, engine_name, engine_url_template, result_data, timing):
+        """Updates the circuit breaker, the cache and the metrics with a fetched result."""
+        cached = result_data.get("cached", False) # Still fresh in the HttpCache: no request was sent
+        if metrics is not None and not cached:
+            metrics.record(engine_name, result_data, timing)
+        if circuit_breaker is not None:
+            if result_data["status"] == "Cancelled" or cached:
+                circuit_breaker.release(engine_name)
+            elif result_data["status"] == "Success":
+                circuit_breaker.record_success(engine_name)
+            else:
+                circuit_breaker.record_failure(engine_name)
+        if cache is not None and result_data["status"] == "Success":
+            cache.put(ResultCache.make_key(engine_name, query, engine_url_template, page), result_data["results"])
+        result_data["query"] = query
+        return result_data
+
+    def with_page(result_data):
+        if page > 1:
+            result_data["page"] = page
+        return result_data
+
+    # Per-query bookkeeping: index -> {"token", "remaining" jobs, canonical "urls" seen, "query", "fusion" when merging}
+    query_states = {}
+
+    def merged_result(query, fusion, pending=0):
+        ranking = fusion.ranked()
+        return {"engine": "merged", "status": "Success", "message": f"Merged {len(ranking)} unique result(s).",
+                "results": [entry["url"] for entry in ranking], "ranking": ranking, "query": query, "final": pending == 0, "pending": pending}
+
+    def finish(future):
+        """Books a finished job and returns the dicts to yield for it."""
+        query_index, result_data = future.result()
+        state = query_states[query_index]
+        state["remaining"] -= 1
+        outputs = []
+        if result_data["status"] != "Cancelled":
+            if max_unique_results:
+                state["urls"].update(canonical_url_key(url) for url in result_data["results"]) # Variants of a page count once
+                if len(state["urls"]) >= max_unique_results:
+                    state["token"].cancel() # Enough results for this query: skip the rest of its engines
+            if not merged:
+                outputs.append(result_data)
+            elif result_data["status"] == "Success":
+                state["fusion"].add(result_data["engine"], result_data["results"])
+                if merged_updates and state["remaining"] > 0 and not state["token"].cancelled:
+                    outputs.append(merged_result(state["query"], state["fusion"], state["remaining"]))
+        if state["remaining"] == 0:
+            del query_states[query_index]
+            state["token"].detach()
+            if merged and not run_token.cancelled:
+                outputs.append(merged_result(state["query"], state["fusion"]))
+        return outputs
+
+    def submit(executor, query_index, query, engine_name):
+        state = query_states.get(query_index)
+        if state is None:
+            state = query_states[query_index] = {"token": CancellationToken(run_token), "remaining": len(engine_names), "urls": set(),
+                                                 "query": query, "fusion": RankFusion(weights, rrf_k) if merged else None}
+        token = state["token"]
+        if backend is not None:
+            async def job():
+                return query_index, with_page(await run_one_async(query, engine_name, token))
+            return backend.submit(job())
+        return executor.submit(lambda: (query_index, with_page(run_one(query, engine_name, token))))
+
+    jobs = ((query_index, query, engine_name) for query_index, query in enumerate(queries) for engine_name in engine_names)
+    if backend is not None:
+        max_pending = max(1, max_workers) # Every submitted coroutine is in flight at once
+        executor = None
+    else:
+        max_pending = max(1, max_workers) * 2 # Keep the pool busy without queueing every job up front
+        executor = ThreadPoolExecutor(max_workers=max(1, max_workers))
+    pending = set()
+    # Resolved when the run gets cancelled, so waiting for jobs stops even while requests hang
+    stopped = Future()
+    run_token.add_callback(lambda: stopped.set_result(None))
+
+    def wait_for_jobs():
+        nonlocal pending
+        done, pending = wait(pending | {stopped}, return_when=FIRST_COMPLETED)
+        pending.discard(stopped)
+        done.discard(stopped)
+        return done
+
+    try:
+        for query_index, query, engine_name in jobs:
+            if run_token.cancelled:
+                break
+            pending.add(submit(executor, query_index, query, engine_name))
+            if len(pending) >= max_pending:
+                for future in wait_for_jobs():
+                    yield from finish(future)
+        while pending and not run_token.cancelled:
+            for future in wait_for_jobs():
+                yield from finish(future)
+    finally:
+        run_token.cancel()
+        run_token.detach()
+        # Don't wait for requests that are still running: their results are dropped, and
+        # cancelling the futures also cancels the async backend's coroutines
+        for future in pending:
+            future.cancel()
+        if executor is not None:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+def batch_search(queries, engine_names=None, engines_file=DEFAULT_ENGINES_FILE, max_workers=DEFAULT_MAX_CONCURRENT_SEARCHES,
+                 per_host_delay=DEFAULT_PER_HOST_DELAY, cache=None, use_cache=True, parser_pool=None, rate_limiter=None,
+                 circuit_breaker=None, cancel_token=None, max_unique_results=None, merged=False, weights=None, rrf_k=DEFAULT_RRF_K,
+                 backend=None, http_cache=None, metrics=None, hedger=None, page=1, merged_updates=False):
+    """Library entry point: searches `queries` on `engine_names` (all engines if None) headlessly.
+
+    Blank queries are skipped and surrounding whitespace is stripped, so a file object
+    with one query per line can be passed directly. Yields result dicts as they arrive,
+    or one merged ranking per query with `merged=True` (see iter_batch_results()).
+    See iter_search_results() for the other arguments.
+    """
+    engines = load_engines(engines_file)
+    if engine_names is None:
+        engine_names = sorted(engines.keys())
+    cleaned_queries = (q.strip() for q in queries)
+    return iter_batch_results((q for q in cleaned_queries if q), engine_names, engines, max_workers=max_workers,
+                              per_host_delay=per_host_delay, cache=cache, use_cache=use_cache, parser_pool=parser_pool,
+                              rate_limiter=rate_limiter, circuit_breaker=circuit_breaker, cancel_token=cancel_token,
+                              max_unique_results=max_unique_results, merged=merged, weights=weights, rrf_k=rrf_k, backend=backend,
+                              http_cache=http_cache, metrics=metrics, hedger=hedger, page=page, merged_updates=merged_updates)
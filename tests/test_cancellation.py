@@ -0,0 +1,91 @@
+"""Cancelling a batch must return promptly even while requests are still waiting for a server."""
+import asyncio
+import os
+import sys
+import threading
+import time
+import unittest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from search_core import CancellationToken, HostRateLimiter, httpx, create_fetch_backend, iter_batch_results # noqa: E402
+
+STOP_WITHIN = 2.0 # Seconds the generator may take to finish after the token is cancelled
+
+class HangingHandler(BaseHTTPRequestHandler):
+    """Accepts every request and answers only once the test releases it."""
+
+    def do_GET(self):
+        self.server.requests.append(self.path)
+        self.server.release.wait(30)
+        self.send_response(200)
+        self.send_header("Content-Type", "text/html")
+        self.end_headers()
+        self.wfile.write(b"<html><body></body></html>")
+
+    def log_message(self, format, *args):
+        pass
+
+class CancellationTests(unittest.TestCase):
+    def setUp(self):
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), HangingHandler)
+        self.server.daemon_threads = True
+        self.server.requests = []
+        self.server.release = threading.Event()
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        host, port = self.server.server_address
+        self.engines = {f"slow{i}": f"http://{host}:{port}/slow{i}?q={{query}}" for i in range(1, 5)}
+
+    def tearDown(self):
+        self.server.release.set()
+        self.server.shutdown()
+        self.server.server_close()
+
+    def run_until_cancelled(self, backend):
+        cancel_token = CancellationToken()
+        outcome = {}
+
+        def consume():
+            outcome["results"] = list(iter_batch_results(["a", "b", "c"], list(self.engines), self.engines, max_workers=4,
+                                                         rate_limiter=HostRateLimiter(0, burst=100), cancel_token=cancel_token, backend=backend))
+            outcome["finished"] = time.monotonic()
+
+        consumer = threading.Thread(target=consume, daemon=True)
+        consumer.start()
+        deadline = time.monotonic() + 5
+        while not self.server.requests and time.monotonic() < deadline:
+            time.sleep(0.01)
+        self.assertTrue(self.server.requests, "no request reached the server")
+        cancelled_at = time.monotonic()
+        cancel_token.cancel()
+        consumer.join(STOP_WITHIN)
+        self.assertFalse(consumer.is_alive(), "iter_batch_results kept waiting for hanging requests")
+        self.assertLess(outcome["finished"] - cancelled_at, STOP_WITHIN)
+        self.assertEqual(outcome["results"], [])
+
+    def test_threads_backend_stops_promptly(self):
+        self.run_until_cancelled(None)
+
+    @unittest.skipIf(httpx is None, "the async backend needs httpx")
+    def test_async_backend_stops_promptly(self):
+        backend = create_fetch_backend("async")
+        try:
+            self.run_until_cancelled(backend)
+            # The cancelled coroutines must not be left waiting on the loop
+            deadline = time.monotonic() + STOP_WITHIN
+            while self.pending_tasks(backend) and time.monotonic() < deadline:
+                time.sleep(0.01)
+            self.assertEqual(self.pending_tasks(backend), 0)
+        finally:
+            self.server.release.set()
+            backend.close()
+
+    @staticmethod
+    def pending_tasks(backend):
+        async def count_other_tasks():
+            return len(asyncio.all_tasks()) - 1
+        return backend.submit(count_other_tasks()).result()
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,52 @@
+"""EngineClassifier must categorize every name exactly like testing each keyword as a substring."""
+import os
+import random
+import sys
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from search_core import CATEGORY_KEYWORDS, DEFAULT_CATEGORY, DEFAULT_ENGINES, EngineClassifier # noqa: E402
+
+def substring_scan(engine_name, keywords=CATEGORY_KEYWORDS):
+    """The original categorization: a category applies if any of its keywords is in the name."""
+    lower_name = engine_name.lower()
+    found = tuple(category for category, category_keywords in keywords.items()
+                  if any(keyword in lower_name for keyword in category_keywords))
+    return found or (DEFAULT_CATEGORY,)
+
+class EngineClassifierTests(unittest.TestCase):
+    def assert_same_as_scan(self, classifier, names, keywords=CATEGORY_KEYWORDS):
+        for name in names:
+            self.assertEqual(classifier.classify(name), substring_scan(name, keywords), name)
+
+    def test_default_engines(self):
+        self.assert_same_as_scan(EngineClassifier(), DEFAULT_ENGINES)
+
+    def test_overlapping_keywords(self):
+        names = ["math_stack_exchange", "stack_exchange_images", "Google_Images", "youtube_news", "newsshop", "timesquare",
+                 "internet_archive_videos", "getty_images_news", "askubuntu", "pinterest_social", "server_fault", "plain"]
+        self.assert_same_as_scan(EngineClassifier(), names)
+
+    def test_random_names_built_from_keywords(self):
+        fragments = [keyword for category_keywords in CATEGORY_KEYWORDS.values() for keyword in category_keywords]
+        fragments += ["_", "s", "x", "e", "ex"]
+        rng = random.Random(21)
+        names = ["".join(rng.choice(fragments) for _ in range(rng.randint(1, 4))) for _ in range(500)]
+        self.assert_same_as_scan(EngineClassifier(), names)
+
+    def test_keywords_nested_across_categories(self):
+        keywords = {"A": ["ab"], "B": ["abc"], "C": ["bc", "c"], "D": ["abcd"]}
+        names = ["abcd", "xabcx", "bcd", "c", "ab", "zzz"]
+        self.assert_same_as_scan(EngineClassifier(keywords), names, keywords)
+
+    def test_case_is_ignored_and_results_are_cached(self):
+        classifier = EngineClassifier()
+        self.assertEqual(classifier.classify("YouTube"), ("Videos",))
+        self.assertIs(classifier.classify("youtube"), classifier.classify("YOUTUBE"))
+
+    def test_no_keywords(self):
+        self.assertEqual(EngineClassifier({}).classify("anything"), (DEFAULT_CATEGORY,))
+
+if __name__ == "__main__":
+    unittest.main()
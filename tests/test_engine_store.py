@@ -0,0 +1,136 @@
+"""Atomic writes of the engine file, EngineStore's coalesced saves and hot reload of outside edits."""
+import json
+import os
+import shutil
+import stat
+import sys
+import tempfile
+import threading
+import time
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from search_core import (EngineStore, get_engine_weight, register_engine_categories, register_engine_weights, # noqa: E402
+                         register_parser_rules, save_engines, write_file_atomic)
+
+ENGINES = {"google": "https://www.google.com/search?q={query}", "bing": "https://www.bing.com/search?q={query}"}
+
+class TemporaryDirectoryTestCase(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.directory, "search_engines.json")
+
+    def tearDown(self):
+        register_parser_rules({})
+        register_engine_weights({})
+        register_engine_categories({})
+        shutil.rmtree(self.directory)
+
+    def read(self):
+        with open(self.path) as f:
+            return json.load(f)
+
+    def write(self, engines):
+        # An outside edit, e.g. in a text editor
+        with open(self.path, "w") as f:
+            json.dump(engines, f)
+
+class WriteFileAtomicTests(TemporaryDirectoryTestCase):
+    def test_replaces_the_file_and_keeps_its_permissions(self):
+        with open(self.path, "w") as f:
+            f.write("old contents that are longer than the new ones")
+        os.chmod(self.path, 0o600)
+        write_file_atomic(self.path, "new")
+        with open(self.path) as f:
+            self.assertEqual(f.read(), "new")
+        self.assertEqual(stat.S_IMODE(os.stat(self.path).st_mode), 0o600)
+        self.assertEqual(os.listdir(self.directory), ["search_engines.json"])
+
+    def test_failed_write_leaves_the_file_untouched(self):
+        write_file_atomic(self.path, "old")
+        with self.assertRaises(TypeError):
+            write_file_atomic(self.path, None)
+        with open(self.path) as f:
+            self.assertEqual(f.read(), "old")
+        self.assertEqual(os.listdir(self.directory), ["search_engines.json"])
+
+    def test_readers_never_see_a_partial_file(self):
+        engines = {f"engine{i}": f"https://e{i}.example/?q={{query}}" for i in range(2000)}
+        save_engines(engines, self.path)
+        stop = threading.Event()
+
+        def keep_saving():
+            while not stop.is_set():
+                save_engines(engines, self.path)
+
+        writer = threading.Thread(target=keep_saving)
+        writer.start()
+        try:
+            for _ in range(200):
+                self.assertEqual(len(self.read()), 2000)
+        finally:
+            stop.set()
+            writer.join()
+
+class EngineStoreTests(TemporaryDirectoryTestCase):
+    def test_saves_are_coalesced_until_flushed(self):
+        store = EngineStore(self.path, save_delay=60)
+        store.load()
+        store.save(dict(ENGINES, extra="https://extra.example/?q={query}"))
+        store.save(ENGINES)
+        self.assertNotEqual(self.read(), ENGINES) # Nothing written yet
+        store.flush()
+        self.assertEqual(self.read(), ENGINES)
+
+    def test_pending_save_is_written_after_the_delay(self):
+        store = EngineStore(self.path, save_delay=0.05)
+        store.load()
+        store.save(ENGINES)
+        deadline = time.monotonic() + 5
+        while self.read() != ENGINES and time.monotonic() < deadline:
+            time.sleep(0.02)
+        self.assertEqual(self.read(), ENGINES)
+
+    def test_own_writes_are_not_reported(self):
+        store = EngineStore(self.path, save_delay=60)
+        store.load()
+        self.assertIsNone(store.poll())
+        store.save(ENGINES)
+        store.flush()
+        self.assertIsNone(store.poll())
+
+    def test_outside_edits_are_reloaded(self):
+        self.write(ENGINES)
+        store = EngineStore(self.path, save_delay=60)
+        store.load()
+        self.write({"google": "https://www.google.com/search?hl=en&q={query}",
+                    "ddg": {"url": "https://duckduckgo.com/html/?q={query}", "weight": 2.0}})
+        changed, removed = store.poll()
+        self.assertEqual(changed, {"google": "https://www.google.com/search?hl=en&q={query}", "ddg": "https://duckduckgo.com/html/?q={query}"})
+        self.assertEqual(removed, {"bing"})
+        self.assertEqual(get_engine_weight("ddg"), 2.0)
+        self.assertIsNone(store.poll())
+
+    def test_pending_changes_win_over_outside_edits(self):
+        self.write(ENGINES)
+        store = EngineStore(self.path, save_delay=60)
+        store.load()
+        store.save({"google": ENGINES["google"]})
+        self.write({"other": "https://other.example/?q={query}"})
+        self.assertIsNone(store.poll())
+        store.flush()
+        self.assertEqual(self.read(), {"google": ENGINES["google"]})
+
+    def test_invalid_file_is_ignored_until_it_changes(self):
+        self.write(ENGINES)
+        store = EngineStore(self.path, save_delay=60)
+        store.load()
+        with open(self.path, "w") as f:
+            f.write("{not json")
+        self.assertIsNone(store.poll())
+        self.write({"google": ENGINES["google"]})
+        self.assertEqual(store.poll(), ({}, {"bing"}))
+
+if __name__ == "__main__":
+    unittest.main()
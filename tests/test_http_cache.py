@@ -0,0 +1,98 @@
+"""HttpCache reuse of fresh pages, 304 revalidation and the per-search cache bypass."""
+import os
+import sys
+import threading
+import unittest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from search_core import HostRateLimiter, HttpCache, iter_search_results # noqa: E402
+
+class CachingHandler(BaseHTTPRequestHandler):
+    """Serves a result page with the server's ETag and Cache-Control; answers 304 to a matching If-None-Match."""
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        self.server.requests.append(self.headers.get("If-None-Match"))
+        if self.headers.get("If-None-Match") == self.server.etag:
+            self.send_response(304)
+            self.send_header("ETag", self.server.etag)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+        body = f'<html><body><a href="https://example.com/{self.server.version}">Result</a></body></html>'.encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "text/html")
+        self.send_header("ETag", self.server.etag)
+        self.send_header("Cache-Control", self.server.cache_control)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+class HttpCacheTests(unittest.TestCase):
+    def setUp(self):
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), CachingHandler)
+        self.server.daemon_threads = True
+        self.server.requests = []
+        self.server.version = "v1"
+        self.server.etag = '"v1"'
+        self.server.cache_control = "max-age=600"
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        host, port = self.server.server_address
+        self.engines = {"local": f"http://{host}:{port}/search?q={{query}}"}
+        self.http_cache = HttpCache()
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def search(self, use_cache=True):
+        results = list(iter_search_results("query", ["local"], self.engines, use_cache=use_cache, http_cache=self.http_cache,
+                                           rate_limiter=HostRateLimiter(0)))
+        self.assertEqual(len(results), 1)
+        self.assertEqual(results[0]["status"], "Success", results[0]["message"])
+        return results[0]
+
+    def test_fresh_page_is_reused_without_a_request(self):
+        first = self.search()
+        second = self.search()
+        self.assertEqual(self.server.requests, [None])
+        self.assertFalse(first.get("cached"))
+        self.assertTrue(second.get("cached"))
+        self.assertEqual(second["results"], first["results"])
+
+    def test_bypass_revalidates_a_fresh_page(self):
+        self.search()
+        result = self.search(use_cache=False)
+        self.assertEqual(self.server.requests, [None, '"v1"'])
+        self.assertFalse(result.get("cached"))
+        self.assertEqual(result["results"], ["https://example.com/v1"])
+
+    def test_stale_page_is_revalidated(self):
+        self.server.cache_control = "no-cache"
+        self.search()
+        result = self.search()
+        self.assertEqual(self.server.requests, [None, '"v1"'])
+        self.assertIn("not modified", result["message"])
+        self.assertEqual(result["results"], ["https://example.com/v1"])
+
+    def test_changed_page_is_downloaded_again(self):
+        self.server.cache_control = "no-cache"
+        self.search()
+        self.server.version, self.server.etag = "v2", '"v2"'
+        result = self.search()
+        self.assertEqual(result["results"], ["https://example.com/v2"])
+        self.assertEqual(self.search()["results"], ["https://example.com/v2"])
+
+    def test_no_store_pages_are_not_kept(self):
+        self.server.cache_control = "no-store"
+        self.search()
+        self.search()
+        self.assertEqual(self.server.requests, [None, None])
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,125 @@
+"""PageReader early cutoff and size cap, and how cut-off pages are kept in the HttpCache."""
+import os
+import sys
+import threading
+import unittest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from search_core import HostRateLimiter, HttpCache, PageReader, iter_search_results, register_parser_rules # noqa: E402
+
+FILLER = "<p>" + "x" * 1000 + "</p>"
+
+def result_page(count):
+    links = "".join(f'<a href="https://example.com/{i}">Result</a>{FILLER}' for i in range(count))
+    return f"<html><body>{links}</body></html>".encode()
+
+def chunks(content, size=1024):
+    return [content[i:i + size] for i in range(0, len(content), size)]
+
+class PageReaderTests(unittest.TestCase):
+    def read(self, reader, content):
+        fed = 0
+        for chunk in chunks(content):
+            fed += len(chunk)
+            if reader.add(chunk) and reader.try_finish_early():
+                break
+        return fed
+
+    def test_stops_once_the_partial_page_holds_enough_results(self):
+        content = result_page(200)
+        reader = PageReader("local", limit=5, early_parse_bytes=4096)
+        fed = self.read(reader, content)
+        self.assertLess(fed, len(content) // 10)
+        self.assertTrue(reader.truncated)
+        page, results = reader.finish()
+        self.assertEqual(results, [f"https://example.com/{i}" for i in range(5)])
+        self.assertEqual(len(page), fed)
+
+    def test_small_page_is_read_whole(self):
+        content = result_page(3)
+        reader = PageReader("local", limit=5, early_parse_bytes=1024)
+        self.assertEqual(self.read(reader, content), len(content))
+        self.assertFalse(reader.truncated)
+        self.assertEqual(len(reader.finish()[1]), 3)
+
+    def test_max_bytes_caps_the_page(self):
+        content = b"<html><body>" + FILLER.encode() * 20 + b"</body></html>"
+        reader = PageReader("local", limit=5, max_bytes=4096, early_parse_bytes=1 << 20)
+        self.assertEqual(self.read(reader, content), 4096)
+        self.assertTrue(reader.truncated)
+        page, results = reader.finish()
+        self.assertEqual(len(page), 4096)
+        self.assertEqual(results, [])
+
+class PageHandler(BaseHTTPRequestHandler):
+    """Serves a cacheable result page with the server's number of links."""
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        self.server.requests += 1
+        body = result_page(self.server.links)
+        self.send_response(200)
+        self.send_header("Content-Type", "text/html")
+        self.send_header("Cache-Control", "max-age=600")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+class PartialCacheTests(unittest.TestCase):
+    def setUp(self):
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), PageHandler)
+        self.server.daemon_threads = True
+        self.server.requests = 0
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        host, port = self.server.server_address
+        self.url = f"http://{host}:{port}/search?q=query"
+        self.engines = {"local": f"http://{host}:{port}/search?q={{query}}"}
+        self.http_cache = HttpCache()
+
+    def tearDown(self):
+        register_parser_rules({})
+        self.server.shutdown()
+        self.server.server_close()
+
+    def search(self):
+        result = list(iter_search_results("query", ["local"], self.engines, http_cache=self.http_cache,
+                                          rate_limiter=HostRateLimiter(0, burst=100)))[0]
+        self.assertEqual(result["status"], "Success", result["message"])
+        return result
+
+    def change_parser(self):
+        register_parser_rules({"local": {"link": "a[href^='https://example.com/']", "first": False}})
+
+    def test_cut_off_page_is_reused_while_the_parser_is_unchanged(self):
+        self.server.links = 500
+        first = self.search()
+        second = self.search()
+        self.assertEqual(self.server.requests, 1)
+        self.assertTrue(second.get("cached"))
+        self.assertEqual(second["results"], first["results"])
+
+    def test_cut_off_page_is_downloaded_again_when_the_parser_changes(self):
+        self.server.links = 500
+        self.search()
+        self.change_parser()
+        self.assertIsNone(self.http_cache.lookup(self.url, "local"))
+        self.assertIsNotNone(self.http_cache.lookup(self.url))
+        self.assertFalse(self.search().get("cached"))
+        self.assertEqual(self.server.requests, 2)
+
+    def test_whole_page_is_parsed_again_from_the_cache(self):
+        self.server.links = 3
+        self.search()
+        self.change_parser()
+        result = self.search()
+        self.assertTrue(result.get("cached"))
+        self.assertEqual(len(result["results"]), 3)
+        self.assertEqual(self.server.requests, 1)
+
+if __name__ == "__main__":
+    unittest.main()
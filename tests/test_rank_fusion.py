@@ -0,0 +1,104 @@
+"""RankFusion weighting and the merged rankings of iter_batch_results."""
+import os
+import sys
+import threading
+import unittest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from search_core import HostRateLimiter, RankFusion, iter_batch_results # noqa: E402
+
+class RankFusionTests(unittest.TestCase):
+    def test_scores_are_reciprocal_ranks(self):
+        fusion = RankFusion({"a": 1.0}, k=60)
+        fusion.add("a", ["https://x.example/1", "https://x.example/2"])
+        self.assertEqual([(entry["url"], entry["score"]) for entry in fusion.ranked()],
+                         [("https://x.example/1", 1 / 61), ("https://x.example/2", 1 / 62)])
+
+    def test_pages_found_by_several_engines_rank_first(self):
+        fusion = RankFusion({"a": 1.0, "b": 1.0})
+        fusion.add("a", ["https://x.example/only-a", "https://x.example/both"])
+        fusion.add("b", ["https://x.example/only-b", "https://www.x.example/both/"])
+        ranking = fusion.ranked()
+        self.assertEqual(ranking[0]["url"], "https://x.example/both") # URL variants are merged
+        self.assertEqual(ranking[0]["sources"], [("a", 2), ("b", 2)])
+        self.assertEqual(len(ranking), 3)
+
+    def test_weights_scale_an_engines_influence(self):
+        fusion = RankFusion({"trusted": 3.0, "noisy": 1.0})
+        fusion.add("noisy", ["https://x.example/noisy"])
+        fusion.add("trusted", ["https://x.example/other", "https://x.example/trusted"])
+        self.assertEqual([entry["url"] for entry in fusion.ranked()],
+                         ["https://x.example/other", "https://x.example/trusted", "https://x.example/noisy"])
+
+    def test_zero_weight_keeps_results_without_influence(self):
+        fusion = RankFusion({"a": 1.0, "muted": 0.0})
+        fusion.add("muted", ["https://x.example/muted"])
+        fusion.add("a", ["https://x.example/a"])
+        ranking = fusion.ranked()
+        self.assertEqual([entry["url"] for entry in ranking], ["https://x.example/a", "https://x.example/muted"])
+        self.assertEqual(ranking[1]["score"], 0.0)
+
+    def test_ties_keep_arrival_order_and_limit_applies(self):
+        fusion = RankFusion({"a": 1.0, "b": 1.0})
+        fusion.add("a", ["https://x.example/a"])
+        fusion.add("b", ["https://x.example/b"])
+        self.assertEqual([entry["url"] for entry in fusion.ranked(limit=1)], ["https://x.example/a"])
+
+    def test_further_pages_continue_the_ranks(self):
+        fusion = RankFusion({"a": 1.0}, k=60)
+        fusion.add("a", ["https://x.example/21"], first_rank=21)
+        self.assertEqual(fusion.ranked()[0]["score"], 1 / 81)
+
+class LinksHandler(BaseHTTPRequestHandler):
+    """Serves a result page with the links given in the "links" parameter (comma-separated)."""
+
+    def do_GET(self):
+        links = parse_qs(urlsplit(self.path).query)["links"][0].split(",")
+        body = "".join(f'<a href="{link}">Result</a>' for link in links)
+        self.send_response(200)
+        self.send_header("Content-Type", "text/html")
+        self.end_headers()
+        self.wfile.write(f"<html><body>{body}</body></html>".encode())
+
+    def log_message(self, format, *args):
+        pass
+
+class MergedBatchTests(unittest.TestCase):
+    def setUp(self):
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), LinksHandler)
+        self.server.daemon_threads = True
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        host, port = self.server.server_address
+        base = f"http://{host}:{port}/search?q={{query}}&links="
+        self.engines = {"a": base + "https://x.example/1,https://x.example/2", "b": base + "https://x.example/2",
+                        "c": base + "https://x.example/3"}
+        self.weights = {"a": 1.0, "b": 1.0, "c": 1.0}
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def merged(self, **options):
+        return list(iter_batch_results(["one", "two"], ["a", "b", "c"], self.engines, rate_limiter=HostRateLimiter(0, burst=100), merged=True,
+                                       weights=self.weights, **options))
+
+    def test_one_final_ranking_per_query(self):
+        results = self.merged()
+        self.assertEqual(sorted(result["query"] for result in results), ["one", "two"])
+        for result in results:
+            self.assertTrue(result["final"])
+            self.assertEqual(result["results"][0], "https://x.example/2") # Ties among the rest depend on arrival order
+            self.assertEqual(sorted(result["results"]), ["https://x.example/1", "https://x.example/2", "https://x.example/3"])
+
+    def test_updates_are_yielded_as_engines_answer(self):
+        results = [result for result in self.merged(merged_updates=True) if result["query"] == "one"]
+        self.assertEqual([result["pending"] for result in results], [2, 1, 0])
+        self.assertEqual([result["final"] for result in results], [False, False, True])
+        self.assertEqual([len(result["results"]) for result in results][-1], 3)
+        self.assertEqual(results[-1]["results"][0], "https://x.example/2")
+
+if __name__ == "__main__":
+    unittest.main()
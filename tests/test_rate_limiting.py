@@ -0,0 +1,178 @@
+"""HostRateLimiter throttling and CircuitBreaker trials, including against a throttling local server."""
+import email.utils
+import os
+import sys
+import threading
+import time
+import unittest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from search_core import CircuitBreaker, HostRateLimiter, iter_search_results, parse_retry_after # noqa: E402
+
+URL = "http://example.test/search?q=x"
+
+class ParseRetryAfterTests(unittest.TestCase):
+    def test_seconds(self):
+        self.assertEqual(parse_retry_after("120"), 120.0)
+        self.assertEqual(parse_retry_after("0"), 0.0)
+
+    def test_http_date(self):
+        self.assertAlmostEqual(parse_retry_after(email.utils.formatdate(time.time() + 60, usegmt=True)), 60, delta=2)
+        self.assertEqual(parse_retry_after(email.utils.formatdate(time.time() - 60, usegmt=True)), 0.0)
+
+    def test_missing_or_invalid(self):
+        self.assertIsNone(parse_retry_after(None))
+        self.assertIsNone(parse_retry_after(""))
+        self.assertIsNone(parse_retry_after("soon"))
+
+class HostRateLimiterTests(unittest.TestCase):
+    def test_requests_queue_for_their_slot(self):
+        limiter = HostRateLimiter(per_host_delay=1.0)
+        delays = [limiter.reserve(URL) for _ in range(4)]
+        self.assertEqual(delays[0], 0.0)
+        for expected, delay in zip((1.0, 2.0, 3.0), delays[1:]):
+            self.assertAlmostEqual(delay, expected, delta=0.05) # Our own backlog is never refused
+
+    def test_hosts_are_limited_separately(self):
+        limiter = HostRateLimiter(per_host_delay=1.0)
+        limiter.reserve(URL)
+        self.assertEqual(limiter.reserve("http://other.test/"), 0.0)
+
+    def test_long_retry_after_refuses_requests(self):
+        limiter = HostRateLimiter(per_host_delay=0.1, max_wait=15)
+        limiter.record_response(URL, 429, "30")
+        self.assertIsNone(limiter.reserve(URL))
+        self.assertAlmostEqual(limiter.throttled_for(URL), 30, delta=1)
+
+    def test_short_retry_after_is_waited_for(self):
+        limiter = HostRateLimiter(per_host_delay=0.1, max_wait=15)
+        limiter.record_response(URL, 503, "2")
+        delay = limiter.reserve(URL)
+        self.assertIsNotNone(delay)
+        self.assertGreaterEqual(delay, 2.0)
+
+    def test_retry_after_zero_allows_the_next_request(self):
+        limiter = HostRateLimiter(per_host_delay=1.0, burst=5)
+        limiter.reserve(URL)
+        limiter.record_response(URL, 429, "0")
+        self.assertEqual(limiter.throttled_for(URL), 0.0)
+        self.assertEqual(limiter.reserve(URL), 0.0)
+
+    def test_throttling_without_retry_after_pauses_one_slot(self):
+        limiter = HostRateLimiter(per_host_delay=1.0, burst=5)
+        limiter.reserve(URL)
+        limiter.record_response(URL, 429, None)
+        self.assertAlmostEqual(limiter.throttled_for(URL), 2.0, delta=0.05) # One slot at the halved rate
+
+class CircuitBreakerTests(unittest.TestCase):
+    def open_breaker(self, cooldown_seconds):
+        breaker = CircuitBreaker(failure_threshold=2, cooldown_seconds=cooldown_seconds)
+        breaker.record_failure("google")
+        self.assertTrue(breaker.allow("google"))
+        breaker.record_failure("google")
+        return breaker
+
+    def test_opens_after_consecutive_failures(self):
+        breaker = self.open_breaker(60)
+        self.assertFalse(breaker.allow("google"))
+        self.assertTrue(breaker.allow("bing"))
+        self.assertIsNotNone(breaker.open_until("google"))
+
+    def test_success_resets_the_failure_count(self):
+        breaker = CircuitBreaker(failure_threshold=2, cooldown_seconds=60)
+        breaker.record_failure("google")
+        breaker.record_success("google")
+        breaker.record_failure("google")
+        self.assertTrue(breaker.allow("google"))
+
+    def test_half_open_admits_a_single_trial(self):
+        breaker = self.open_breaker(0.05)
+        time.sleep(0.1)
+        allowed = []
+        threads = [threading.Thread(target=lambda: allowed.append(breaker.allow("google"))) for _ in range(20)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(allowed.count(True), 1)
+
+    def test_successful_trial_closes_the_circuit(self):
+        breaker = self.open_breaker(0.05)
+        time.sleep(0.1)
+        self.assertTrue(breaker.allow("google"))
+        breaker.record_success("google")
+        self.assertTrue(breaker.allow("google"))
+        self.assertTrue(breaker.allow("google"))
+
+    def test_failed_trial_reopens_the_circuit(self):
+        breaker = self.open_breaker(0.05)
+        time.sleep(0.1)
+        self.assertTrue(breaker.allow("google"))
+        breaker.record_failure("google")
+        self.assertFalse(breaker.allow("google"))
+
+    def test_released_trial_can_be_retried(self):
+        breaker = self.open_breaker(0.05)
+        time.sleep(0.1)
+        self.assertTrue(breaker.allow("google"))
+        self.assertFalse(breaker.allow("google"))
+        breaker.release("google")
+        self.assertTrue(breaker.allow("google"))
+
+class ThrottlingHandler(BaseHTTPRequestHandler):
+    """Answers 429 with the server's Retry-After, or a result page once `throttle` is off."""
+
+    def do_GET(self):
+        self.server.requests += 1
+        if self.server.throttle:
+            self.send_response(429)
+            self.send_header("Retry-After", self.server.retry_after)
+            self.end_headers()
+            return
+        self.send_response(200)
+        self.send_header("Content-Type", "text/html")
+        self.end_headers()
+        self.wfile.write(b'<html><body><a href="https://example.com/a">Result</a></body></html>')
+
+    def log_message(self, format, *args):
+        pass
+
+class ThrottledSearchTests(unittest.TestCase):
+    def setUp(self):
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), ThrottlingHandler)
+        self.server.daemon_threads = True
+        self.server.requests = 0
+        self.server.throttle = True
+        self.server.retry_after = "60"
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        host, port = self.server.server_address
+        self.engines = {"local": f"http://{host}:{port}/search?q={{query}}"}
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def search(self, limiter, breaker=None):
+        return list(iter_search_results("query", ["local"], self.engines, rate_limiter=limiter, circuit_breaker=breaker))[0]
+
+    def test_engine_is_skipped_while_the_host_asks_for_a_pause(self):
+        limiter = HostRateLimiter(0.01, max_wait=5)
+        self.assertEqual(self.search(limiter)["status"], "Error")
+        result = self.search(limiter)
+        self.assertEqual(result["status"], "Skipped")
+        self.assertIn("rate limiting", result["message"])
+        self.assertEqual(self.server.requests, 1)
+
+    def test_skipped_trial_does_not_block_the_circuit(self):
+        breaker = CircuitBreaker(failure_threshold=1, cooldown_seconds=0.05)
+        limiter = HostRateLimiter(0.01, max_wait=5)
+        self.search(limiter, breaker)
+        time.sleep(0.1)
+        self.assertIn("rate limiting", self.search(limiter, breaker)["message"]) # The trial is refused by the limiter
+        self.server.throttle = False
+        self.assertEqual(self.search(HostRateLimiter(0.01), breaker)["status"], "Success")
+
+if __name__ == "__main__":
+    unittest.main()
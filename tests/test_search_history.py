@@ -0,0 +1,71 @@
+"""SearchHistory: recording searches, page metadata in the full-text index."""
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from search_core import SearchHistory # noqa: E402
+
+def success(engine_name, urls):
+    return {"engine": engine_name, "status": "Success", "message": "Search successful.", "results": urls}
+
+class SearchHistoryTests(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.db_path = os.path.join(self.directory, "history.db")
+        self.history = SearchHistory(self.db_path, flush_interval=0.05)
+
+    def tearDown(self):
+        self.history.close()
+        shutil.rmtree(self.directory)
+
+    def test_results_are_found_by_query_and_url(self):
+        search_id = self.history.record_search("rust borrow checker")
+        self.history.record_result(search_id, success("google", ["https://doc.rust-lang.org/book/ch04.html"]))
+        self.history.flush()
+        self.assertEqual([match["url"] for match in self.history.search("borrow")], ["https://doc.rust-lang.org/book/ch04.html"])
+        self.assertEqual(len(self.history.search("rust-lang")), 1)
+        self.assertEqual(self.history.search("python"), [])
+
+    def test_page_metadata_is_searchable(self):
+        search_id = self.history.record_search("rust")
+        self.history.record_result(search_id, success("google", ["https://a.example/x", "https://b.example/y"]))
+        self.history.record_metadata("https://a.example/x", "Ownership guide", "Lifetimes explained")
+        self.history.flush()
+        matches = self.history.search("lifetimes")
+        self.assertEqual([(match["url"], match["title"]) for match in matches], [("https://a.example/x", "Ownership guide")])
+        self.history.record_metadata("https://a.example/x", "Renamed page", "")
+        self.history.flush()
+        self.assertEqual(self.history.search("ownership"), [])
+        self.assertEqual([match["snippet"] for match in self.history.search("renamed")], [None])
+
+    def test_further_pages_continue_the_ranks(self):
+        search_id = self.history.record_search("python")
+        self.history.record_result(search_id, success("google", ["https://a.example/1", "https://a.example/2"]))
+        self.history.flush()
+        self.history.record_result(search_id, dict(success("google", ["https://a.example/3"]), page=2))
+        self.history.record_result(search_id, dict(success("google", ["https://a.example/4"]), page=3))
+        self.history.flush()
+        ranks = {match["url"]: match["rank"] for match in self.history.search("a.example")}
+        self.assertEqual(ranks, {"https://a.example/1": 1, "https://a.example/2": 2, "https://a.example/3": 3, "https://a.example/4": 4})
+
+    def test_histories_sharing_a_database_keep_every_search(self):
+        other = SearchHistory(self.db_path, flush_interval=0.05) # E.g. the GUI and the CLI at the same time
+        try:
+            first = self.history.record_search("first query")
+            second = other.record_search("second query")
+            self.history.record_result(first, success("google", ["https://a.example/first"]))
+            other.record_result(second, success("bing", ["https://b.example/second"]))
+            self.history.flush()
+            other.flush()
+        finally:
+            other.close()
+        self.assertEqual(sorted(query for query, _ in self.history.recent_searches()), ["first query", "second query"])
+        self.assertEqual([match["query"] for match in self.history.search("first")], ["first query"])
+        self.assertEqual([match["query"] for match in self.history.search("second")], ["second query"])
+
+if __name__ == "__main__":
+    unittest.main()
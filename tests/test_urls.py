@@ -0,0 +1,78 @@
+"""URL cleanup and deduplication: clean_url, canonical_url_key and the unique-result cap."""
+import os
+import sys
+import threading
+import unittest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from search_core import HostRateLimiter, canonical_url_key, clean_url, iter_search_results # noqa: E402
+
+class CleanUrlTests(unittest.TestCase):
+    def test_lowercases_scheme_and_host_only(self):
+        self.assertEqual(clean_url("HTTPS://Example.COM/Path/Page"), "https://example.com/Path/Page")
+
+    def test_drops_default_ports_and_fragments(self):
+        self.assertEqual(clean_url("http://example.com:80/a#top"), "http://example.com/a")
+        self.assertEqual(clean_url("https://example.com:443/a"), "https://example.com/a")
+        self.assertEqual(clean_url("https://example.com:8443/a"), "https://example.com:8443/a")
+
+    def test_drops_tracking_parameters(self):
+        self.assertEqual(clean_url("https://example.com/a?utm_source=x&id=3&fbclid=y"), "https://example.com/a?id=3")
+        self.assertEqual(clean_url("https://example.com/a?b=2&a=1"), "https://example.com/a?b=2&a=1") # Untouched otherwise
+
+    def test_leaves_malformed_urls_alone(self):
+        self.assertEqual(clean_url("http://[::1"), "http://[::1")
+
+class CanonicalUrlKeyTests(unittest.TestCase):
+    def test_variants_of_a_page_share_a_key(self):
+        variants = ["http://example.com/docs", "https://www.example.com/docs/", "https://EXAMPLE.com/docs#intro",
+                    "https://example.com/docs?utm_medium=email"]
+        self.assertEqual({canonical_url_key(url) for url in variants}, {"example.com/docs"})
+
+    def test_parameter_order_does_not_matter(self):
+        self.assertEqual(canonical_url_key("https://example.com/a?x=1&y=2"), canonical_url_key("https://example.com/a?y=2&x=1"))
+
+    def test_different_pages_keep_different_keys(self):
+        self.assertNotEqual(canonical_url_key("https://example.com/a"), canonical_url_key("https://example.com/b"))
+        self.assertNotEqual(canonical_url_key("https://example.com/a?id=1"), canonical_url_key("https://example.com/a?id=2"))
+        self.assertNotEqual(canonical_url_key("https://example.com/a"), canonical_url_key("https://example.org/a"))
+
+class LinksHandler(BaseHTTPRequestHandler):
+    """Serves a result page with the links given in the "links" parameter (comma-separated)."""
+
+    def do_GET(self):
+        links = parse_qs(urlsplit(self.path).query)["links"][0].split(",")
+        body = "".join(f'<a href="{link}">Result</a>' for link in links)
+        self.send_response(200)
+        self.send_header("Content-Type", "text/html")
+        self.end_headers()
+        self.wfile.write(f"<html><body>{body}</body></html>".encode())
+
+    def log_message(self, format, *args):
+        pass
+
+class UniqueResultCapTests(unittest.TestCase):
+    def setUp(self):
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), LinksHandler)
+        self.server.daemon_threads = True
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        host, port = self.server.server_address
+        base = f"http://{host}:{port}/search?q={{query}}&links="
+        self.engines = {"a": base + "http://example.com/x", "b": base + "https://www.example.com/x/",
+                        "c": base + "https://example.com/y"}
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def test_url_variants_count_once(self):
+        # With one worker the engines answer in order; "b" only repeats the page of "a"
+        results = list(iter_search_results("query", ["a", "b", "c"], self.engines, max_workers=1, rate_limiter=HostRateLimiter(0, burst=100),
+                                           max_unique_results=2))
+        self.assertEqual([(result["engine"], result["status"]) for result in results], [("a", "Success"), ("b", "Success"), ("c", "Success")])
+
+if __name__ == "__main__":
+    unittest.main()